@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Static AliExpress extraction
+Item pages embed their product state as inline script JSON (window.runParams,
+window._d_c_.DCData, window._dida_config_._init_data_). Reading it from the
+initial HTML gives the main fields without starting a browser
+"""
+
+import json
+import re
+from collections import deque
+
+# Assignments that carry the embedded product state, most complete first
+STATE_MARKERS = [
+    re.compile(r'window\.runParams\s*=\s*'),
+    re.compile(r'_init_data_\s*=\s*'),
+    re.compile(r'_d_c_\.DCData\s*=\s*'),
+]
+
+# Inside a JavaScript object literal the state usually sits under an unquoted "data:" key
+_DATA_KEY_RE = re.compile(r'\bdata\s*:\s*(?=\{)')
+
+# Tokens that affect object nesting; escapes are consumed whole so escaped quotes are skipped
+_STRUCTURE_RE = re.compile(r'\\.|[{}"\']', re.DOTALL)
+
+# Fields the page state has to provide for the browser to be skipped
+REQUIRED_FIELDS = ('title', 'price', 'images')
+
+def _object_end(text, start):
+    """Index just past the JSON/JS object starting at text[start] == '{', or -1"""
+    depth = 0
+    quote = None
+    for match in _STRUCTURE_RE.finditer(text, start):
+        token = match.group()
+        if token[0] == '\\':
+            continue
+        if quote:
+            if token == quote:
+                quote = None
+        elif token in '"\'':
+            quote = token
+        elif token == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return -1
+
+def _load_object(text):
+    """Parse an object literal as JSON, falling back to its 'data:' member for JS literals"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    match = _DATA_KEY_RE.search(text)
+    if match:
+        end = _object_end(text, match.end())
+        if end > 0:
+            try:
+                return json.loads(text[match.end():end])
+            except ValueError:
+                pass
+    return None
+
+def find_embedded_state(html):
+    """All product state objects embedded in the page, in STATE_MARKERS order"""
+    states = []
+    for marker in STATE_MARKERS:
+        for match in marker.finditer(html):
+            start = html.find('{', match.end(), match.end() + 16)
+            if start < 0:
+                continue
+            end = _object_end(html, start)
+            if end < 0:
+                continue
+            state = _load_object(html[start:end])
+            if isinstance(state, dict):
+                states.append(state)
+    return states
+
+def _values(obj, key):
+    """Every value stored under ``key`` anywhere in a nested JSON structure, shallowest first"""
+    queue = deque([obj])
+    while queue:
+        current = queue.popleft()
+        if isinstance(current, dict):
+            if key in current:
+                yield current[key]
+            queue.extend(value for value in current.values() if isinstance(value, (dict, list)))
+        elif isinstance(current, list):
+            queue.extend(value for value in current if isinstance(value, (dict, list)))
+
+def _first(states, keys, accept):
+    """First value under any of ``keys`` (in order) that ``accept`` allows"""
+    for key in keys:
+        for state in states:
+            for value in _values(state, key):
+                if accept(value):
+                    return value
+    return None
+
+def _is_text(value):
+    return isinstance(value, str) and bool(value.strip())
+
+def _amount(value):
+    """Numeric value of an AliExpress amount object such as {"value": 12.5, "currency": "USD"}"""
+    if isinstance(value, dict):
+        try:
+            return float(value.get('value'))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+def _price_from_text(text):
+    """Lowest number in a formatted price such as 'US $12.34 - 15.00'"""
+    match = re.search(r'\d[\d,]*\.?\d*', text or '')
+    return float(match.group().replace(',', '')) if match else None
+
+def extract_fields(html):
+    """Product fields read from the page's embedded state.
+
+    Returns a dict with whichever of title, price, original_price, currency,
+    images, description, rating, review_count and stock the state provides, or
+    None when the page embeds no state at all.
+    """
+    states = find_embedded_state(html)
+    if not states:
+        return None
+
+    fields = {}
+
+    title = _first(states, ('subject',), _is_text)
+    if title:
+        fields['title'] = title.strip()
+
+    amount = _first(states, ('minActivityAmount', 'minAmount'), lambda value: bool(_amount(value)))
+    if amount:
+        fields['price'] = _amount(amount)
+        fields['currency'] = amount.get('currency') or 'USD'
+    else:
+        text = _first(states, ('formatedActivityPrice', 'formatedPrice', 'salePriceString'),
+                      lambda value: _is_text(value) and bool(_price_from_text(value)))
+        if text:
+            fields['price'] = _price_from_text(text)
+            fields['currency'] = 'USD'
+
+    # minActivityAmount is the sale price; minAmount is the price before the discount
+    original = _first(states, ('minAmount',), lambda value: bool(_amount(value)))
+    if original and fields.get('price'):
+        fields['original_price'] = max(_amount(original), fields['price'])
+    elif fields.get('price'):
+        text = _first(states, ('formatedPrice',), lambda value: _is_text(value) and bool(_price_from_text(value)))
+        if text:
+            fields['original_price'] = max(_price_from_text(text), fields['price'])
+
+    images = _first(states, ('imagePathList',), lambda value: isinstance(value, list) and bool(value))
+    if images:
+        fields['images'] = [('https:' + src if src.startswith('//') else src)
+                            for src in images if isinstance(src, str)]
+
+    description = _first(states, ('description',), lambda value: _is_text(value) and not value.startswith('http'))
+    if description:
+        fields['description'] = description.strip()
+
+    rating = _first(states, ('averageStar', 'evarageStar'), lambda value: _price_from_text(str(value)) is not None)
+    if rating is not None:
+        fields['rating'] = float(_price_from_text(str(rating)))
+
+    reviews = _first(states, ('totalValidNum',), lambda value: isinstance(value, int))
+    if reviews is not None:
+        fields['review_count'] = reviews
+
+    stock = _first(states, ('totalAvailQuantity',), lambda value: isinstance(value, int))
+    if stock is not None:
+        fields['stock'] = stock
+
+    return fields
+
+def has_required_fields(fields):
+    """Whether the static fields are complete enough to skip the browser"""
+    return bool(fields) and all(fields.get(name) for name in REQUIRED_FIELDS)
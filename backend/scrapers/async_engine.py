@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Asyncio fetch engine for the static (requests + BeautifulSoup) scrape paths
+Keeps hundreds of page downloads in flight from one event loop and runs the
+CPU-bound parsing on an executor so it never blocks the loop
+"""
+
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import RETRY_STATUSES, RetryPolicy, parse_retry_after
+from streaming import DEFAULT_MAX_BODY_BYTES, read_body_async
+
+class AsyncFetcher:
+    """Pooled aiohttp client with overall and per-host connection limits.
+
+    Use it as an async context manager, or call start() and close() yourself.
+    ``parse_executor`` runs the parse callbacks; a small thread pool is created
+    when none is given. With a ``limiter`` (a RateLimiter) every download waits
+    for a slot on its domain, and transient failures are retried per ``retry``.
+    Bodies larger than ``max_bytes`` raise ResponseTooLarge instead of being read whole.
+    """
+    def __init__(self, headers=None, limit=200, limit_per_host=8, timeout=10, parse_executor=None,
+                 limiter=None, retry=None, max_bytes=DEFAULT_MAX_BODY_BYTES):
+        self.headers = dict(headers or {})
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.limiter = limiter
+        self.retry = retry or RetryPolicy(retries=0)
+        self.max_bytes = max_bytes
+        self._transport_errors = ()
+        self._parse_executor = parse_executor
+        self._owns_executor = parse_executor is None
+        self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Open the pooled client session"""
+        if self._session is not None:
+            return
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._transport_errors = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+        if self._parse_executor is None:
+            self._parse_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='parse')
+
+    async def close(self):
+        """Close pooled connections and the parse executor we created"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._owns_executor and self._parse_executor is not None:
+            self._parse_executor.shutdown(wait=False)
+            self._parse_executor = None
+
+    async def fetch(self, url):
+        """Download a page body, raising for HTTP error statuses once retries are used up"""
+        await self.start()
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            ticket = await self.limiter.acquire_async(url) if self.limiter is not None else None
+            outcome = {'error': True}
+            try:
+                async with self._session.get(url) as response:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    outcome = {'status': response.status, 'retry_after': retry_after}
+                    delay = (self.retry.delay(attempt, retry_after, started)
+                             if response.status in RETRY_STATUSES else None)
+                    if delay is None:
+                        response.raise_for_status()
+                        # The slot stays taken until the body has been read
+                        return await read_body_async(response, self.max_bytes)
+            except self._transport_errors:
+                outcome = {'error': True}
+                delay = self.retry.delay(attempt, started=started)
+                if delay is None:
+                    raise
+            finally:
+                self._release(ticket, **outcome)
+
+            if self.limiter is not None:
+                self.limiter.record_retry(url)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _release(self, ticket, **outcome):
+        if ticket is not None:
+            self.limiter.release(ticket, **outcome)
+
+    async def run_parse(self, fn, *args):
+        """Run a blocking parse function on the parse executor, in a copy of the caller's context"""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parse_executor, contextvars.copy_context().run, fn, *args)
+
+async def scrape_many_async(scrape_coro, urls, max_concurrency=100):
+    """Run ``scrape_coro(url)`` for many URLs and yield (url, result, error) as each finishes.
+
+    At most ``max_concurrency`` scrapes are in flight; ``urls`` is consumed lazily.
+    """
+    urls = iter(urls)
+    pending = {}
+
+    try:
+        while True:
+            while len(pending) < max_concurrency:
+                try:
+                    url = next(urls)
+                except StopIteration:
+                    break
+                pending[asyncio.ensure_future(scrape_coro(url))] = url
+
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url = pending.pop(task)
+                try:
+                    result, error = task.result(), None
+                except Exception as e:
+                    result, error = None, str(e)
+                yield url, result, error
+    finally:
+        # The consumer stopped early; do not leave orphaned scrapes running
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Browser profiles for the Selenium scrapers
+A profile says how a platform's pages are loaded: the page-load strategy, which
+resources Chrome skips, and how long to wait for each product field before
+extracting
+"""
+
+import json
+
+# URL patterns for Network.setBlockedURLs, by resource type
+RESOURCE_PATTERNS = {
+    'image': ['*.jpg', '*.jpg?*', '*.jpg_*', '*.jpeg', '*.png', '*.png?*', '*.png_*', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'media': ['*.mp4', '*.webm', '*.m3u8', '*.mp3'],
+    'stylesheet': ['*.css', '*.css?*'],
+    'tracker': [
+        '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+        '*facebook.net*', '*hotjar.com*', '*criteo.com*', '*scorecardresearch.com*'
+    ]
+}
+
+class BrowserProfile:
+    """Page-load settings for one platform.
+
+    ``page_load_strategy`` and image blocking are launch settings, so they apply
+    to every browser in a pool built with the profile; blocked resource types
+    and the field waits are applied page by page. ``field_waits`` maps a field
+    to ``(selectors, deadline)``: after navigation the scraper waits until one
+    of the selectors is present or ``deadline`` seconds have passed since the
+    page was requested. Without field waits the scraper waits for ``body``.
+    """
+    def __init__(self, page_load_strategy='normal', blocked_resources=(), field_waits=None, page_timeout=30):
+        self.page_load_strategy = page_load_strategy
+        self.blocked_resources = tuple(blocked_resources)
+        self.field_waits = dict(field_waits or {})
+        self.page_timeout = page_timeout
+
+    @property
+    def blocks_images(self):
+        return 'image' in self.blocked_resources
+
+    def blocked_url_patterns(self):
+        """Network.setBlockedURLs patterns for the blocked resource types"""
+        return [pattern for resource in self.blocked_resources for pattern in RESOURCE_PATTERNS.get(resource, [])]
+
+    def updated(self, overrides):
+        """Copy of the profile with settings from a config dict replaced"""
+        field_waits = dict(self.field_waits)
+        for field, deadline in overrides.get('field_deadlines', {}).items():
+            selectors = field_waits.get(field, ([], deadline))[0]
+            field_waits[field] = (selectors, deadline)
+        for field, selectors in overrides.get('field_selectors', {}).items():
+            field_waits[field] = (selectors, field_waits.get(field, ([], 5))[1])
+        return BrowserProfile(
+            page_load_strategy=overrides.get('page_load_strategy', self.page_load_strategy),
+            blocked_resources=overrides.get('blocked_resources', self.blocked_resources),
+            field_waits=field_waits,
+            page_timeout=overrides.get('page_timeout', self.page_timeout)
+        )
+
+# The original behaviour: full page load, everything fetched, wait for <body>
+STANDARD_PROFILE = BrowserProfile()
+
+def lean_profile(field_selectors, deadlines):
+    """Eager load, no images, fonts, media or trackers, and per-field waits"""
+    return BrowserProfile(
+        page_load_strategy='eager',
+        blocked_resources=('image', 'font', 'media', 'tracker'),
+        field_waits={field: (field_selectors[field], deadline) for field, deadline in deadlines.items()}
+    )
+
+def load_profiles(path, profiles):
+    """Apply a JSON file of per-platform overrides, e.g.
+    {"aliexpress": {"page_load_strategy": "normal", "blocked_resources": ["font"],
+                    "field_deadlines": {"price": 8}}}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        overrides = json.load(f)
+
+    profiles = dict(profiles)
+    for platform, settings in overrides.items():
+        profiles[platform] = profiles.get(platform, STANDARD_PROFILE).updated(settings)
+    return profiles
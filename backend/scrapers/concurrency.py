@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Concurrency helpers shared by the Python scrapers
+Runs many scrapes on a thread pool with an overall and a per-domain cap
+"""
+
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+
+def url_domain(url):
+    """Domain used to group URLs for per-domain limits"""
+    return urlparse(url).netloc.lower()
+
+class _DomainQueue:
+    """URLs held back because their domain is already at its concurrency cap"""
+    def __init__(self, max_per_domain):
+        self.max_per_domain = max_per_domain
+        self.active = defaultdict(int)
+        self.waiting = defaultdict(deque)
+        self.size = 0
+
+    def has_room(self, domain):
+        return self.active[domain] < self.max_per_domain
+
+    def defer(self, url, domain):
+        self.waiting[domain].append(url)
+        self.size += 1
+
+    def pop_ready(self):
+        """Next deferred URL whose domain has room, or None"""
+        for domain, queue in self.waiting.items():
+            if self.has_room(domain):
+                url = queue.popleft()
+                if not queue:
+                    del self.waiting[domain]
+                self.size -= 1
+                return url, domain
+        return None
+
+def scrape_many(scrape_fn, urls, max_workers=8, max_per_domain=2, read_ahead=None):
+    """Scrape URLs concurrently and yield (url, result, error) as each one finishes.
+
+    Results come back in completion order, not input order. At most ``max_workers``
+    scrapes run at once and at most ``max_per_domain`` of them hit the same domain.
+    ``urls`` may be any iterable (including a lazy stream); it is consumed only as
+    far as needed to keep the pool busy, holding back at most ``read_ahead`` URLs
+    for domains that are at their cap.
+    """
+    urls = iter(urls)
+    read_ahead = read_ahead or max_workers * 4
+    domains = _DomainQueue(max_per_domain)
+    active = {}
+    exhausted = False
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            while len(active) < max_workers:
+                ready = domains.pop_ready()
+                if ready is None:
+                    if exhausted or domains.size >= read_ahead:
+                        break
+                    try:
+                        url = next(urls)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    domain = url_domain(url)
+                    if not domains.has_room(domain):
+                        domains.defer(url, domain)
+                        continue
+                    ready = (url, domain)
+
+                url, domain = ready
+                domains.active[domain] += 1
+                active[executor.submit(scrape_fn, url)] = ready
+
+            if not active:
+                break
+
+            done, _ = wait(active, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, domain = active.pop(future)
+                domains.active[domain] -= 1
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, str(e)
+                yield url, result, error
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Listing and category crawls for the Python scrapers
+Finds product links on listing pages (following pagination, and subcategory
+links down to a depth limit) and scrapes them while discovery is still
+running; a bounded queue between the two stages holds discovery back whenever
+scraping falls behind. URLs are deduplicated in a Bloom filter and every
+request to a domain keeps to a minimum gap and its robots.txt rules
+"""
+
+import hashlib
+import json
+import math
+import queue
+import re
+import threading
+import time
+from collections import deque
+from urllib import robotparser
+from urllib.parse import parse_qsl, urljoin, urlsplit, urlunsplit
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+import metrics
+from concurrency import scrape_many, url_domain
+from html_parsing import resolve_parser
+from streaming import read_body
+from urls import normalize_url, platform_for
+
+# Path shapes of product detail pages on common store platforms
+PRODUCT_PATH = re.compile(
+    r'/(dp|gp/product|itm|item|items|product|products|p|pd|ip)/[^/]+|/[^/]*\d{5,}[^/]*\.html?$|-p-\d+\.html?$',
+    re.IGNORECASE
+)
+
+# Path shapes of listing pages: categories, collections, search results and pagination
+LISTING_PATH = re.compile(
+    r'/(c|b|s|category|categories|collections?|catalog|catalogue|department|shop|store|search|browse)(/|$)|/page/\d+',
+    re.IGNORECASE
+)
+
+# Query parameters that page through a listing
+PAGE_PARAMS = {'page', 'pg', 'pagenum', 'page_number', 'start', 'offset'}
+
+# Only the elements links are read from
+LINK_STRAINER = SoupStrainer(['a', 'link', 'base', 'script'])
+
+class _Done:
+    """End of the discovered product stream"""
+
+_DONE = _Done()
+
+class BloomFilter:
+    """Fixed-size probabilistic set of strings.
+
+    Never forgets an item it has seen, and wrongly claims to have seen about
+    ``error_rate`` of new items until ``capacity`` items are in it: the default
+    million URLs take under 2 MB instead of the hundreds a set of strings would.
+    """
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, item):
+        """Add ``item``; True when it was not in the set yet"""
+        positions = self._positions(item)
+        with self._lock:
+            new = False
+            for p in positions:
+                if not self.bits[p >> 3] & (1 << (p & 7)):
+                    self.bits[p >> 3] |= 1 << (p & 7)
+                    new = True
+            self.count += new
+        return new
+
+def _site(url):
+    """Host a crawl stays on, without a leading www."""
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+def classify_link(url):
+    """'product', 'listing' or None for a URL, judged by its path and query"""
+    parts = urlsplit(url)
+    if PRODUCT_PATH.search(parts.path):
+        return 'product'
+    if LISTING_PATH.search(parts.path) or PAGE_PARAMS & {key.lower() for key, _ in parse_qsl(parts.query)}:
+        return 'listing'
+    return None
+
+def _item_list_urls(soup):
+    """Product URLs listed in schema.org ItemList JSON-LD blocks"""
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                yield from walk(item)
+        elif isinstance(node, dict):
+            types = node.get('@type')
+            types = types if isinstance(types, list) else [types]
+            if 'ItemList' in types:
+                for element in node.get('itemListElement') or []:
+                    if isinstance(element, str):
+                        yield element
+                    elif isinstance(element, dict):
+                        item = element.get('item')
+                        if isinstance(item, dict):
+                            item = item.get('url') or item.get('@id')
+                        url = element.get('url') or item
+                        if isinstance(url, str):
+                            yield url
+            else:
+                for value in node.values():
+                    if isinstance(value, (dict, list)):
+                        yield from walk(value)
+
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            yield from walk(json.loads(script.get_text(), strict=False))
+        except ValueError:
+            continue
+
+def _is_next_page(url, page_url):
+    """Whether ``url`` pages through the same listing as ``page_url``"""
+    parts, page = urlsplit(url), urlsplit(page_url)
+    if PAGE_PARAMS & {key.lower() for key, _ in parse_qsl(parts.query)}:
+        return parts.path.rstrip('/') == page.path.rstrip('/')
+    return re.sub(r'/page/\d+/?$', '', parts.path) == re.sub(r'/page/\d+/?$', '', page.path)
+
+def extract_links(soup, base_url):
+    """Product, next-page and category links on a page, in page order and only on the page's own site.
+
+    Product links come from ItemList JSON-LD and from anchors whose path looks
+    like a product page. Links marked as the next page (rel="next", a "next"
+    class) or paging through this listing are next pages; other listing links
+    are categories.
+    """
+    page_url = base_url
+    base = soup.find('base', href=True)
+    if base is not None:
+        base_url = urljoin(base_url, base['href'].strip())
+    site = _site(base_url)
+    # Dicts keep the first occurrence of each link in page order
+    products, next_pages, categories = {}, {}, {}
+
+    def resolve(href):
+        parts = urlsplit(urljoin(base_url, href.strip()))
+        if parts.scheme not in ('http', 'https') or _site(parts.geturl()) != site:
+            return None
+        return urlunsplit(parts._replace(fragment=''))
+
+    for href in _item_list_urls(soup):
+        url = resolve(href)
+        if url:
+            products.setdefault(url, None)
+
+    for tag in soup.find_all(['a', 'link'], href=True):
+        rel = [value.lower() for value in tag.get('rel') or []]
+        if tag.name == 'link' and 'next' not in rel:
+            continue
+        url = resolve(tag['href'])
+        if url is None:
+            continue
+        is_next = 'next' in rel or any('next' in value.lower() for value in tag.get('class') or [])
+        kind = 'listing' if is_next else classify_link(url)
+        if kind == 'product':
+            products.setdefault(url, None)
+        elif kind == 'listing':
+            (next_pages if is_next or _is_next_page(url, page_url) else categories).setdefault(url, None)
+    return list(products), list(next_pages), list(categories)
+
+class Politeness:
+    """Per-domain crawl manners: a minimum gap between requests and robots.txt rules.
+
+    robots.txt is fetched once per site through ``session``; a missing file
+    allows everything, a 401/403 forbids everything, and a Crawl-delay longer
+    than ``delay`` is honoured.
+    """
+    def __init__(self, session, delay=0.5, respect_robots=True, user_agent='*'):
+        self.session = session
+        self.delay = delay
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self._robots = {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def _rules(self, url):
+        parts = urlsplit(url)
+        root = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            rules = self._robots.get(root)
+        if rules is not None:
+            return rules
+
+        rules = robotparser.RobotFileParser(root + '/robots.txt')
+        try:
+            response = self.session.get(root + '/robots.txt', timeout=10)
+            if response.status_code in (401, 403):
+                rules.disallow_all = True
+            elif response.ok:
+                rules.parse(response.text.splitlines())
+            else:
+                rules.allow_all = True
+        except Exception:
+            rules.allow_all = True
+        with self._lock:
+            return self._robots.setdefault(root, rules)
+
+    def allowed(self, url):
+        """Whether robots.txt lets the crawl fetch ``url``"""
+        return not self.respect_robots or self._rules(url).can_fetch(self.user_agent, url)
+
+    def wait(self, url):
+        """Block until ``url``'s domain may be sent another request"""
+        delay = self.delay
+        if self.respect_robots:
+            delay = max(delay, float(self._rules(url).crawl_delay(self.user_agent) or 0))
+        domain = url_domain(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(domain, 0.0))
+            self._next_slot[domain] = slot + delay
+        if slot > now:
+            time.sleep(slot - now)
+
+class Crawler:
+    """Crawl listing pages from a start URL and scrape the products they link to.
+
+    Discovery runs on its own thread and walks listing pages breadth-first: the
+    start page is depth 0, its next pages share its depth and each category link
+    goes one deeper, up to ``max_depth``, for at most ``max_pages`` listing
+    pages and ``max_products`` products. Each new
+    product URL goes on a queue of ``queue_size`` that scrape_many drains with
+    ``max_workers`` scrapes (``max_per_domain`` per domain), so scraping starts
+    with the first listing page and discovery waits while the queue is full.
+    Products the scraper's result cache has fresh are scraped without waiting
+    for the domain's crawl delay, since no request goes out for them.
+    """
+    def __init__(self, scraper, max_depth=2, max_pages=50, max_products=None, max_workers=4, max_per_domain=2,
+                 queue_size=100, delay=0.5, respect_robots=True, seen_capacity=1_000_000):
+        self.scraper = scraper
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_products = max_products
+        self.max_workers = max_workers
+        self.max_per_domain = max_per_domain
+        self.queue_size = queue_size
+        self.politeness = Politeness(scraper.session, delay, respect_robots)
+        self.seen = BloomFilter(seen_capacity)
+        self.parser = resolve_parser()
+        self.failed_pages = {}
+        # Updated by the discovery thread and the scrape loop
+        self.counters = {'pages': 0, 'page_errors': 0, 'products': 0, 'duplicates': 0, 'blocked': 0,
+                         'scraped': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def crawl(self, start_url):
+        """Yield (url, result, error) for every product found from ``start_url``, in completion order"""
+        found = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        discovery = threading.Thread(target=self._discover, args=(start_url, found, stop),
+                                     name='crawl-discovery', daemon=True)
+        discovery.start()
+        try:
+            for url, result, error in scrape_many(self._scrape, self._products(found),
+                                                  self.max_workers, self.max_per_domain):
+                self._count('scraped' if error is None else 'failed')
+                yield url, result, error
+        finally:
+            stop.set()
+            discovery.join()
+
+    def stats(self):
+        """Counters of the crawl so far, with the size of the seen-set"""
+        with self._lock:
+            return dict(self.counters, seen=len(self.seen), seen_bytes=len(self.seen.bits),
+                        failed_pages=dict(self.failed_pages))
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _counter(self, counter):
+        with self._lock:
+            return self.counters[counter]
+
+    def _scrape(self, url):
+        result_cache = getattr(self.scraper, 'result_cache', None)
+        if result_cache is None or result_cache.state(url) != 'fresh':
+            self.politeness.wait(url)
+        return self.scraper.scrape_product(url)
+
+    def _products(self, found):
+        while True:
+            url = found.get()
+            if url is _DONE:
+                return
+            yield url
+
+    def _put(self, found, item, stop):
+        """Queue ``item``, waiting while the queue is full; False once the crawl is being stopped"""
+        while not stop.is_set():
+            try:
+                found.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _discover(self, start_url, found, stop):
+        frontier = deque([(start_url, 0)])
+        self.seen.add(normalize_url(start_url))
+        try:
+            while frontier and self._counter('pages') < self.max_pages and not stop.is_set():
+                url, depth = frontier.popleft()
+                if not self.politeness.allowed(url):
+                    self._count('blocked')
+                    continue
+                try:
+                    products, next_pages, categories = self.fetch_listing(url)
+                except Exception as e:
+                    with self._lock:
+                        self.counters['page_errors'] += 1
+                        self.failed_pages[url] = str(e)
+                    continue
+                self._count('pages')
+
+                for product in products:
+                    if self.max_products is not None and self._counter('products') >= self.max_products:
+                        return
+                    if not self.seen.add(normalize_url(product)):
+                        self._count('duplicates')
+                        continue
+                    if not self.politeness.allowed(product):
+                        self._count('blocked')
+                        continue
+                    if not self._put(found, product, stop):
+                        return
+                    self._count('products')
+
+                # Paging through a listing stays at its depth; a category goes one deeper
+                links = [(page, depth) for page in next_pages]
+                if depth < self.max_depth:
+                    links += [(category, depth + 1) for category in categories]
+                for link, link_depth in links:
+                    # The frontier never holds more pages than are left to crawl
+                    if len(frontier) + self._counter('pages') >= self.max_pages:
+                        break
+                    if self.seen.add(normalize_url(link)):
+                        frontier.append((link, link_depth))
+        finally:
+            self._put(found, _DONE, stop)
+
+    def fetch_listing(self, url):
+        """Download a listing page and return its (product links, next-page links, category links)"""
+        self.politeness.wait(url)
+        with metrics.platform_scope(platform_for(url)), metrics.stage('discover'):
+            response = self.scraper.session.get(url, timeout=10, stream=True)
+            with response:
+                response.raise_for_status()
+                body = read_body(response, self.scraper.max_body_bytes)
+            soup = BeautifulSoup(body, self.parser, parse_only=LINK_STRAINER)
+            return extract_links(soup, response.url)
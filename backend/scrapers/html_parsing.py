@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+HTML parsing layer shared by the Python scrapers
+Picks the fastest installed BeautifulSoup tree builder and offers a restricted
+parse that only builds the elements the extractors look at, plus an early-stop
+parse that gives up on the rest of the page once every required field is found
+"""
+
+import importlib.util
+
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+PARSE_MODES = ('full', 'strained', 'early')
+
+def resolve_parser(parser='auto'):
+    """Tree builder name for BeautifulSoup; 'auto' prefers lxml when it is installed"""
+    if parser != 'auto':
+        return parser
+    return 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+class _StartTag:
+    """Name and attributes of a tag the parser has not created yet"""
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        css_class = self.attrs.get('class')
+        if isinstance(css_class, str):
+            self.attrs['class'] = css_class.split()
+
+class KeepStrainer(SoupStrainer):
+    """SoupStrainer that keeps top-level tags accepted by a ``keep(element)`` callback.
+
+    A kept tag keeps its whole subtree, so text and nested elements of a matching
+    element are still available. Supports both the pre-4.13 (search_tag) and the
+    4.13+ (allow_tag_creation) strainer hooks.
+    """
+    def __init__(self, keep):
+        super().__init__()
+        self._keep = keep
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self._keep(_StartTag(name, attrs))
+
+    def allow_string_creation(self, string):
+        return False
+
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        if isinstance(markup_name, Tag):
+            return self._keep(markup_name)
+        return self._keep(_StartTag(markup_name, markup_attrs))
+
+def _prefix_end(content, limit):
+    """First cut point at or after ``limit`` that ends on a '>' so no tag or character is split"""
+    if limit >= len(content):
+        return len(content)
+    cut = content.find(b'>' if isinstance(content, bytes) else '>', limit)
+    return cut + 1 if cut >= 0 else len(content)
+
+class PageParser:
+    """Configurable BeautifulSoup front end.
+
+    ``mode`` is one of:
+      'full'      build the whole tree (the original behaviour)
+      'strained'  only build elements that could match one of ``engine``'s selectors
+      'early'     strained, and parse growing prefixes of the page until
+                  ``is_complete(soup)`` says every required field has been found
+
+    Early mode only pays off when the fields settle near the top of the page;
+    when they never do, it costs about twice a strained parse plus the checks.
+    Prefixes are only checked up to half the page (or ``check_limit`` bytes of
+    a stream of unknown length), then the rest is parsed once.
+    """
+    def __init__(self, parser='auto', mode='full', engine=None, is_complete=None, first_chunk=64 * 1024,
+                 check_limit=128 * 1024):
+        if mode not in PARSE_MODES:
+            raise ValueError(f"Unknown parse mode: {mode}")
+        if mode != 'full' and engine is None:
+            raise ValueError(f"Parse mode '{mode}' needs a selector engine")
+
+        self.parser = resolve_parser(parser)
+        self.mode = mode
+        self.engine = engine
+        self.is_complete = is_complete
+        self.first_chunk = first_chunk
+        self.check_limit = check_limit
+
+    def parse(self, content, is_complete=None):
+        """Parse a page body according to the configured mode; ``is_complete`` overrides the early-stop check for this page"""
+        if self.mode == 'full':
+            return BeautifulSoup(content, self.parser)
+
+        strainer = KeepStrainer(self.engine.could_match)
+        is_complete = is_complete or self.is_complete
+        if self.mode == 'strained' or is_complete is None:
+            return BeautifulSoup(content, self.parser, parse_only=strainer)
+
+        return self.parse_until(content, strainer, is_complete)
+
+    def parse_until(self, content, strainer=None, is_complete=None):
+        """Parse doubling prefixes of the page until ``is_complete`` (or the parser's own check) is satisfied.
+
+        Each prefix is twice the previous one and none is longer than half the
+        page: once the next one would be, the whole page is parsed instead. The
+        checked prefixes add up to at most one more parse of the page. Once
+        complete, the returned tree runs one more chunk past the cut so an
+        element that straddled it is not left truncated.
+        """
+        is_complete = is_complete or self.is_complete
+        limit = self.first_chunk
+        while True:
+            end = _prefix_end(content, limit)
+            if end * 2 > len(content):
+                return BeautifulSoup(content, self.parser, parse_only=strainer)
+            soup = BeautifulSoup(content[:end], self.parser, parse_only=strainer)
+            if is_complete(soup):
+                end = _prefix_end(content, end + self.first_chunk)
+                return BeautifulSoup(content[:end], self.parser, parse_only=strainer)
+            limit = end * 2
+
+    def parse_stream(self, chunks, is_complete=None, size=None):
+        """Parse a page from an iterable of byte chunks that may still be downloading.
+
+        In 'early' mode the part that has arrived is parsed each time it doubles,
+        and reading stops one chunk past the point where ``is_complete`` is
+        satisfied, as in ``parse_until``; the rest of the page is never read, so
+        the caller can close the connection. Checks stop once the part that has
+        arrived passes half of ``size`` (the expected length, when known) or
+        ``check_limit``, and the rest is read and parsed once. Other modes read
+        every chunk and parse once.
+        """
+        is_complete = is_complete or self.is_complete
+        if self.mode != 'early' or is_complete is None:
+            return self.parse(b''.join(chunks), is_complete)
+
+        strainer = KeepStrainer(self.engine.could_match)
+        check_until = size // 2 if size else self.check_limit
+        buffer = bytearray()
+        limit = self.first_chunk
+        stop_at = None
+        for chunk in chunks:
+            buffer += chunk
+            if len(buffer) < limit:
+                continue
+            if stop_at is not None:
+                break
+            if len(buffer) > check_until:
+                # Past the point where checking can pay off: read the rest without checks
+                limit = float('inf')
+                continue
+            content = bytes(buffer)
+            # Only whole tags: cut after the last '>' that has arrived
+            end = content.rfind(b'>') + 1
+            if end and is_complete(BeautifulSoup(content[:end], self.parser, parse_only=strainer)):
+                stop_at = limit = end + self.first_chunk
+            else:
+                limit = len(content) * 2
+
+        content = bytes(buffer)
+        end = _prefix_end(content, stop_at) if stop_at is not None else len(content)
+        return BeautifulSoup(content[:end], self.parser, parse_only=strainer)
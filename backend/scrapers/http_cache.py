@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP cache for the scrapers' requests sessions
+Stores page bodies keyed by normalized URL, serves them while fresh and
+revalidates stale entries with ETag / Last-Modified conditional requests
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from urls import normalize_url
+
+# Headers that describe the wire encoding; bodies are stored already decoded
+_WIRE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+def _write_atomic(path, data):
+    """Write bytes to ``path`` through a uniquely named temporary file beside it, so readers never see half a file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class HttpCache:
+    """Disk store of response bodies with a freshness TTL and an LRU size cap.
+
+    Each entry is a ``<key>.body`` file plus a ``<key>.json`` metadata file. The
+    LRU order is kept in memory and rebuilt from file modification times when the
+    cache is opened, so several processes can share a directory.
+    """
+    def __init__(self, directory, ttl=600, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._size = 0
+        self._counters = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU index from the files on disk, oldest first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.body'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len('.body')], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._size += size
+
+    def key_for(self, url):
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.body', base + '.json'
+
+    def get(self, url):
+        """Cached entry for a URL (metadata dict with a 'body' key), or None"""
+        key = self.key_for(url)
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(body_path, 'rb') as f:
+                entry['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.get('stored_at', 0) < self.ttl
+
+    def put(self, url, status, headers, body):
+        """Store a response body and its headers, evicting least recently used entries"""
+        key = self.key_for(url)
+        body_path, meta_path = self._paths(key)
+        meta = {
+            'url': url,
+            'status': status,
+            'headers': {k: v for k, v in headers.items() if k.lower() not in _WIRE_HEADERS},
+            'stored_at': time.time()
+        }
+
+        _write_atomic(body_path, body)
+        _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+        with self._lock:
+            self._size -= self._index.pop(key, 0)
+            self._index[key] = len(body)
+            self._size += len(body)
+            self._counters['stored'] += 1
+            self._evict()
+
+    def refresh(self, url, headers):
+        """Mark an entry fresh again after a 304, taking any updated validators"""
+        key = self.key_for(url)
+        _, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            for name in ('ETag', 'Last-Modified', 'Cache-Control', 'Expires'):
+                if name in headers:
+                    meta['headers'][name] = headers[name]
+            meta['stored_at'] = time.time()
+            _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        except (OSError, ValueError):
+            pass
+
+    def _evict(self):
+        """Drop least recently used entries until under the size cap (caller holds the lock)"""
+        while self._size > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._size -= size
+            self._counters['evicted'] += 1
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def record(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self):
+        """Entry count, size and hit/miss counters"""
+        with self._lock:
+            return {'entries': len(self._index), 'bytes': self._size, 'max_bytes': self.max_bytes,
+                    'ttl': self.ttl, **self._counters}
+
+class _CachingBody:
+    """Raw body of a streamed response that stores the decoded body once it has been read to the end.
+
+    A download that is abandoned part-way (an early-stop parse, a size cap) is
+    not cached. Everything else is delegated to the wrapped urllib3 response.
+    """
+    def __init__(self, raw, store):
+        self._raw = raw
+        self._store = store
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        chunks = []
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            chunks.append(chunk)
+            yield chunk
+        self._store(b''.join(chunks))
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+class CachingAdapter(HTTPAdapter):
+    """Transport adapter that answers GETs from an HttpCache.
+
+    Fresh entries are returned without touching the network; stale entries are
+    revalidated with If-None-Match / If-Modified-Since and reused on a 304.
+    Responses served from the cache carry an ``X-Cache`` header (HIT or REVALIDATED).
+    A ``stream=True`` response is cached only if its body is read to the end.
+    """
+    def __init__(self, cache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET':
+            return super().send(request, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record('hits')
+            return self._cached_response(request, entry, 'HIT')
+
+        if entry is not None:
+            etag = entry['headers'].get('ETag')
+            last_modified = entry['headers'].get('Last-Modified')
+            if etag:
+                request.headers['If-None-Match'] = etag
+            if last_modified:
+                request.headers['If-Modified-Since'] = last_modified
+
+        response = super().send(request, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            response.close()
+            self.cache.refresh(request.url, response.headers)
+            self.cache.record('revalidated')
+            return self._cached_response(request, entry, 'REVALIDATED')
+
+        self.cache.record('misses')
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        if response.status_code == 200 and 'no-store' not in cache_control:
+            if kwargs.get('stream'):
+                response.raw = _CachingBody(response.raw, partial(self.cache.put, request.url, response.status_code,
+                                                                  response.headers))
+            else:
+                self.cache.put(request.url, response.status_code, response.headers, response.content)
+        return response
+
+    def _cached_response(self, request, entry, state):
+        """Build a requests.Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.headers['X-Cache'] = state
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['body']
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+def install_cache(session, cache):
+    """Mount a CachingAdapter for http and https on a requests session"""
+    adapter = CachingAdapter(cache)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Latency and outcome metrics for the scrapers
+Stage timings go into per-platform histograms, results and errors into
+counters, and the whole registry renders in the Prometheus text format. A
+trace collects the stage timings of a single scrape. A SharedMetrics directory
+adds up the registries of several processes, such as pre-forked server workers
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+class Counter:
+    """Monotonic count per label combination"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def snapshot(self):
+        """The values as JSON-safe [labels, count] pairs"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def samples(self, snapshots=()):
+        """Samples of these values plus those in ``snapshots`` (from other processes)"""
+        with self._lock:
+            values = dict(self._values)
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                key = tuple(key)
+                values[key] = values.get(key, 0) + value
+        return [(self.name + _labels(self.label_names, key), value) for key, value in sorted(values.items())]
+
+class Histogram:
+    """Bucketed observations per label combination, with their sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """The values as JSON-safe [labels, [bucket counts, sum, count]] pairs"""
+        with self._lock:
+            return [[list(key), [list(counts), total, count]] for key, (counts, total, count) in self._values.items()]
+
+    def samples(self, snapshots=()):
+        """Samples of these values plus those in ``snapshots`` (from other processes)"""
+        with self._lock:
+            values = {key: [list(counts), total, count] for key, (counts, total, count) in self._values.items()}
+        for snapshot in snapshots:
+            for key, (counts, total, count) in snapshot:
+                # Series recorded with other buckets cannot be added up
+                if len(counts) != len(self.buckets) + 1:
+                    continue
+                series = values.setdefault(tuple(key), [[0] * len(counts), 0.0, 0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+        samples = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                samples.append((self.name + '_bucket' + _labels(self.label_names, key, [('le', le)]), cumulative))
+            samples.append((self.name + '_sum' + _labels(self.label_names, key), total))
+            samples.append((self.name + '_count' + _labels(self.label_names, key), count))
+        return samples
+
+class Registry:
+    """A set of metrics rendered together"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def snapshot(self):
+        """Every metric's values, as JSON-safe data another process can add to its own"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self, snapshots=()):
+        """All metrics in the Prometheus text exposition format, added up with ``snapshots`` of other processes"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            others = [snapshot[metric.name] for snapshot in snapshots if metric.name in snapshot]
+            for name, value in metric.samples(others):
+                lines.append(f'{name} {value:g}' if isinstance(value, float) else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+class SharedMetrics:
+    """A registry's totals across every process that shares ``directory``.
+
+    Each process writes a snapshot of its registry to a file of its own there,
+    every ``interval`` seconds from a daemon thread and on ``save``. ``render``
+    adds the latest snapshots of the other processes to this one's live values.
+    The thread starts on first use in each process, so a SharedMetrics created
+    before a fork works in every child. Snapshots of processes that have
+    exited are kept, so totals do not drop when a worker is replaced; ``clear``
+    the directory when the server starts.
+    """
+    def __init__(self, directory, registry=None, interval=5.0):
+        # Absolute, so a later chdir does not point the writer thread somewhere else
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.registry = registry or REGISTRY
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._path = None
+
+    @staticmethod
+    def clear(directory):
+        """Remove the snapshots left by an earlier run"""
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    def start(self):
+        """Start this process's writer thread if it is not running; returns this process's snapshot path"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                # The start time keeps a reused pid from overwriting an exited process's totals
+                self._path = os.path.join(self.directory, f'{self._pid}-{time.time_ns()}.json')
+                threading.Thread(target=self._run, name='metrics-writer', daemon=True).start()
+            return self._path
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            self.save()
+
+    def save(self):
+        """Write this process's snapshot now"""
+        path = self.start()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def render(self):
+        """The registry in the Prometheus text format, totalled over every process"""
+        own = self.start()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.json') or path == own:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return self.registry.render(snapshots)
+
+# Process-wide registry and the scrape metrics every scraper records into
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('scraper_stage_seconds', 'Time spent in each scrape stage', ('platform', 'stage'))
+RESULTS = REGISTRY.counter('scraper_results_total', 'Scrape results by outcome (ok, fallback or error)',
+                           ('platform', 'outcome'))
+ERRORS = REGISTRY.counter('scraper_errors_total', 'Scrape errors by exception type', ('platform', 'error'))
+
+class _Scope:
+    """Platform label and (inside a trace) the timings dict for the current scrape"""
+    def __init__(self, platform='unknown', timings=None):
+        self.platform = platform
+        self.timings = timings
+
+_scope = contextvars.ContextVar('scrape_scope', default=None)
+
+def current_platform():
+    scope = _scope.get()
+    return scope.platform if scope is not None else 'unknown'
+
+@contextmanager
+def platform_scope(platform):
+    """Label the stages recorded inside the block with ``platform``"""
+    outer = _scope.get()
+    token = _scope.set(_Scope(platform, outer.timings if outer is not None else None))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+@contextmanager
+def trace():
+    """Collect the timings of the stages recorded inside the block into the yielded dict"""
+    outer = _scope.get()
+    timings = {}
+    token = _scope.set(_Scope(outer.platform if outer is not None else 'unknown', timings))
+    try:
+        yield timings
+    finally:
+        _scope.reset(token)
+
+def observe(stage_name, seconds):
+    """Record a stage duration for the current platform (and trace, if any)"""
+    scope = _scope.get()
+    STAGE_SECONDS.observe(seconds, platform=current_platform(), stage=stage_name)
+    if scope is not None and scope.timings is not None:
+        scope.timings[stage_name] = scope.timings.get(stage_name, 0) + seconds
+
+@contextmanager
+def stage(stage_name):
+    """Time the block as one stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage_name, time.perf_counter() - start)
+
+def timed_iter(iterable, stage_name):
+    """Yield from ``iterable``, recording the time spent producing items as one stage"""
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        observe(stage_name, elapsed)
+
+def record_result(result, error=None):
+    """Count a scrape's outcome: ``error`` (an exception) or a result dict, which is a fallback when it has source.error.
+
+    An error raised ``from`` another is counted under the original error's type.
+    """
+    platform = current_platform()
+    if error is not None:
+        RESULTS.inc(platform=platform, outcome='error')
+        ERRORS.inc(platform=platform, error=type(error.__cause__ or error).__name__)
+        return
+    source = result.get('source') if isinstance(result, dict) else None
+    RESULTS.inc(platform=platform, outcome='fallback' if source and source.get('error') else 'ok')
+
+def count_error(error_type):
+    """Count an error the scraper recovered from (e.g. by returning fallback data)"""
+    ERRORS.inc(platform=current_platform(), error=error_type)
+
+def timings_ms(timings):
+    """A trace's timings rounded to milliseconds, for JSON output"""
+    return {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Product change detection and price history for the scrapers
+Each scraped product is reduced to a fingerprint of the fields a page is built
+from (title, price, images, description, ratings). A SQLite store keyed by
+canonical URL keeps the latest fingerprint with the page generated for it, so
+an unchanged product can reuse that page, and records a price point whenever
+the price moves
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from structured_data import parse_price
+from urls import normalize_url
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    url_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    page_id TEXT,
+    sales_copy TEXT,
+    render_version TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_changed REAL NOT NULL,
+    checks INTEGER NOT NULL DEFAULT 1,
+    changes INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS price_points (
+    url_key TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    current REAL,
+    original REAL,
+    currency TEXT
+);
+CREATE INDEX IF NOT EXISTS price_points_by_url ON price_points (url_key, observed_at);
+'''
+
+def _clean(text):
+    return re.sub(r'\s+', ' ', text).strip() if isinstance(text, str) else text
+
+def product_price(product):
+    """(current, original, currency) of a product.
+
+    Takes the backend scraper's price object as well as the display price
+    string the Flask app scrapes (which has no original price).
+    """
+    price = product.get('price')
+    if isinstance(price, dict):
+        return price.get('current'), price.get('original'), price.get('currency')
+    current, currency = parse_price(price)
+    return current, None, currency
+
+def product_fingerprint(product):
+    """Hash of the fields a sales page is built from; scrape times and other metadata are left out.
+
+    Whitespace in the title and description is collapsed first, so reflowed
+    markup does not count as a change.
+    """
+    reviews = product.get('reviews') or {}
+    images = product.get('images') or ([product['image']] if product.get('image') else [])
+    fields = {
+        'title': _clean(product.get('title')),
+        'price': list(product_price(product)),
+        'images': [image.get('url') if isinstance(image, dict) else image for image in images],
+        'description': _clean(product.get('description')),
+        'rating': [reviews.get('average_rating'), reviews.get('total_reviews')]
+    }
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+def _iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+class PriceHistory:
+    """SQLite store of product fingerprints and price points, indexed by canonical URL.
+
+    ``record`` files a scrape: the first one of a URL and every one whose
+    fingerprint differs from the last count as changes, and a price point is
+    added when the price is not the one last recorded. ``lookup`` returns what
+    is known about a URL (including the page and sales copy generated for its
+    current fingerprint) and ``history`` its price points. The database is in
+    WAL mode so several processes can share it, and each process opens its own
+    connection on first use, so a store created before a fork stays safe.
+    """
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._counters = {'new': 0, 'changed': 0, 'unchanged': 0}
+        self._conn = None
+        self._pid = None
+        with self._lock:
+            self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        """This process's connection (caller holds the lock)"""
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction, taking the database lock up front"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def lookup(self, url):
+        """What is stored for a URL, or None if it was never recorded"""
+        with self._lock:
+            row = self._connection().execute('SELECT * FROM products WHERE url_key = ?', (normalize_url(url),)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry['sales_copy'] = json.loads(entry['sales_copy']) if entry['sales_copy'] else None
+        return entry
+
+    def record(self, url, product, fingerprint=None, page_id=None, sales_copy=None, render_version=None):
+        """File a scrape of ``url``; returns 'new', 'changed' or 'unchanged'.
+
+        ``page_id``, ``sales_copy`` and ``render_version`` describe the page
+        generated for this fingerprint. Unchanged products keep the ones stored
+        before unless new ones are given; a change drops them.
+        """
+        key = normalize_url(url)
+        fingerprint = fingerprint or product_fingerprint(product)
+        copy_json = json.dumps(sales_copy, ensure_ascii=False) if sales_copy is not None else None
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT fingerprint FROM products WHERE url_key = ?', (key,)).fetchone()
+            if row is None:
+                outcome = 'new'
+                conn.execute(
+                    'INSERT INTO products (url_key, url, fingerprint, page_id, sales_copy, render_version, '
+                    'first_seen, last_seen, last_changed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, url, fingerprint, page_id, copy_json, render_version, now, now, now)
+                )
+            elif row['fingerprint'] == fingerprint:
+                outcome = 'unchanged'
+                conn.execute(
+                    'UPDATE products SET url = ?, last_seen = ?, checks = checks + 1, '
+                    'page_id = COALESCE(?, page_id), sales_copy = COALESCE(?, sales_copy), '
+                    'render_version = COALESCE(?, render_version) WHERE url_key = ?',
+                    (url, now, page_id, copy_json, render_version, key)
+                )
+            else:
+                outcome = 'changed'
+                conn.execute(
+                    'UPDATE products SET url = ?, fingerprint = ?, page_id = ?, sales_copy = ?, render_version = ?, '
+                    'last_seen = ?, last_changed = ?, checks = checks + 1, changes = changes + 1 WHERE url_key = ?',
+                    (url, fingerprint, page_id, copy_json, render_version, now, now, key)
+                )
+
+            if outcome != 'unchanged':
+                last = conn.execute(
+                    'SELECT current, original, currency FROM price_points WHERE url_key = ? '
+                    'ORDER BY observed_at DESC LIMIT 1', (key,)
+                ).fetchone()
+                price = product_price(product)
+                if last is None or tuple(last) != price:
+                    conn.execute('INSERT INTO price_points VALUES (?, ?, ?, ?, ?)', (key, now) + price)
+            self._counters[outcome] += 1
+        return outcome
+
+    def history(self, url, since=None, limit=None):
+        """Price points of a URL, oldest first, with its tracking summary; None if it was never recorded.
+
+        ``since`` is a Unix time; ``limit`` keeps only the latest points.
+        """
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        query = 'SELECT observed_at, current, original, currency FROM price_points WHERE url_key = ? AND observed_at >= ?'
+        params = [entry['url_key'], since or 0]
+        if limit:
+            query = f'SELECT * FROM ({query} ORDER BY observed_at DESC LIMIT ?)'
+            params.append(limit)
+        with self._lock:
+            rows = self._connection().execute(query + ' ORDER BY observed_at', params).fetchall()
+        return {
+            'url': entry['url'],
+            'fingerprint': entry['fingerprint'],
+            'first_seen': _iso(entry['first_seen']),
+            'last_seen': _iso(entry['last_seen']),
+            'last_changed': _iso(entry['last_changed']),
+            'checks': entry['checks'],
+            'changes': entry['changes'],
+            'prices': [dict(row, observed_at=_iso(row['observed_at'])) for row in rows]
+        }
+
+    def stats(self):
+        """Products tracked, price points stored and this process's record outcomes"""
+        with self._lock:
+            conn = self._connection()
+            products = conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+            points = conn.execute('SELECT COUNT(*) FROM price_points').fetchone()[0]
+            return dict(self._counters, products=products, price_points=points)
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._conn.close()
+            self._conn = self._pid = None
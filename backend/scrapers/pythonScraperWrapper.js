@@ -1,117 +1,197 @@
 const { spawn } = require('child_process');
 const path = require('path');
+const readline = require('readline');
 
 /**
  * Python Scraper Wrapper
- * Calls the Python scraper as a subprocess and returns the result
+ * Keeps one long-lived Python worker process (python_scraper.py --worker)
+ * and talks to it with JSON lines over stdin/stdout
  */
 
+const PYTHON_COMMAND = process.env.PYTHON || 'python';
+const SCRAPE_TIMEOUT_MS = 30000; // 30 second timeout
+const STARTUP_TIMEOUT_MS = 5000;
+const UNAVAILABLE_RECHECK_MS = 60000;
+
+let worker = null;
+let unavailableUntil = 0;
+
+/**
+ * Starts the Python worker process and wires up its response handling
+ * @returns {Object} Worker state
+ */
+function startWorker() {
+  const pythonScript = path.join(__dirname, 'python_scraper.py');
+  const child = spawn(PYTHON_COMMAND, [pythonScript, '--worker'], {
+    cwd: __dirname,
+    stdio: ['pipe', 'pipe', 'pipe']
+  });
+
+  const state = {
+    child,
+    nextId: 1,
+    pending: new Map(),
+    ready: null,
+    alive: false
+  };
+
+  state.ready = new Promise((resolve, reject) => {
+    state.onReady = resolve;
+    state.onStartFailed = reject;
+  });
+  // Avoid unhandled rejections when nobody is waiting on startup
+  state.ready.catch(() => {});
+
+  const lines = readline.createInterface({ input: child.stdout });
+  lines.on('line', (line) => {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (err) {
+      console.warn('Ignoring non-JSON output from Python worker:', line);
+      return;
+    }
+
+    if (message.ready) {
+      state.onReady();
+      return;
+    }
+
+    const entry = state.pending.get(message.id);
+    if (!entry) {
+      return;
+    }
+    state.pending.delete(message.id);
+    clearTimeout(entry.timer);
+
+    if (message.error) {
+      entry.reject(new Error(message.error));
+    } else {
+      entry.resolve(message);
+    }
+  });
+
+  child.stdin.on('error', (err) => {
+    console.warn('Python worker stdin closed:', err.message);
+  });
+
+  child.stderr.on('data', (data) => {
+    console.warn('Python worker:', data.toString().trim());
+  });
+
+  const fail = (err) => {
+    state.alive = false;
+    if (worker === state) {
+      worker = null;
+    }
+    state.onStartFailed(err);
+    for (const entry of state.pending.values()) {
+      clearTimeout(entry.timer);
+      entry.reject(err);
+    }
+    state.pending.clear();
+  };
+
+  child.on('error', (err) => {
+    fail(new Error(`Failed to start Python process: ${err.message}`));
+  });
+
+  child.on('close', (code) => {
+    fail(new Error(`Python worker exited with code ${code}`));
+  });
+
+  return state;
+}
+
+/**
+ * Returns the running worker, starting a new one if needed
+ * @returns {Object} Worker state
+ */
+function getWorker() {
+  if (!worker) {
+    worker = startWorker();
+  }
+  return worker;
+}
+
+/**
+ * Sends one request to the Python worker
+ * The worker gets the same timeout and abandons the request once it passes;
+ * a reply that still arrives after the timeout is ignored
+ * @param {Object} payload - Request body (op and its arguments)
+ * @param {number} timeoutMs - How long to wait for the response
+ * @returns {Promise<Object>} Worker response
+ */
+function sendRequest(payload, timeoutMs) {
+  const state = getWorker();
+  const id = state.nextId++;
+
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      // Only this request times out; the worker and its other requests carry on
+      state.pending.delete(id);
+      reject(new Error('Python scraper timeout'));
+    }, timeoutMs);
+
+    state.pending.set(id, { resolve, reject, timer });
+    state.child.stdin.write(JSON.stringify({ id, timeout_ms: timeoutMs, ...payload }) + '\n');
+  });
+}
+
 /**
  * Scrapes a product using the Python scraper
  * @param {string} url - The product URL to scrape
  * @returns {Promise<Object>} Scraped product data
  */
 async function scrapeWithPython(url) {
-  return new Promise((resolve, reject) => {
-    const pythonScript = path.join(__dirname, 'python_scraper.py');
-    
-    // Create a temporary script to run the scraper with the URL
-    const tempScript = `
-import sys
-import json
-from python_scraper import ProductScraper
-
-if len(sys.argv) > 1:
-    url = sys.argv[1]
-    scraper = ProductScraper()
-    result = scraper.scrape_product(url)
-    print(json.dumps(result))
-else:
-    print(json.dumps({"error": "No URL provided"}))
-`;
-
-    // Write temp script
-    const fs = require('fs');
-    const tempScriptPath = path.join(__dirname, 'temp_scraper.py');
-    fs.writeFileSync(tempScriptPath, tempScript);
-
-    // Run Python script
-    const pythonProcess = spawn('python', [tempScriptPath, url], {
-      cwd: __dirname,
-      stdio: ['pipe', 'pipe', 'pipe']
-    });
-
-    let output = '';
-    let errorOutput = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-      output += data.toString();
-    });
-
-    pythonProcess.stderr.on('data', (data) => {
-      errorOutput += data.toString();
-    });
-
-    pythonProcess.on('close', (code) => {
-      // Clean up temp file
-      try {
-        fs.unlinkSync(tempScriptPath);
-      } catch (err) {
-        console.warn('Could not delete temp script:', err.message);
-      }
-
-      if (code === 0) {
-        try {
-          const result = JSON.parse(output);
-          resolve(result);
-        } catch (err) {
-          reject(new Error(`Failed to parse Python output: ${err.message}\nOutput: ${output}`));
-        }
-      } else {
-        reject(new Error(`Python script failed with code ${code}\nError: ${errorOutput}\nOutput: ${output}`));
-      }
-    });
-
-    pythonProcess.on('error', (err) => {
-      reject(new Error(`Failed to start Python process: ${err.message}`));
-    });
-
-    // Set timeout
-    setTimeout(() => {
-      pythonProcess.kill();
-      reject(new Error('Python scraper timeout'));
-    }, 30000); // 30 second timeout
-  });
+  const response = await sendRequest({ op: 'scrape', url }, SCRAPE_TIMEOUT_MS);
+  return response.result;
 }
 
 /**
  * Checks if Python and required packages are available
+ * A running worker answers immediately; a failed start is remembered for a minute
  * @returns {Promise<boolean>} True if Python scraper is available
  */
 async function checkPythonAvailability() {
-  return new Promise((resolve) => {
-    const pythonProcess = spawn('python', ['-c', 'import requests, bs4, selenium; print("OK")'], {
-      stdio: ['pipe', 'pipe', 'pipe']
-    });
-
-    pythonProcess.on('close', (code) => {
-      resolve(code === 0);
-    });
-
-    pythonProcess.on('error', () => {
-      resolve(false);
-    });
-
-    // Timeout after 5 seconds
-    setTimeout(() => {
-      pythonProcess.kill();
-      resolve(false);
-    }, 5000);
-  });
+  if (worker && worker.alive) {
+    return true;
+  }
+  if (Date.now() < unavailableUntil) {
+    return false;
+  }
+
+  try {
+    const state = getWorker();
+    let timer;
+    await Promise.race([
+      state.ready,
+      new Promise((_, reject) => {
+        timer = setTimeout(() => reject(new Error('startup timeout')), STARTUP_TIMEOUT_MS);
+      })
+    ]).finally(() => clearTimeout(timer));
+    await sendRequest({ op: 'ping' }, STARTUP_TIMEOUT_MS);
+    state.alive = true;
+    return true;
+  } catch (err) {
+    unavailableUntil = Date.now() + UNAVAILABLE_RECHECK_MS;
+    return false;
+  }
+}
+
+/**
+ * Stops the Python worker process
+ */
+function stopPythonWorker() {
+  if (worker) {
+    const state = worker;
+    worker = null;
+    state.child.stdin.end(JSON.stringify({ op: 'shutdown' }) + '\n');
+  }
 }
 
 module.exports = {
   scrapeWithPython,
-  checkPythonAvailability
+  checkPythonAvailability,
+  stopPythonWorker
 };
-
@@ -5,202 +5,871 @@ Alternative scraper using requests, BeautifulSoup, and Selenium for better data
 """
 
 import requests
-from bs4 import BeautifulSoup
+import argparse
+import asyncio
+import contextvars
 import json
+import os
 import re
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from urllib.parse import urlparse, urljoin
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+# Selenium is imported inside the browser code paths: it is slow to import and
+# generic pages and static-tier AliExpress pages never need it
+
+import aliexpress_static
+import metrics
+from async_engine import AsyncFetcher, scrape_many_async
+from browser_profiles import STANDARD_PROFILE, lean_profile, load_profiles
+from concurrency import scrape_many
+from crawler import Crawler
+from html_parsing import PARSE_MODES, PageParser
+from http_cache import HttpCache
+from price_history import PriceHistory, product_fingerprint
+from rate_limit import RateLimiter, RetryPolicy, deadline, install_limiter
+from result_cache import ResultCache, is_scrape_error
+from selector_engine import SelectorEngine
+from selector_stats import SelectorStats
+from singleflight import SingleFlight
+from streaming import DEFAULT_MAX_BODY_BYTES, FETCH_MODES, PAGE_ACCEPT_ENCODING, content_length, iter_body, read_body, response_text
+from structured_data import STRUCTURED_DATA_SELECTORS, extract_structured_data, has_required_fields, parse_price
+from urls import normalize_url, platform_for
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+CHROME_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Ordered selector fallbacks for AliExpress fields; the first usable match wins
+ALIEXPRESS_SELECTORS = {
+    'title': [
+        'h1[data-pl="product-title"]',
+        '.product-title-text',
+        'h1.product-title',
+        'h1',
+        '.title-text'
+    ],
+    'price': [
+        '.notranslate',
+        '[data-pl="product-price"]',
+        '.price-current',
+        '.price',
+        '.product-price'
+    ],
+    'description': [
+        '.product-description',
+        '[data-pl="product-description"]',
+        '.product-detail-description',
+        '.description'
+    ],
+    'images': [
+        '.images-view-item img',
+        '.product-image img',
+        '.gallery-image img',
+        'img[src*="alicdn"]'
+    ],
+    'reviews': {
+        'items': '.review-item, .feedback-item',
+        'rating': '.star-view, .rating',
+        'comment': '.buyer-feedback',
+        'author': '.buyer-name'
+    }
+}
+
+# AliExpress fields whose selector lists are cascades that SelectorStats can reorder
+ALIEXPRESS_CASCADE_FIELDS = ('title', 'price', 'description', 'images')
+
+# How each browser platform is loaded: eager page load, no images, fonts, media or
+# trackers, and waits for the product fields (seconds after the page is requested)
+# instead of for <body>
+BROWSER_PROFILES = {
+    'aliexpress': lean_profile(ALIEXPRESS_SELECTORS, {'title': 8, 'price': 10, 'images': 10})
+}
+
+# Collects the raw text/attributes for every selector in ALIEXPRESS_SELECTORS in a
+# single WebDriver round-trip. Results stay aligned with the selector lists so the
+# Python side can apply the same fallback order as the element-by-element path.
+ALIEXPRESS_EXTRACT_SCRIPT = """
+var spec = arguments[0];
+function query(root, selector, all) {
+    try {
+        return all ? Array.prototype.slice.call(root.querySelectorAll(selector)) : root.querySelector(selector);
+    } catch (e) {
+        return all ? [] : null;
+    }
+}
+function text(element) {
+    return element ? (element.innerText || element.textContent || '') : null;
+}
+function firstTexts(selectors) {
+    return selectors.map(function (selector) { return text(query(document, selector, false)); });
+}
+return {
+    title: firstTexts(spec.title),
+    price: firstTexts(spec.price),
+    description: firstTexts(spec.description),
+    images: spec.images.map(function (selector) {
+        return query(document, selector, true).slice(0, 5).map(function (img) {
+            return {src: img.src || img.getAttribute('src'), data_src: img.getAttribute('data-src'), alt: img.getAttribute('alt')};
+        });
+    }),
+    reviews: query(document, spec.reviews.items, true).slice(0, 3).map(function (review) {
+        return {
+            rating: text(query(review, spec.reviews.rating, false)),
+            comment: text(query(review, spec.reviews.comment, false)),
+            author: text(query(review, spec.reviews.author, false))
+        };
+    })
+};
+"""
+
+# Ordered price selectors for generic pages
+GENERIC_PRICE_SELECTORS = [
+    '[itemprop="price"]',
+    '.price',
+    '.product-price',
+    '[class*="price"]'
+]
+
+GENERIC_SELECTOR_ENGINE = SelectorEngine({
+    'title': ['title'],
+    'description': ['meta[name="description"]'],
+    'price': GENERIC_PRICE_SELECTORS,
+    'images': ['img[src]'],
+    'structured': STRUCTURED_DATA_SELECTORS
+})
+
+def _generic_parse_complete(soup, orders=None):
+    """Early-stop check: JSON-LD / OpenGraph have every field, or title, description, price (in its ``orders``
+    order) and the first five images are settled. Microdata is left out: reading it scans the whole tree"""
+    if has_required_fields(extract_structured_data(soup, microdata=False)):
+        return True
+    matches = GENERIC_SELECTOR_ENGINE.match(soup)
+    return (
+        GENERIC_SELECTOR_ENGINE.settled(matches, 'title')
+        and GENERIC_SELECTOR_ENGINE.settled(matches, 'description')
+        and GENERIC_SELECTOR_ENGINE.settled(matches, 'price', lambda element: element.text.strip(),
+                                            (orders or {}).get('price'))
+        and len(soup.find_all('img', src=True, limit=5)) == 5
+    )
+
+DEFAULT_HTTP_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'http')
+DEFAULT_RESULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'results')
+DEFAULT_SELECTOR_STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'selectors.json')
+DEFAULT_PRICE_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'price_history.sqlite3')
+
+PLACEHOLDER_IMAGE = {'url': 'https://via.placeholder.com/400x300?text=No+Image', 'alt': 'No Image', 'is_primary': True}
+
+def build_chrome_options(profile=None):
+    """Headless Chrome options used for browser scraping, with a profile's launch settings"""
+    from selenium.webdriver.chrome.options import Options
+    
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument(f'--user-agent={CHROME_USER_AGENT}')
+    if profile is not None:
+        chrome_options.page_load_strategy = profile.page_load_strategy
+        if profile.blocks_images:
+            chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+            chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    return chrome_options
+
+class _PooledDriver:
+    """A pooled WebDriver and the bookkeeping used to decide when to recycle it"""
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+class WebDriverPool:
+    """Bounded pool of warm headless Chrome drivers.
+
+    Drivers are launched lazily up to ``max_size`` and handed back out after each
+    page instead of being quit. State is cleared when a driver is returned, a
+    driver is recycled after ``max_pages`` pages or once its memory use passes
+    ``max_memory_mb``, and idle drivers are health-checked before each lease.
+    Browsers are launched with the settings of ``profile`` (a BrowserProfile).
+    """
+    def __init__(self, max_size=2, max_pages=50, max_memory_mb=1024, acquire_timeout=60, options_factory=None,
+                 profile=None):
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.acquire_timeout = acquire_timeout
+        self.profile = profile or STANDARD_PROFILE
+        self.options_factory = options_factory or (lambda: build_chrome_options(self.profile))
+        
+        self._idle = []
+        self._live = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._counters = {'hits': 0, 'misses': 0, 'recycled': 0, 'discarded': 0}
+    
+    def acquire(self):
+        """Lend out a healthy driver, launching one if the pool has room"""
+        expires_at = time.monotonic() + self.acquire_timeout
+        
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError('WebDriver pool is closed')
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._live < self.max_size:
+                        self._live += 1
+                        self._counters['misses'] += 1
+                        break
+                    
+                    remaining = expires_at - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError('Timed out waiting for a browser from the pool')
+                    self._cond.wait(remaining)
+            
+            if entry is None:
+                return self._launch()
+            
+            if self._is_healthy(entry.driver):
+                with self._cond:
+                    self._counters['hits'] += 1
+                return entry
+            
+            self._retire(entry, 'discarded')
+    
+    def release(self, entry):
+        """Take a driver back, resetting or recycling it"""
+        entry.pages += 1
+        
+        recycle = self._closed or entry.pages >= self.max_pages
+        if not recycle and self._memory_mb(entry.driver) > self.max_memory_mb:
+            recycle = True
+        if not recycle and not self._reset(entry.driver):
+            recycle = True
+        
+        if recycle:
+            self._retire(entry, 'recycled')
+            return
+        
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+    
+    @contextmanager
+    def lease(self):
+        """Context manager that acquires a driver and always returns it"""
+        entry = self.acquire()
+        try:
+            yield entry.driver
+        finally:
+            self.release(entry)
+    
+    def stats(self):
+        """Pool size and hit/miss counters"""
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'live': self._live,
+                'idle': len(self._idle),
+                'in_use': self._live - len(self._idle),
+                **self._counters
+            }
+    
+    def close(self):
+        """Quit every idle driver; leased drivers are quit when returned"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        
+        for entry in idle:
+            self._retire(entry)
+    
+    def _launch(self):
+        """Start a new browser for a slot already reserved by acquire"""
+        from selenium import webdriver
+        
+        try:
+            with metrics.stage('driver_launch'):
+                driver = webdriver.Chrome(options=self.options_factory())
+            driver.set_page_load_timeout(self.profile.page_timeout)
+            return _PooledDriver(driver)
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+    
+    def _retire(self, entry, counter=None):
+        """Quit a driver and free its slot"""
+        with self._cond:
+            self._live -= 1
+            if counter:
+                self._counters[counter] += 1
+            self._cond.notify()
+        
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+    
+    def _is_healthy(self, driver):
+        """Check the browser still answers before handing it out"""
+        try:
+            return driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+    
+    def _reset(self, driver):
+        """Clear cookies and storage so the next lease starts clean"""
+        try:
+            driver.delete_all_cookies()
+            driver.execute_script('try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}')
+            driver.get('about:blank')
+            return True
+        except Exception:
+            return False
+    
+    def _memory_mb(self, driver):
+        """Resident memory of the browser process tree, or the page JS heap without psutil"""
+        try:
+            if psutil is not None:
+                process = psutil.Process(driver.service.process.pid)
+                processes = [process] + process.children(recursive=True)
+                return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+            heap = driver.execute_script('return performance.memory ? performance.memory.usedJSHeapSize : 0')
+            return (heap or 0) / (1024 * 1024)
+        except Exception:
+            return 0
 
 class ProductScraper:
-    def __init__(self):
+    def __init__(self, driver_pool=None, extraction_mode='script', parser='auto', parse_mode='strained', http_cache=None,
+                 result_cache=None, aliexpress_mode='auto', browser_profiles=None, rate_limiter=None, retry_policy=None,
+                 selector_stats=None, fetch_mode='stream', max_body_bytes=DEFAULT_MAX_BODY_BYTES, price_history=None):
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode: {fetch_mode}")
+        self.driver_pool = driver_pool or WebDriverPool()
+        self.page_parser = PageParser(parser, parse_mode, GENERIC_SELECTOR_ENGINE, _generic_parse_complete)
+        # 'script' collects every AliExpress field in one execute_script call,
+        # 'element' walks the selectors with individual find_element calls
+        self.extraction_mode = extraction_mode
+        # 'auto' reads the state embedded in the static page and only starts a browser
+        # when fields are missing; 'static' and 'browser' use just that one tier
+        self.aliexpress_mode = aliexpress_mode
+        # Per-platform BrowserProfile: resource blocking and field waits for browser scrapes
+        self.browser_profiles = browser_profiles or BROWSER_PROFILES
+        # 'stream' parses generic pages as they download and stops reading once the fields
+        # are found; 'buffered' reads the body first. Either way bodies over max_body_bytes
+        # are cut off
+        self.fetch_mode = fetch_mode
+        self.max_body_bytes = max_body_bytes
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'User-Agent': CHROME_USER_AGENT,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
+            'Accept-Encoding': PAGE_ACCEPT_ENCODING,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        # Every fetch (session, async engine and browser) waits for a slot on its domain;
+        # transient HTTP failures are retried instead of becoming fallback data
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Optional on-disk cache for the static fetches (HttpCache instance); hits skip the limiter
+        self.http_cache = http_cache
+        install_limiter(self.session, self.rate_limiter, self.retry_policy, cache=http_cache)
+        # Optional product-level cache of scrape_product results (ResultCache instance)
+        self.result_cache = result_cache
+        # Concurrent scrapes of the same URL share one fetch / browser session
+        self.single_flight = SingleFlight()
+        # Optional per-domain record of winning selectors, used to try them first (SelectorStats instance)
+        self.selector_stats = selector_stats
+        # Optional store of product fingerprints and price points (PriceHistory instance)
+        self.price_history = price_history
     
     def scrape_product(self, url):
-        """Main scraping function that determines platform and delegates"""
+        """Main scraping function; answers from the result cache when one is configured"""
+        if self.result_cache is not None:
+            result = self.result_cache.get_or_scrape(url, self._scrape_coalesced)
+        else:
+            result = self._scrape_coalesced(url)
+        return self._record_history(url, result)
+    
+    def _scrape_coalesced(self, url):
+        """Scrape a URL, joining an identical scrape that is already running"""
+        return self.single_flight.do(normalize_url(url), self._scrape_product, url)
+    
+    def _scrape_product(self, url):
+        """Determine the platform and delegate to its scraper, recording its timing and outcome"""
+        platform = platform_for(url)
+        
+        with metrics.platform_scope(platform):
+            with metrics.stage('scrape'):
+                if platform == 'AliExpress':
+                    result = self.scrape_aliexpress(url)
+                elif platform == 'Amazon':
+                    result = self.scrape_amazon(url)
+                elif platform == 'eBay':
+                    result = self.scrape_ebay(url)
+                else:
+                    result = self.scrape_generic(url)
+            metrics.record_result(result)
+        return result
+    
+    def _record_history(self, url, result):
+        """File a successful result in the price history; returns a copy marked with its fingerprint and whether it changed.
+
+        Runs on every answer, cached ones included, and leaves the cached
+        result itself unmarked, so ``changed`` is relative to the last answer.
+        """
+        if self.price_history is None or is_scrape_error(result):
+            return result
+        fingerprint = product_fingerprint(result)
+        outcome = self.price_history.record(url, result, fingerprint)
+        source = dict(result.get('source') or {}, fingerprint=fingerprint, changed=outcome != 'unchanged')
+        return dict(result, source=source)
+    
+    def scrape_many(self, urls, max_workers=8, max_per_domain=2):
+        """Scrape many URLs concurrently, yielding (url, result, error) as each finishes"""
+        return scrape_many(self.scrape_product, urls, max_workers=max_workers, max_per_domain=max_per_domain)
+    
+    async def scrape_product_async(self, url, fetcher=None):
+        """Async scrape; static pages use the async engine, browser pages run on a thread"""
+        with metrics.platform_scope(platform_for(url)):
+            with metrics.stage('scrape'):
+                result = await self._scrape_product_async(url, fetcher)
+            metrics.record_result(result)
+        return self._record_history(url, result)
+    
+    async def _scrape_product_async(self, url, fetcher):
         domain = urlparse(url).netloc.lower()
         
         if 'aliexpress' in domain:
-            return self.scrape_aliexpress(url)
+            loop = asyncio.get_running_loop()
+            # Run in a copy of the current context so the browser stages keep the platform label
+            return await loop.run_in_executor(None, contextvars.copy_context().run, self.scrape_aliexpress, url)
         elif 'amazon' in domain:
             return self.scrape_amazon(url)
         elif 'ebay' in domain:
             return self.scrape_ebay(url)
-        else:
-            return self.scrape_generic(url)
+        
+        if fetcher is None:
+            async with self.async_fetcher() as fetcher:
+                return await self.scrape_generic_async(url, fetcher)
+        return await self.scrape_generic_async(url, fetcher)
+    
+    async def scrape_generic_async(self, url, fetcher):
+        """Generic scraper on the async engine; parsing runs off the event loop"""
+        try:
+            with metrics.stage('fetch'):
+                content = await fetcher.fetch(url)
+            return await fetcher.run_parse(self._parse_generic, url, content)
+        except Exception as e:
+            return self._create_fallback_data(url, 'Generic', str(e), type(e).__name__)
+    
+    async def scrape_many_async(self, urls, max_concurrency=100, limit_per_host=8):
+        """Scrape many URLs from one event loop, yielding (url, result, error) as each finishes"""
+        async with self.async_fetcher(limit=max_concurrency, limit_per_host=limit_per_host) as fetcher:
+            async for item in scrape_many_async(lambda url: self.scrape_product_async(url, fetcher), urls, max_concurrency):
+                yield item
+    
+    def async_fetcher(self, **kwargs):
+        """AsyncFetcher sharing this scraper's request headers"""
+        return AsyncFetcher(headers=self.session.headers, limiter=self.rate_limiter, retry=self.retry_policy,
+                            max_bytes=self.max_body_bytes, **kwargs)
     
     def scrape_aliexpress(self, url):
+        """AliExpress scraper: embedded page state first, Selenium when fields are missing"""
+        if self.aliexpress_mode != 'browser':
+            product_data = self._scrape_aliexpress_static(url)
+            if product_data is not None:
+                return product_data
+            if self.aliexpress_mode == 'static':
+                return self._create_fallback_data(url, 'AliExpress', 'Product state not found in page', 'MissingFields')
+        
+        return self._scrape_aliexpress_browser(url)
+    
+    def _scrape_aliexpress_static(self, url):
+        """Product data from the JSON state embedded in the initial HTML, or None if incomplete"""
+        try:
+            with metrics.stage('fetch'):
+                response = self.session.get(url, timeout=10, stream=True)
+            with response:
+                response.raise_for_status()
+                with metrics.stage('download'):
+                    html = response_text(response, read_body(response, self.max_body_bytes))
+        except requests.RequestException as e:
+            metrics.count_error(type(e).__name__)
+            return None
+        
+        with metrics.stage('parse'):
+            state = aliexpress_static.extract_fields(html)
+        if not aliexpress_static.has_required_fields(state):
+            return None
+        
+        images = []
+        for src in state['images']:
+            self._add_image(images, src, state['title'])
+        if not images:
+            return None
+        
+        price = state['price']
+        original = state.get('original_price', price)
+        discount = round((original - price) / original * 100) if original > price else 0
+        stock = state.get('stock')
+        
+        fields = {
+            'title': state['title'],
+            'price': {
+                'current': price,
+                'original': original,
+                'currency': state.get('currency', 'USD'),
+                'discount_percentage': discount
+            },
+            'description': state.get('description', 'Product description not available')[:500],
+            'images': images,
+            'reviews': {
+                'average_rating': state.get('rating', 0),
+                'total_reviews': state.get('review_count', 0),
+                'recent_reviews': []
+            }
+        }
+        availability = self._extract_availability_aliexpress(None)
+        if stock is not None:
+            availability['in_stock'] = stock > 0
+            availability['stock_quantity'] = stock
+        
+        return self._aliexpress_product_data(url, fields, availability, 'static')
+    
+    def _scrape_aliexpress_browser(self, url):
         """AliExpress scraper using Selenium for dynamic content"""
         # print(f"Scraping AliExpress URL: {url}")
         
-        # Setup Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+        profile = self.browser_profiles.get('aliexpress', STANDARD_PROFILE)
         
-        driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.get(url)
+            lease_started = time.perf_counter()
+            with self.driver_pool.lease() as driver:
+                metrics.observe('driver_lease', time.perf_counter() - lease_started)
+                self._load_page(driver, url, profile)
+                
+                # Extract product data
+                fields = self._extract_fields_aliexpress(driver, url)
+                availability = self._extract_availability_aliexpress(driver)
+                return self._aliexpress_product_data(url, fields, availability, 'browser')
             
+        except Exception as e:
+            # print(f"Error scraping AliExpress: {str(e)}")
+            return self._create_fallback_data(url, 'AliExpress', str(e), type(e).__name__)
+    
+    def _load_page(self, driver, url, profile):
+        """Navigate with a profile's resource blocking, then wait for its product fields"""
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': profile.blocked_url_patterns()})
+        except (WebDriverException, AttributeError):
+            pass
+        
+        started = time.monotonic()
+        ticket = self.rate_limiter.acquire(url)
+        try:
+            with metrics.stage('navigate'):
+                driver.get(url)
+        except TimeoutException:
+            self.rate_limiter.release(ticket, error=True)
+            metrics.count_error('PageLoadTimeout')
+            # Extract whatever has loaded rather than failing the whole page
+            driver.execute_script('window.stop();')
+        except Exception:
+            self.rate_limiter.release(ticket, error=True)
+            raise
+        else:
+            self.rate_limiter.release(ticket)
+        
+        with metrics.stage('field_wait'):
+            self._wait_for_fields(driver, profile, started)
+    
+    def _wait_for_fields(self, driver, profile, started):
+        """Wait for the profile's fields, each until its deadline after ``started``"""
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        
+        if not profile.field_waits:
             # Wait for page to load
             WebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
-            
-            # Extract product data
-            product_data = {
-                'id': f"aliexpress_{int(time.time())}",
-                'title': self._extract_title_aliexpress(driver),
-                'brand': 'AliExpress',
-                'price': self._extract_price_aliexpress(driver),
-                'description': self._extract_description_aliexpress(driver),
-                'images': self._extract_images_aliexpress(driver),
-                'reviews': self._extract_reviews_aliexpress(driver),
-                'availability': self._extract_availability_aliexpress(driver),
-                'source': {
-                    'url': url,
-                    'platform': 'AliExpress',
-                    'scraped_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
-                }
+            return
+        
+        # Each field gets until its own deadline (measured from navigation) to appear;
+        # a field that misses it is left to the extraction fallbacks
+        for field, (selectors, deadline) in profile.field_waits.items():
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                continue
+            try:
+                WebDriverWait(driver, remaining).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, ', '.join(selectors)))
+                )
+            except TimeoutException:
+                continue
+    
+    def _aliexpress_product_data(self, url, fields, availability, tier):
+        """Assemble the AliExpress result; ``tier`` records whether the static page or the browser produced it"""
+        return {
+            'id': f"aliexpress_{int(time.time())}",
+            'title': fields['title'],
+            'brand': 'AliExpress',
+            'price': fields['price'],
+            'description': fields['description'],
+            'images': fields['images'],
+            'reviews': fields['reviews'],
+            'availability': availability,
+            'source': {
+                'url': url,
+                'platform': 'AliExpress',
+                'tier': tier,
+                'scraped_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
             }
-            
-            return product_data
-            
-        except Exception as e:
-            # print(f"Error scraping AliExpress: {str(e)}")
-            return self._create_fallback_data(url, 'AliExpress', str(e))
-        finally:
-            if driver:
-                driver.quit()
-    
-    def _extract_title_aliexpress(self, driver):
-        """Extract product title from AliExpress"""
-        selectors = [
-            'h1[data-pl="product-title"]',
-            '.product-title-text',
-            'h1.product-title',
-            'h1',
-            '.title-text'
+        }
+    
+    def _selector_orders(self, url, fields):
+        """Selector order for each field on this page: the site's past winners first when stats are kept"""
+        if self.selector_stats is None:
+            return dict(fields)
+        return self.selector_stats.orders_for(url, fields)
+    
+    def _record_selectors(self, url, hits):
+        if self.selector_stats is not None:
+            self.selector_stats.record_all(url, hits)
+    
+    def _extract_fields_aliexpress(self, driver, url):
+        """Extract the AliExpress fields using the configured extraction mode"""
+        from selenium.common.exceptions import WebDriverException
+        
+        selectors = dict(ALIEXPRESS_SELECTORS)
+        cascades = {field: ALIEXPRESS_SELECTORS[field] for field in ALIEXPRESS_CASCADE_FIELDS}
+        selectors.update(self._selector_orders(url, cascades))
+        hits = {}
+        
+        if self.extraction_mode == 'script':
+            try:
+                with metrics.stage('extract_script'):
+                    payload = driver.execute_script(ALIEXPRESS_EXTRACT_SCRIPT, selectors)
+            except WebDriverException as e:
+                metrics.count_error(type(e).__name__)
+                payload = None
+            if payload:
+                fields = self._parse_extraction_payload(payload, selectors, hits)
+                self._record_selectors(url, hits)
+                return fields
+        
+        extractors = {
+            'title': self._extract_title_aliexpress,
+            'price': self._extract_price_aliexpress,
+            'description': self._extract_description_aliexpress,
+            'images': self._extract_images_aliexpress,
+            'reviews': self._extract_reviews_aliexpress
+        }
+        fields = {}
+        for field, extract in extractors.items():
+            with metrics.stage(f'extract_{field}'):
+                fields[field] = extract(driver, selectors[field], hits)
+        self._record_selectors(url, hits)
+        return fields
+    
+    def _parse_extraction_payload(self, payload, selectors=ALIEXPRESS_SELECTORS, hits=None):
+        """Apply the per-field fallback rules to the in-page extraction result.
+
+        The payload lists are aligned with ``selectors``; the winning selector of
+        each field is noted in ``hits``.
+        """
+        hits = {} if hits is None else hits
+        
+        title = "AliExpress Product"
+        for selector, text in zip(selectors['title'], payload['title']):
+            if text and text.strip():
+                title = text.strip()
+                hits['title'] = selector
+                break
+        
+        price = None
+        for selector, text in zip(selectors['price'], payload['price']):
+            price = self._parse_price_aliexpress((text or '').strip())
+            if price:
+                hits['price'] = selector
+                break
+        
+        description = "Product description not available"
+        for selector, text in zip(selectors['description'], payload['description']):
+            if text and text.strip():
+                description = text.strip()[:500]
+                hits['description'] = selector
+                break
+        
+        images = []
+        for selector, found in zip(selectors['images'], payload['images']):
+            count = len(images)
+            for img in found:
+                self._add_image(images, img.get('src') or img.get('data_src'), img.get('alt'))
+            if len(images) > count:
+                hits.setdefault('images', selector)
+        
+        reviews = [
+            {
+                'rating': review['rating'].strip(),
+                'comment': review['comment'].strip(),
+                'author': review['author'].strip()
+            }
+            for review in payload['reviews']
+            if review['rating'] is not None and review['comment'] is not None and review['author'] is not None
         ]
         
-        for selector in selectors:
+        return {
+            'title': title,
+            'price': price or {'current': 0, 'original': 0, 'currency': 'USD', 'discount_percentage': 0},
+            'description': description,
+            'images': images if images else [dict(PLACEHOLDER_IMAGE)],
+            'reviews': {
+                'average_rating': 0,
+                'total_reviews': len(reviews),
+                'recent_reviews': reviews
+            }
+        }
+    
+    def _parse_price_aliexpress(self, price_text):
+        """Turn AliExpress price text into a price dict, or None if it has no number"""
+        if not price_text:
+            return None
+        
+        # Extract numeric value
+        price_match = re.search(r'[\d,]+\.?\d*', price_text.replace(',', ''))
+        if not price_match:
+            return None
+        
+        price_value = float(price_match.group())
+        currency = 'USD' if '$' in price_text else 'USD'
+        return {
+            'current': price_value,
+            'original': price_value,
+            'currency': currency,
+            'discount_percentage': 0
+        }
+    
+    def _add_image(self, images, src, alt):
+        """Append an absolute image URL to the list, marking the first as primary"""
+        if src and src.startswith('http'):
+            images.append({
+                'url': src,
+                'alt': alt or 'Product Image',
+                'is_primary': len(images) == 0
+            })
+    
+    def _extract_title_aliexpress(self, driver, selectors=None, hits=None):
+        """Extract product title from AliExpress, noting the winning selector in ``hits``"""
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
+        
+        for selector in selectors or ALIEXPRESS_SELECTORS['title']:
             try:
                 element = driver.find_element(By.CSS_SELECTOR, selector)
                 if element.text.strip():
+                    if hits is not None:
+                        hits['title'] = selector
                     return element.text.strip()
             except NoSuchElementException:
                 continue
         
         return "AliExpress Product"
     
-    def _extract_price_aliexpress(self, driver):
-        """Extract price from AliExpress"""
-        selectors = [
-            '.notranslate',
-            '[data-pl="product-price"]',
-            '.price-current',
-            '.price',
-            '.product-price'
-        ]
+    def _extract_price_aliexpress(self, driver, selectors=None, hits=None):
+        """Extract price from AliExpress, noting the winning selector in ``hits``"""
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
         
-        for selector in selectors:
+        for selector in selectors or ALIEXPRESS_SELECTORS['price']:
             try:
                 element = driver.find_element(By.CSS_SELECTOR, selector)
-                price_text = element.text.strip()
-                if price_text:
-                    # Extract numeric value
-                    price_match = re.search(r'[\d,]+\.?\d*', price_text.replace(',', ''))
-                    if price_match:
-                        price_value = float(price_match.group())
-                        currency = 'USD' if '$' in price_text else 'USD'
-                        return {
-                            'current': price_value,
-                            'original': price_value,
-                            'currency': currency,
-                            'discount_percentage': 0
-                        }
+                price = self._parse_price_aliexpress(element.text.strip())
+                if price:
+                    if hits is not None:
+                        hits['price'] = selector
+                    return price
             except NoSuchElementException:
                 continue
         
         return {'current': 0, 'original': 0, 'currency': 'USD', 'discount_percentage': 0}
     
-    def _extract_description_aliexpress(self, driver):
-        """Extract product description from AliExpress"""
-        selectors = [
-            '.product-description',
-            '[data-pl="product-description"]',
-            '.product-detail-description',
-            '.description'
-        ]
+    def _extract_description_aliexpress(self, driver, selectors=None, hits=None):
+        """Extract product description from AliExpress, noting the winning selector in ``hits``"""
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
         
-        for selector in selectors:
+        for selector in selectors or ALIEXPRESS_SELECTORS['description']:
             try:
                 element = driver.find_element(By.CSS_SELECTOR, selector)
                 if element.text.strip():
+                    if hits is not None:
+                        hits['description'] = selector
                     return element.text.strip()[:500]  # Limit length
             except NoSuchElementException:
                 continue
         
         return "Product description not available"
     
-    def _extract_images_aliexpress(self, driver):
-        """Extract product images from AliExpress"""
+    def _extract_images_aliexpress(self, driver, selectors=None, hits=None):
+        """Extract product images from AliExpress, noting the first selector that found any in ``hits``"""
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
+        
         images = []
         
         # Try to find main product images
-        selectors = [
-            '.images-view-item img',
-            '.product-image img',
-            '.gallery-image img',
-            'img[src*="alicdn"]'
-        ]
-        
-        for selector in selectors:
+        for selector in selectors or ALIEXPRESS_SELECTORS['images']:
             try:
                 elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                count = len(images)
                 for img in elements[:5]:  # Limit to 5 images
                     src = img.get_attribute('src') or img.get_attribute('data-src')
-                    if src and src.startswith('http'):
-                        images.append({
-                            'url': src,
-                            'alt': img.get_attribute('alt') or 'Product Image',
-                            'is_primary': len(images) == 0
-                        })
+                    self._add_image(images, src, img.get_attribute('alt'))
+                if hits is not None and len(images) > count:
+                    hits.setdefault('images', selector)
             except NoSuchElementException:
                 continue
         
-        return images if images else [{'url': 'https://via.placeholder.com/400x300?text=No+Image', 'alt': 'No Image', 'is_primary': True}]
+        return images if images else [dict(PLACEHOLDER_IMAGE)]
     
-    def _extract_reviews_aliexpress(self, driver):
-        """Extract reviews from AliExpress"""
+    def _extract_reviews_aliexpress(self, driver, selectors=None, hits=None):
+        """Extract reviews from AliExpress (its selectors are not a cascade, so nothing goes in ``hits``)"""
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
+        
+        selectors = selectors or ALIEXPRESS_SELECTORS['reviews']
         try:
             # Try to find review elements
-            review_elements = driver.find_elements(By.CSS_SELECTOR, '.review-item, .feedback-item')
+            review_elements = driver.find_elements(By.CSS_SELECTOR, selectors['items'])
             reviews = []
             
             for review in review_elements[:3]:  # Limit to 3 reviews
                 try:
-                    rating = review.find_element(By.CSS_SELECTOR, '.star-view, .rating').text.strip()
-                    comment = review.find_element(By.CSS_SELECTOR, '.buyer-feedback').text.strip()
-                    author = review.find_element(By.CSS_SELECTOR, '.buyer-name').text.strip()
+                    rating = review.find_element(By.CSS_SELECTOR, selectors['rating']).text.strip()
+                    comment = review.find_element(By.CSS_SELECTOR, selectors['comment']).text.strip()
+                    author = review.find_element(By.CSS_SELECTOR, selectors['author']).text.strip()
                     
                     reviews.append({
                         'rating': rating,
@@ -232,88 +901,129 @@ class ProductScraper:
     
     def scrape_amazon(self, url):
         """Amazon scraper placeholder"""
-        return self._create_fallback_data(url, 'Amazon', 'Amazon scraping not implemented')
+        return self._create_fallback_data(url, 'Amazon', 'Amazon scraping not implemented', 'NotImplemented')
     
     def scrape_ebay(self, url):
         """eBay scraper placeholder"""
-        return self._create_fallback_data(url, 'eBay', 'eBay scraping not implemented')
+        return self._create_fallback_data(url, 'eBay', 'eBay scraping not implemented', 'NotImplemented')
     
     def scrape_generic(self, url):
         """Generic scraper using requests and BeautifulSoup"""
         # print(f"Scraping generic URL: {url}")
         
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with metrics.stage('fetch'):
+                response = self.session.get(url, timeout=10, stream=True)
+            # Closing drops the connection when an early-stop parse left the rest unread
+            with response:
+                response.raise_for_status()
+                if self.fetch_mode == 'stream':
+                    chunks = metrics.timed_iter(iter_body(response, self.max_body_bytes), 'download')
+                    return self._parse_generic(url, chunks, content_length(response))
+                with metrics.stage('download'):
+                    content = read_body(response, self.max_body_bytes)
+                return self._parse_generic(url, content)
             
-            # Extract title
-            title = soup.find('title')
+        except Exception as e:
+            # print(f"Error scraping generic URL: {str(e)}")
+            return self._create_fallback_data(url, 'Generic', str(e), type(e).__name__)
+    
+    def _parse_generic(self, url, content, size=None):
+        """Build generic product data from a page body: bytes, or an iterable of chunks still downloading (``size`` bytes long, if known)"""
+        orders = self._selector_orders(url, {'price': GENERIC_PRICE_SELECTORS})
+        is_complete = partial(_generic_parse_complete, orders=orders)
+        with metrics.stage('parse'):
+            if isinstance(content, (bytes, str)):
+                soup = self.page_parser.parse(content, is_complete)
+            else:
+                soup = self.page_parser.parse_stream(content, is_complete, size)
+        with metrics.stage('extract'):
+            return self._extract_generic(url, soup, orders)
+    
+    def _extract_generic(self, url, soup, orders=None):
+        """Generic product data from a parsed page, trying the price selectors in ``orders`` order"""
+        # Structured data first; the CSS cascades only run for fields it lacks
+        data = extract_structured_data(soup, url)
+        matches = None
+        if not has_required_fields(data) or not data.get('description'):
+            matches = GENERIC_SELECTOR_ENGINE.match(soup)
+        
+        # Extract title
+        title_text = data.get('title')
+        if not title_text:
+            title = matches.select_one('title')
             title_text = title.text.strip() if title else 'Generic Product'
-            
-            # Extract description
-            desc_meta = soup.find('meta', attrs={'name': 'description'})
+        
+        # Extract description
+        description = data.get('description')
+        if not description:
+            desc_meta = matches.select_one('meta[name="description"]')
             description = desc_meta.get('content', '') if desc_meta else ''
-            
-            # Extract price
-            price_selectors = [
-                '[itemprop="price"]',
-                '.price',
-                '.product-price',
-                '[class*="price"]'
-            ]
-            
-            price_text = '$0.00'
-            for selector in price_selectors:
-                price_elem = soup.select_one(selector)
-                if price_elem and price_elem.text.strip():
-                    price_text = price_elem.text.strip()
-                    break
-            
-            # Extract images
-            images = []
-            img_tags = soup.find_all('img', src=True)[:5]
-            for img in img_tags:
-                src = img.get('src')
-                if src and src.startswith('http'):
-                    images.append({
-                        'url': src,
-                        'alt': img.get('alt', 'Product Image'),
-                        'is_primary': len(images) == 0
-                    })
-            
-            return {
-                'id': f"generic_{int(time.time())}",
-                'title': title_text,
-                'brand': urlparse(url).netloc,
-                'price': {
-                    'current': 0,
-                    'original': 0,
-                    'currency': 'USD',
-                    'discount_percentage': 0
-                },
-                'description': description[:500] if description else 'No description available',
-                'images': images if images else [{'url': 'https://via.placeholder.com/400x300?text=No+Image', 'alt': 'No Image', 'is_primary': True}],
-                'reviews': {'average_rating': 0, 'total_reviews': 0, 'recent_reviews': []},
-                'availability': {
-                    'in_stock': True,
-                    'stock_quantity': 999,
-                    'shipping_info': {'free_shipping': False, 'estimated_delivery': 'N/A', 'shipping_cost': 'N/A'}
-                },
-                'source': {
-                    'url': url,
-                    'platform': 'Generic',
-                    'scraped_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
-                }
+        
+        # Extract price
+        price_value, currency = data.get('price'), data.get('currency')
+        if price_value is None:
+            for selector in (orders or {}).get('price', GENERIC_PRICE_SELECTORS):
+                price_elem = matches.select_one(selector)
+                if price_elem:
+                    price_value, currency = parse_price(price_elem.get('content') or price_elem.text.strip())
+                    if price_value is not None:
+                        self._record_selectors(url, {'price': selector})
+                        break
+        
+        # Extract images
+        images = []
+        for src in data.get('images', [])[:5]:
+            self._add_image(images, src, title_text)
+        if not images:
+            for img in soup.find_all('img', src=True)[:5]:
+                self._add_image(images, urljoin(url, img.get('src')), img.get('alt', 'Product Image'))
+        
+        in_stock = data.get('in_stock')
+        
+        return {
+            'id': f"generic_{int(time.time())}",
+            'title': title_text,
+            'brand': data.get('brand') or urlparse(url).netloc,
+            'price': {
+                'current': price_value or 0,
+                'original': price_value or 0,
+                'currency': currency or 'USD',
+                'discount_percentage': 0
+            },
+            'description': description[:500] if description else 'No description available',
+            'images': images if images else [dict(PLACEHOLDER_IMAGE)],
+            'reviews': {
+                'average_rating': data.get('rating') or 0,
+                'total_reviews': data.get('review_count') or 0,
+                'recent_reviews': []
+            },
+            'availability': {
+                'in_stock': in_stock is not False,
+                'stock_quantity': 999 if in_stock is not False else 0,
+                'shipping_info': {'free_shipping': False, 'estimated_delivery': 'N/A', 'shipping_cost': 'N/A'}
+            },
+            'source': {
+                'url': url,
+                'platform': 'Generic',
+                'scraped_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
             }
-            
-        except Exception as e:
-            # print(f"Error scraping generic URL: {str(e)}")
-            return self._create_fallback_data(url, 'Generic', str(e))
+        }
+    
+    def close(self):
+        """Finish background refreshes, then release pooled browsers and the HTTP session"""
+        if self.result_cache is not None:
+            self.result_cache.close()
+        if self.selector_stats is not None:
+            self.selector_stats.save()
+        if self.price_history is not None:
+            self.price_history.close()
+        self.driver_pool.close()
+        self.session.close()
     
-    def _create_fallback_data(self, url, platform, error_msg):
+    def _create_fallback_data(self, url, platform, error_msg, error_type='ScrapeError'):
         """Create fallback data when scraping fails"""
+        metrics.count_error(error_type)
         return {
             'id': f"{platform.lower()}_{int(time.time())}",
             'title': f'{platform} Product',
@@ -335,9 +1045,243 @@ class ProductScraper:
             }
         }
 
-def main():
-    """Test the scraper"""
-    scraper = ProductScraper()
+def _write_message(stream, lock, message):
+    """Write one JSON line to the worker output stream"""
+    line = json.dumps(message)
+    with lock:
+        stream.write(line + '\n')
+        stream.flush()
+
+def _handle_worker_request(scraper, request, deadline_at=None):
+    """Run a single worker request and build its response; a scrape gives up at monotonic time ``deadline_at``"""
+    op = request.get('op', 'scrape')
+    
+    if op == 'ping':
+        return {'ok': True}
+    if op == 'stats':
+        stats = {'driver_pool': scraper.driver_pool.stats(), 'single_flight': scraper.single_flight.stats(),
+                 'rate_limiter': scraper.rate_limiter.stats()}
+        if scraper.http_cache is not None:
+            stats['http_cache'] = scraper.http_cache.stats()
+        if scraper.result_cache is not None:
+            stats['result_cache'] = scraper.result_cache.stats()
+        if scraper.selector_stats is not None:
+            stats['selector_stats'] = scraper.selector_stats.stats()
+        if scraper.price_history is not None:
+            stats['price_history'] = scraper.price_history.stats()
+        return {'stats': stats}
+    if op == 'selectors':
+        if scraper.selector_stats is None:
+            return {'error': 'Selector stats are disabled'}
+        return {'report': scraper.selector_stats.report(request.get('domain'))}
+    if op == 'history':
+        if scraper.price_history is None:
+            return {'error': 'Price history is disabled'}
+        if not request.get('url'):
+            return {'error': 'No URL provided'}
+        return {'history': scraper.price_history.history(request['url'], request.get('since'), request.get('limit'))}
+    if op == 'metrics':
+        return {'metrics': metrics.REGISTRY.render()}
+    if op == 'scrape':
+        url = request.get('url')
+        if not url:
+            return {'error': 'No URL provided'}
+        if deadline_at is not None and time.monotonic() >= deadline_at:
+            return {'error': 'Timed out before the scrape started'}
+        started = time.perf_counter()
+        with deadline(deadline_at), metrics.trace() as timings:
+            result = scraper.scrape_product(url)
+        timings['total'] = time.perf_counter() - started
+        return {'result': result, 'timings_ms': metrics.timings_ms(timings)}
+    
+    return {'error': f'Unknown op: {op}'}
+
+def run_worker(scraper, max_workers=4, stdin=None, stdout=None):
+    """Serve scrape requests as JSON lines over stdin/stdout.
+
+    Each request line is an object such as {"id": 1, "op": "scrape", "url": "..."}
+    and each response line echoes the request id. Requests run on a small thread
+    pool so one slow page does not hold up the others, and the scraper (with its
+    warm HTTP session) lives for the whole life of the process. A request with
+    "timeout_ms" is abandoned that long after it arrives: it is not started once
+    the time is up, and a running scrape stops retrying and sending requests.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    lock = threading.Lock()
+    
+    def serve(request, deadline_at):
+        try:
+            response = _handle_worker_request(scraper, request, deadline_at)
+        except Exception as e:
+            response = {'error': str(e)}
+        response['id'] = request.get('id')
+        _write_message(stdout, lock, response)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        _write_message(stdout, lock, {'id': None, 'ready': True})
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+            
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                _write_message(stdout, lock, {'id': None, 'error': f'Invalid request: {e}'})
+                continue
+            
+            if request.get('op') == 'shutdown':
+                break
+            
+            # Counted from arrival, so time spent queued behind other requests is included
+            timeout_ms = request.get('timeout_ms')
+            deadline_at = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+            executor.submit(serve, request, deadline_at)
+
+def _read_urls(stream):
+    """Yield URLs from a text stream, one per line, skipping blanks and comments"""
+    for line in stream:
+        url = line.strip()
+        if url and not url.startswith('#'):
+            yield url
+
+def run_batch(scraper, source, max_workers=8, max_per_domain=2, stdout=None):
+    """Scrape URLs from a file (or '-' for stdin) and stream JSONL results"""
+    stdout = stdout or sys.stdout
+    stream = sys.stdin if source == '-' else open(source, 'r', encoding='utf-8')
+    try:
+        for url, result, error in scraper.scrape_many(_read_urls(stream), max_workers, max_per_domain):
+            stdout.write(json.dumps({'url': url, 'result': result, 'error': error}) + '\n')
+            stdout.flush()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def run_crawl(scraper, start_url, stdout=None, stderr=None, **options):
+    """Crawl listing pages from ``start_url``, stream the scraped products as JSONL and report the crawl on stderr"""
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    crawler = Crawler(scraper, **options)
+    for url, result, error in crawler.crawl(start_url):
+        stdout.write(json.dumps({'url': url, 'result': result, 'error': error}) + '\n')
+        stdout.flush()
+    stderr.write(json.dumps({'crawl': crawler.stats()}) + '\n')
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Scrape product data from a URL')
+    parser.add_argument('url', nargs='?', help='Product URL to scrape and print as JSON')
+    parser.add_argument('--worker', action='store_true', help='Serve JSON-lines requests on stdin/stdout')
+    parser.add_argument('--batch', metavar='FILE', help="Scrape URLs listed in FILE ('-' for stdin) and print JSONL")
+    parser.add_argument('--crawl', metavar='URL', help='Scrape every product linked from a listing or category page')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent scrapes in worker, batch or crawl mode')
+    parser.add_argument('--per-domain', type=int, default=2, help='Concurrent scrapes per domain in batch or crawl mode')
+    parser.add_argument('--depth', type=int, default=2, help='Listing page links (pagination, subcategories) to follow deep')
+    parser.add_argument('--max-pages', type=int, default=50, help='Most listing pages fetched in crawl mode')
+    parser.add_argument('--max-products', type=int, help='Most products scraped in crawl mode')
+    parser.add_argument('--crawl-delay', type=float, default=0.5, help='Seconds between crawl requests to one domain')
+    parser.add_argument('--ignore-robots', action='store_true', help="Crawl pages robots.txt disallows")
+    parser.add_argument('--browsers', type=int, default=2, help='Maximum pooled Chrome instances')
+    parser.add_argument('--browser-max-pages', type=int, default=50, help='Pages served before a browser is recycled')
+    parser.add_argument('--browser-profile', choices=['lean', 'standard'], default='lean',
+                        help='Lean: eager load, blocked images/fonts/trackers, per-field waits; standard: full load')
+    parser.add_argument('--browser-config', metavar='FILE', help='JSON file of per-platform browser profile overrides')
+    parser.add_argument('--extraction', choices=['script', 'element'], default='script',
+                        help='Collect browser fields in one script call or element by element')
+    parser.add_argument('--aliexpress', choices=['auto', 'static', 'browser'], default='auto',
+                        help='AliExpress tiers: embedded page state with browser fallback, or only one of them')
+    parser.add_argument('--parser', default='auto', help="BeautifulSoup tree builder ('auto' prefers lxml)")
+    parser.add_argument('--parse-mode', choices=PARSE_MODES, default='strained',
+                        help='Build the full tree, only the elements the extractors use, or also stop once fields are found')
+    parser.add_argument('--fetch-mode', choices=FETCH_MODES, default='stream',
+                        help='Parse generic pages while they download and stop reading once the fields are found, '
+                             'or read the whole body first')
+    parser.add_argument('--max-page-mb', type=float, default=DEFAULT_MAX_BODY_BYTES / (1024 * 1024),
+                        help='Largest page body (after decompression) to read; bigger pages fail')
+    parser.add_argument('--http-cache', metavar='DIR', default=DEFAULT_HTTP_CACHE_DIR,
+                        help='Directory for the on-disk HTTP cache of static page fetches')
+    parser.add_argument('--http-cache-ttl', type=int, default=600, help='Seconds a cached page is served without revalidation')
+    parser.add_argument('--http-cache-mb', type=int, default=256, help='Size cap of the HTTP cache in megabytes')
+    parser.add_argument('--no-http-cache', action='store_true', help='Always download pages again')
+    parser.add_argument('--result-cache', metavar='DIR', default=DEFAULT_RESULT_CACHE_DIR,
+                        help='Directory for cached product results')
+    parser.add_argument('--result-fresh', type=int, default=3600, help='Seconds a product result is served as fresh')
+    parser.add_argument('--result-max-stale', type=int, default=86400,
+                        help='Further seconds a stale result is served while it is refreshed in the background')
+    parser.add_argument('--no-result-cache', action='store_true', help='Scrape every request again')
+    parser.add_argument('--domain-concurrency', type=int, default=16,
+                        help='Most concurrent requests the adaptive limiter allows any one domain')
+    parser.add_argument('--retries', type=int, default=3, help='Retries for timeouts, connection errors and 429/5xx')
+    parser.add_argument('--selector-stats', metavar='FILE', default=DEFAULT_SELECTOR_STATS_PATH,
+                        help='JSON file of per-domain selector wins used to try the usual winner first')
+    parser.add_argument('--no-selector-stats', action='store_true', help='Always try selectors in their default order')
+    parser.add_argument('--selector-report', nargs='?', const='', metavar='DOMAIN',
+                        help='Print the winning selectors per field for every domain (or one) and exit')
+    parser.add_argument('--price-history', metavar='FILE', default=DEFAULT_PRICE_HISTORY_PATH,
+                        help='SQLite file of product fingerprints and price points')
+    parser.add_argument('--no-price-history', action='store_true', help='Do not track product changes and prices')
+    parser.add_argument('--history', metavar='URL', help="Print a product's price history and exit")
+    args = parser.parse_args(argv)
+    
+    price_history = None
+    if not args.no_price_history:
+        price_history = PriceHistory(args.price_history)
+    if args.history:
+        print(json.dumps(price_history.history(args.history) if price_history else None, indent=2))
+        return
+    
+    selector_stats = None
+    if not args.no_selector_stats:
+        selector_stats = SelectorStats(args.selector_stats)
+    if args.selector_report is not None:
+        print(json.dumps(selector_stats.report(args.selector_report or None) if selector_stats else {}, indent=2))
+        return
+    
+    http_cache = None
+    if not args.no_http_cache:
+        http_cache = HttpCache(args.http_cache, ttl=args.http_cache_ttl, max_bytes=args.http_cache_mb * 1024 * 1024)
+    result_cache = None
+    if not args.no_result_cache:
+        result_cache = ResultCache(args.result_cache, fresh_for=args.result_fresh, max_stale=args.result_max_stale)
+    
+    browser_profiles = BROWSER_PROFILES if args.browser_profile == 'lean' else {'aliexpress': STANDARD_PROFILE}
+    if args.browser_config:
+        browser_profiles = load_profiles(args.browser_config, browser_profiles)
+    
+    driver_pool = WebDriverPool(max_size=args.browsers, max_pages=args.browser_max_pages,
+                                profile=browser_profiles['aliexpress'])
+    scraper = ProductScraper(driver_pool, extraction_mode=args.extraction, parser=args.parser,
+                             parse_mode=args.parse_mode, http_cache=http_cache, result_cache=result_cache,
+                             aliexpress_mode=args.aliexpress, browser_profiles=browser_profiles,
+                             rate_limiter=RateLimiter(max_limit=args.domain_concurrency),
+                             retry_policy=RetryPolicy(retries=args.retries), selector_stats=selector_stats,
+                             fetch_mode=args.fetch_mode, max_body_bytes=int(args.max_page_mb * 1024 * 1024),
+                             price_history=price_history)
+    try:
+        run_cli(scraper, args)
+    finally:
+        scraper.close()
+
+def run_cli(scraper, args):
+    """Dispatch the parsed command line to the requested mode"""
+    if args.worker:
+        run_worker(scraper, max_workers=args.workers)
+        return
+    
+    if args.batch:
+        run_batch(scraper, args.batch, max_workers=args.workers, max_per_domain=args.per_domain)
+        return
+    
+    if args.crawl:
+        run_crawl(scraper, args.crawl, max_depth=args.depth, max_pages=args.max_pages, max_products=args.max_products,
+                  max_workers=args.workers, max_per_domain=args.per_domain, delay=args.crawl_delay,
+                  respect_robots=not args.ignore_robots)
+        return
+    
+    if args.url:
+        print(json.dumps(scraper.scrape_product(args.url)))
+        return
     
     # Test URLs
     test_urls = [
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Per-domain adaptive rate limiting and retries for the scrapers
+Each domain gets a concurrency limit that grows while requests succeed and is
+halved on 429/503 responses, errors or slow responses (AIMD); transient
+failures are retried with jittered exponential backoff, honouring Retry-After
+and the deadline of the scrape they belong to
+"""
+
+import asyncio
+import contextvars
+import email.utils
+import random
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import CachingAdapter
+
+# Statuses that mean the server wants us to slow down
+THROTTLE_STATUSES = frozenset({429, 503})
+
+# Statuses worth trying again
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Monotonic time the current scrape has to be done by, when its caller set one
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+@contextmanager
+def deadline(at):
+    """Within the block, requests give up at monotonic time ``at`` (None: no deadline)"""
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def time_left():
+    """Seconds until the current deadline, or None when there is none"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+def _cap_timeout(timeout, limit):
+    """A requests timeout (seconds or a (connect, read) pair) cut down to at most ``limit``"""
+    if isinstance(timeout, tuple):
+        return tuple(limit if part is None else min(part, limit) for part in timeout)
+    return limit if timeout is None else min(timeout, limit)
+
+def domain_of(url):
+    """The host a request counts against"""
+    return (urlparse(url).hostname or '').lower()
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+class RetryPolicy:
+    """How often and how long to wait before retrying a transient failure.
+
+    Waits are drawn uniformly from ``[0, backoff * 2 ** attempt]`` (capped at
+    ``max_delay``) so retries from many workers do not line up. A Retry-After
+    value is used as given; one longer than ``max_delay`` is not waited for.
+    All the attempts of a request share ``total`` seconds (25 by default, below
+    the Node wrapper's 30 s timeout), and the current ``deadline`` when it is
+    sooner; a wait that would run past them is not made.
+    """
+    def __init__(self, retries=3, backoff=0.5, max_delay=30, total=25):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.total = total
+
+    def remaining(self, started=None):
+        """Seconds left for a request first sent at monotonic time ``started``, or None when unbounded"""
+        left = time_left()
+        if started is not None and self.total is not None:
+            budget = started + self.total - time.monotonic()
+            left = budget if left is None else min(left, budget)
+        return left
+
+    def delay(self, attempt, retry_after=None, started=None):
+        """Seconds to wait before retrying after failed attempt number ``attempt`` (from 0), or None to give up"""
+        if attempt >= self.retries:
+            return None
+        if retry_after is not None:
+            wait = retry_after if retry_after <= self.max_delay else None
+        else:
+            wait = random.uniform(0, min(self.max_delay, self.backoff * (2 ** attempt)))
+        left = self.remaining(started)
+        if wait is None or (left is not None and wait >= left):
+            return None
+        return wait
+
+class _Domain:
+    """Limiter state for one domain"""
+    def __init__(self, limit):
+        self.limit = float(limit)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.latency = None
+        self.baseline = None
+        self.counters = {'requests': 0, 'throttled': 0, 'errors': 0, 'slow': 0, 'waits': 0, 'retries': 0}
+
+class _Ticket:
+    """A granted request slot"""
+    def __init__(self, domain):
+        self.domain = domain
+        self.started = time.monotonic()
+
+class RateLimiter:
+    """Per-domain concurrency limits adjusted by additive increase, multiplicative decrease.
+
+    A domain starts at ``initial`` concurrent requests. Every success adds
+    ``1 / limit`` (about one more slot per round of requests), up to
+    ``max_limit``. A 429/503, a transport error, or a response slower than
+    ``slow_factor`` times the domain's best smoothed latency (and over
+    ``slow_after`` seconds) multiplies the limit by ``decrease`` (not below
+    ``min_limit``); only one decrease happens per round, so a burst of failures
+    from requests that were already in flight counts once. A Retry-After on a
+    throttling response also pauses the whole domain for that long.
+
+    ``acquire`` blocks threads and ``acquire_async`` waits in an event loop;
+    both return a ticket to pass to ``release`` with the outcome.
+    """
+    def __init__(self, initial=4, min_limit=1, max_limit=16, decrease=0.5, slow_factor=3.0, slow_after=2.0):
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        self.slow_after = slow_after
+        self._cond = threading.Condition()
+        self._domains = {}
+
+    def _domain(self, name):
+        state = self._domains.get(name)
+        if state is None:
+            state = self._domains[name] = _Domain(min(self.initial, self.max_limit))
+        return state
+
+    def _try_acquire(self, name):
+        """A ticket, or None and the seconds worth waiting before trying again (caller holds the lock)"""
+        state = self._domain(name)
+        wait = state.blocked_until - time.monotonic()
+        if wait > 0:
+            return None, wait
+        if state.in_flight >= max(self.min_limit, int(state.limit)):
+            return None, None
+        state.in_flight += 1
+        state.counters['requests'] += 1
+        return _Ticket(name), None
+
+    def acquire(self, url):
+        """Block until the URL's domain has a free slot and return its ticket"""
+        name = domain_of(url)
+        with self._cond:
+            waited = False
+            while True:
+                ticket, wait = self._try_acquire(name)
+                if ticket is not None:
+                    break
+                waited = True
+                self._cond.wait(wait)
+            if waited:
+                self._domains[name].counters['waits'] += 1
+            return ticket
+
+    async def acquire_async(self, url, poll_interval=0.05):
+        """``acquire`` for coroutines: waits without blocking the event loop"""
+        name = domain_of(url)
+        waited = False
+        while True:
+            with self._cond:
+                ticket, wait = self._try_acquire(name)
+                if ticket is not None:
+                    if waited:
+                        self._domains[name].counters['waits'] += 1
+                    return ticket
+            waited = True
+            await asyncio.sleep(min(wait, 1.0) if wait is not None else poll_interval)
+
+    def release(self, ticket, status=None, error=False, retry_after=None):
+        """Return a slot, adjusting the domain's limit by how the request went"""
+        now = time.monotonic()
+        latency = now - ticket.started
+        with self._cond:
+            state = self._domains[ticket.domain]
+            state.in_flight -= 1
+
+            throttled = status in THROTTLE_STATUSES
+            slow = False
+            if not error and not throttled:
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+                state.baseline = state.latency if state.baseline is None else min(state.baseline, state.latency)
+                slow = latency > max(self.slow_after, self.slow_factor * state.baseline)
+
+            if throttled or error or slow:
+                state.counters['throttled' if throttled else 'errors' if error else 'slow'] += 1
+                if ticket.started >= state.last_decrease:
+                    state.limit = max(self.min_limit, state.limit * self.decrease)
+                    state.last_decrease = now
+                if throttled and retry_after:
+                    state.blocked_until = max(state.blocked_until, now + retry_after)
+            elif status is None or status < 500:
+                state.limit = min(self.max_limit, state.limit + 1 / state.limit)
+
+            self._cond.notify_all()
+
+    def record_retry(self, url):
+        """Count a retried request against its domain"""
+        with self._cond:
+            self._domain(domain_of(url)).counters['retries'] += 1
+
+    def stats(self):
+        """Limit, in-flight count and counters per domain"""
+        with self._cond:
+            return {
+                name: {'limit': round(state.limit, 2), 'in_flight': state.in_flight,
+                       'latency': round(state.latency, 3) if state.latency is not None else None,
+                       **state.counters}
+                for name, state in self._domains.items()
+            }
+
+class ThrottledAdapter(HTTPAdapter):
+    """Transport adapter that sends through a RateLimiter and retries transient failures.
+
+    Connection errors, timeouts and RETRY_STATUSES responses are retried per the
+    RetryPolicy; the last response (or error) is returned once it gives up. Each
+    attempt's timeout is cut to the time the policy has left (its ``total`` or the
+    current ``deadline``), and an attempt with none left raises requests.Timeout
+    without being sent. A response keeps its slot until its body has been read
+    to the end or closed, since bodies are streamed after the headers arrive.
+    """
+    def __init__(self, limiter=None, retry=None, **kwargs):
+        super().__init__(**kwargs)
+        self.limiter = limiter or RateLimiter()
+        self.retry = retry or RetryPolicy()
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            left = self.retry.remaining(started)
+            if left is not None:
+                if left <= 0:
+                    raise requests.Timeout(f"No time left to send {request.url}")
+                kwargs['timeout'] = _cap_timeout(kwargs.get('timeout'), left)
+            ticket = self.limiter.acquire(request.url)
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.limiter.release(ticket, error=True)
+                delay = self.retry.delay(attempt, started=started)
+                if delay is None:
+                    raise
+            else:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                self._release_with_body(response, ticket, retry_after)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                delay = self.retry.delay(attempt, retry_after, started)
+                if delay is None:
+                    return response
+                response.close()
+
+            self.limiter.record_retry(request.url)
+            attempt += 1
+            time.sleep(delay)
+
+    def _release_with_body(self, response, ticket, retry_after):
+        """Release the ticket once urllib3 lets go of the connection: body read to the end, or closed.
+
+        A response that is dropped without either releases it when it is
+        garbage collected.
+        """
+        raw = response.raw
+        release_conn = raw.release_conn
+        status = response.status_code
+        lock = threading.Lock()
+        held = [ticket]
+
+        def release():
+            with lock:
+                ticket = held.pop() if held else None
+            if ticket is not None:
+                self.limiter.release(ticket, status=status, retry_after=retry_after)
+
+        def release_conn_and_ticket():
+            release_conn()
+            release()
+
+        raw.release_conn = release_conn_and_ticket
+        weakref.finalize(response, release)
+
+class ThrottledCachingAdapter(CachingAdapter, ThrottledAdapter):
+    """CachingAdapter whose network requests go through a ThrottledAdapter; cache hits skip the limiter"""
+
+def install_limiter(session, limiter, retry=None, cache=None):
+    """Mount a throttled (and, with a cache, caching) adapter for http and https on a requests session"""
+    if cache is not None:
+        adapter = ThrottledCachingAdapter(cache, limiter=limiter, retry=retry)
+    else:
+        adapter = ThrottledAdapter(limiter, retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
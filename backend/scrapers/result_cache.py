@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Product result cache for the scrapers
+Keeps scrape_product results keyed by canonical URL, answers repeat requests
+straight from memory or disk and serves stale results immediately while a
+background refresh scrapes the page again (stale-while-revalidate)
+"""
+
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from urls import normalize_url
+
+def is_scrape_error(result):
+    """Whether a result is fallback data from a failed scrape"""
+    return isinstance(result, dict) and bool((result.get('source') or {}).get('error'))
+
+class ResultCache:
+    """Stale-while-revalidate cache of product results.
+
+    A result younger than ``fresh_for`` seconds is returned as is. An older one
+    is still returned for up to ``max_stale`` more seconds, while a single
+    background refresh per URL replaces it. Anything older is scraped again in
+    the foreground. With a ``directory`` the results are also written to disk,
+    so they survive restarts and are shared between processes.
+    """
+    def __init__(self, directory=None, fresh_for=3600, max_stale=86400, max_entries=1000,
+                 refresh_workers=2, cacheable=None):
+        self.directory = directory
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.refresh_workers = refresh_workers
+        self.cacheable = cacheable or (lambda result: not is_scrape_error(result))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._executor = None
+        self._counters = {'hits': 0, 'stale': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0, 'evicted': 0}
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+
+    def _load_index(self):
+        """Register the entries on disk, oldest first; their contents load on first use"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    entries.append((os.path.getmtime(os.path.join(self.directory, name)), name[:-len('.json')]))
+                except OSError:
+                    continue
+        for _, key in sorted(entries):
+            self._entries[key] = None
+
+    def key_for(self, url):
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _load(self, key):
+        """Entry for a key from memory or disk (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is None and self.directory:
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+        if entry is not None:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+        return entry
+
+    def _state(self, entry):
+        age = time.time() - entry['stored_at']
+        if age < self.fresh_for:
+            return 'fresh'
+        if age < self.fresh_for + self.max_stale:
+            return 'stale'
+        return None
+
+    def get(self, url):
+        """Cached result and its state ('fresh' or 'stale'), or (None, None)"""
+        with self._lock:
+            entry = self._load(self.key_for(url))
+        state = self._state(entry) if entry is not None else None
+        if state is None:
+            return None, None
+        return copy.deepcopy(entry['result']), state
+
+    def state(self, url):
+        """State of a URL's cached result ('fresh' or 'stale'), or None, without copying it"""
+        with self._lock:
+            entry = self._load(self.key_for(url))
+        return self._state(entry) if entry is not None else None
+
+    def put(self, url, result):
+        """Store a result if it is cacheable"""
+        if not self.cacheable(result):
+            return
+        key = self.key_for(url)
+        entry = {'url': url, 'stored_at': time.time(), 'result': result}
+
+        if self.directory:
+            # A temp file of its own, so concurrent puts of one URL never write into the same file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f)
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._counters['evicted'] += 1
+                if self.directory:
+                    try:
+                        os.remove(self._path(old_key))
+                    except OSError:
+                        pass
+
+    def get_or_scrape(self, url, scrape_fn):
+        """Result for a URL from the cache, scraping it with ``scrape_fn(url)`` when needed"""
+        result, state = self.get(url)
+        if state == 'fresh':
+            self._count('hits')
+            return result
+        if state == 'stale':
+            self._count('stale')
+            self._refresh(url, scrape_fn)
+            return result
+
+        self._count('misses')
+        result = scrape_fn(url)
+        self.put(url, result)
+        return result
+
+    def _refresh(self, url, scrape_fn):
+        """Scrape a stale URL again in the background, at most once at a time per URL"""
+        key = self.key_for(url)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                    thread_name_prefix='result-refresh')
+            executor = self._executor
+
+        def refresh():
+            try:
+                self.put(url, scrape_fn(url))
+                self._count('refreshes')
+            except Exception:
+                self._count('refresh_errors')
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        executor.submit(refresh)
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self):
+        """Entry count, refreshes in flight and hit/stale/miss counters"""
+        with self._lock:
+            return {'entries': len(self._entries), 'refreshing': len(self._refreshing),
+                    'fresh_for': self.fresh_for, 'max_stale': self.max_stale, **self._counters}
+
+    def close(self):
+        """Wait for background refreshes to finish"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
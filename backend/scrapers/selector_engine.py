@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Single-pass selector engine for the extraction cascades
+Compiles the ordered selector lists once, then finds the first match of every
+selector in one walk over the parsed document instead of one select_one call
+(and one full tree scan) per selector
+"""
+
+import re
+
+from bs4 import Tag
+
+# One compound selector: optional tag followed by #id, .class and [attr] parts
+_COMPOUND_RE = re.compile(r'''
+    ^(?P<tag>\*|[a-zA-Z][\w-]*)?
+    (?P<parts>(?:
+        \#[\w-]+
+      | \.[\w-]+
+      | \[\s*[\w-]+\s*(?:[*^$~]?=\s*(?:"[^"]*"|'[^']*'|[^\]\s]+)\s*)?\]
+    )*)$
+''', re.VERBOSE)
+_PART_RE = re.compile(r'''
+    \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[\w-]+)\s*(?:(?P<op>[*^$~]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[^\]\s]+))\s*)?\]
+''', re.VERBOSE)
+
+def _split_top_level(text, separators):
+    """Split a selector on separator characters that are outside brackets and quotes"""
+    pieces, current, depth, quote = [], [], 0, None
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif depth == 0 and char in separators:
+            pieces.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    pieces.append(''.join(current))
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+def _attribute_value(element, name):
+    """Attribute value as a string, joining multi-valued attributes like soupsieve does"""
+    value = element.attrs.get(name)
+    if isinstance(value, list):
+        return ' '.join(value)
+    return value
+
+class _Compound:
+    """Tag, id, class and attribute tests for one element"""
+    def __init__(self, tag, ids, classes, attrs):
+        self.tag = tag
+        self.ids = ids
+        self.classes = classes
+        self.attrs = attrs
+
+    def index_key(self):
+        """Most selective property to bucket this compound under"""
+        if self.ids:
+            return ('id', self.ids[0])
+        if self.classes:
+            return ('class', self.classes[0])
+        if self.attrs:
+            return ('attr', self.attrs[0][0])
+        if self.tag:
+            return ('tag', self.tag)
+        return ('any', None)
+
+    def matches(self, element):
+        if self.tag and element.name != self.tag:
+            return False
+        if self.ids and element.attrs.get('id') not in self.ids:
+            return False
+        if self.classes:
+            element_classes = element.attrs.get('class') or []
+            if not all(cls in element_classes for cls in self.classes):
+                return False
+        for name, op, expected in self.attrs:
+            value = _attribute_value(element, name)
+            if value is None:
+                return False
+            if op is None:
+                continue
+            if op == '=' and value != expected:
+                return False
+            if op == '*=' and (not expected or expected not in value):
+                return False
+            if op == '^=' and (not expected or not value.startswith(expected)):
+                return False
+            if op == '$=' and (not expected or not value.endswith(expected)):
+                return False
+            if op == '~=' and expected not in value.split():
+                return False
+        return True
+
+def _compile_compound(text):
+    match = _COMPOUND_RE.match(text)
+    if not match:
+        return None
+
+    tag = match.group('tag')
+    ids, classes, attrs = [], [], []
+    for part in _PART_RE.finditer(match.group('parts')):
+        if part.group('id'):
+            ids.append(part.group('id'))
+        elif part.group('cls'):
+            classes.append(part.group('cls'))
+        else:
+            value = part.group('dq')
+            if value is None:
+                value = part.group('sq')
+            if value is None:
+                value = part.group('bare')
+            attrs.append((part.group('attr').lower(), part.group('op'), value))
+
+    return _Compound(None if tag in (None, '*') else tag.lower(), ids, classes, attrs)
+
+class _Chain:
+    """Compounds joined by descendant combinators, matched right to left"""
+    def __init__(self, compounds):
+        self.compounds = compounds
+
+    def matches(self, element):
+        if not self.compounds[-1].matches(element):
+            return False
+
+        # Greedy nearest-ancestor matching is exact for descendant-only chains
+        index = len(self.compounds) - 2
+        ancestor = element.parent
+        while index >= 0 and ancestor is not None:
+            if isinstance(ancestor, Tag) and self.compounds[index].matches(ancestor):
+                index -= 1
+            ancestor = ancestor.parent
+        return index < 0
+
+def compile_selector(selector):
+    """Compile a CSS selector into alternative chains, or None if it uses unsupported syntax"""
+    chains = []
+    for alternative in _split_top_level(selector, ','):
+        compounds = [_compile_compound(part) for part in _split_top_level(alternative, ' \t\n')]
+        if not compounds or None in compounds:
+            return None
+        chains.append(_Chain(compounds))
+    return chains or None
+
+class DocumentMatches:
+    """First match of every compiled selector in one document.
+
+    ``select_one`` mirrors ``BeautifulSoup.select_one`` so the extraction code can
+    keep its per-field selector loops; selectors the engine does not know are
+    passed through to the soup.
+    """
+    def __init__(self, soup, first_matches):
+        self.soup = soup
+        self._first = first_matches
+
+    def select_one(self, selector):
+        if selector in self._first:
+            return self._first[selector]
+        return self.soup.select_one(selector)
+
+class SelectorEngine:
+    """Resolves ordered selector lists for many fields in one document traversal.
+
+    The selectors are indexed by id, class, attribute name and tag, so each element
+    is only tested against the selectors that could possibly match it. Selectors
+    using syntax outside the supported subset (tag, #id, .class, [attr], [attr=v],
+    [attr*=v], [attr^=v], [attr$=v], [attr~=v], descendant combinators and comma
+    lists) fall back to soupsieve.
+    """
+    def __init__(self, fields):
+        self.fields = {name: list(selectors) for name, selectors in fields.items()}
+        self._buckets = {}
+        self._compound_buckets = {}
+        self._compiled = []
+        self.unsupported = []
+
+        for selectors in self.fields.values():
+            for selector in selectors:
+                if selector in self._compiled or selector in self.unsupported:
+                    continue
+                chains = compile_selector(selector)
+                if chains is None:
+                    self.unsupported.append(selector)
+                    continue
+                self._compiled.append(selector)
+                for chain in chains:
+                    key = chain.compounds[-1].index_key()
+                    self._buckets.setdefault(key, []).append((selector, chain))
+                    for compound in chain.compounds:
+                        self._compound_buckets.setdefault(compound.index_key(), []).append(compound)
+
+    def _candidates(self, buckets, element):
+        """Entries from the buckets an element could match"""
+        candidates = list(buckets.get(('any', None), ()))
+        candidates.extend(buckets.get(('tag', element.name), ()))
+        element_id = element.attrs.get('id')
+        if element_id:
+            candidates.extend(buckets.get(('id', element_id), ()))
+        for cls in element.attrs.get('class') or ():
+            candidates.extend(buckets.get(('class', cls), ()))
+        for name in element.attrs:
+            candidates.extend(buckets.get(('attr', name), ()))
+        return candidates
+
+    def could_match(self, element):
+        """Whether an element can take part in any selector, as the subject or an ancestor.
+
+        Used to strain parsing down to the elements the extractors can use.
+        """
+        if self.unsupported:
+            return True
+        return any(compound.matches(element) for compound in self._candidates(self._compound_buckets, element))
+
+    def settled(self, matches, field, accept=None, order=None):
+        """Whether a field's cascade result can no longer change as more of the page is parsed.
+
+        First matches in document order never move as the document grows, so the
+        result is final once every selector ahead of the winner has matched (and
+        been rejected by ``accept``) and the winner itself has matched and been
+        accepted. ``order`` is the cascade order when it differs from the field's
+        own selector list.
+        """
+        for selector in order or self.fields[field]:
+            element = matches.select_one(selector)
+            if element is None:
+                return False
+            if accept is None or accept(element):
+                return True
+        return True
+
+    def match(self, soup):
+        """Walk the document once and record the first match of every selector"""
+        first = {}
+        remaining = len(self._compiled)
+
+        for element in soup.descendants:
+            if not isinstance(element, Tag):
+                continue
+
+            for selector, chain in self._candidates(self._buckets, element):
+                if selector not in first and chain.matches(element):
+                    first[selector] = element
+                    remaining -= 1
+
+            if remaining == 0:
+                break
+
+        for selector in self._compiled:
+            first.setdefault(selector, None)
+
+        return DocumentMatches(soup, first)
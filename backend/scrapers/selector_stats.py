@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Per-domain selector statistics for the extraction cascades
+Records which selector produced each field on each site, tries the historical
+winners first on later pages, and reports the winners per domain so layout
+changes show up
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+def domain_key(url):
+    """Site a page's selector statistics are kept under"""
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+class SelectorStats:
+    """Decayed win counts of the selectors that matched, by domain and field.
+
+    ``orders_for`` returns each field's selectors with the domain's winners
+    first, best first, and the rest in their default order. One page in
+    ``explore`` (and every page of a field with fewer than ``min_samples``
+    recorded wins) uses the default order instead, so a selector that starts
+    matching ahead of the old winner after a redesign is noticed. Each recorded
+    win multiplies the field's other scores by ``decay``, so the ordering
+    follows the site as it changes. A change of a field's leading selector is
+    counted and timestamped in the report.
+
+    With a ``path`` the statistics are loaded from and saved to that JSON file,
+    at most every ``save_interval`` seconds as wins are recorded and on
+    ``save()``. Only the ``max_domains`` most recently updated domains are kept.
+    """
+    def __init__(self, path=None, explore=0.05, min_samples=3, decay=0.95, save_interval=60, max_domains=5000):
+        self.path = path
+        self.explore = explore
+        self.min_samples = min_samples
+        self.decay = decay
+        self.save_interval = save_interval
+        self.max_domains = max_domains
+        self._lock = threading.Lock()
+        self._domains = {}
+        self._dirty = False
+        self._last_save = time.time()
+        self._counters = {'pages': 0, 'explored': 0, 'recorded': 0, 'changes': 0}
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._domains = json.load(f)
+        except (OSError, ValueError):
+            self._domains = {}
+
+    def orders_for(self, url, fields):
+        """Selector order to use for every field of one page: ``{field: [selectors]}``"""
+        domain = domain_key(url)
+        exploring = random.random() < self.explore
+        with self._lock:
+            self._counters['pages'] += 1
+            if exploring:
+                self._counters['explored'] += 1
+            known = self._domains.get(domain, {}) if not exploring else {}
+            return {field: self._order(known.get(field), selectors) for field, selectors in fields.items()}
+
+    def _order(self, stats, selectors):
+        if not stats or stats['samples'] < self.min_samples:
+            return list(selectors)
+        scores = stats['scores']
+        # sorted() is stable, so selectors without wins keep their default order
+        return sorted(selectors, key=lambda selector: -scores.get(selector, 0))
+
+    def record(self, url, field, selector):
+        """Note that ``selector`` produced ``field`` on this page"""
+        domain = domain_key(url)
+        now = time.time()
+        with self._lock:
+            fields = self._domains.setdefault(domain, {})
+            stats = fields.setdefault(field, {'scores': {}, 'samples': 0, 'leader': None, 'changes': 0,
+                                              'last_change': None})
+            scores = stats['scores']
+            for name in scores:
+                scores[name] *= self.decay
+            scores[selector] = scores.get(selector, 0) + 1
+            stats['samples'] += 1
+            stats['updated'] = now
+
+            leader = max(scores, key=scores.get)
+            if leader != stats['leader']:
+                if stats['leader'] is not None:
+                    stats['changes'] += 1
+                    stats['last_change'] = now
+                    self._counters['changes'] += 1
+                stats['leader'] = leader
+
+            self._counters['recorded'] += 1
+            self._dirty = True
+            due = self.path and now - self._last_save >= self.save_interval
+
+        if due:
+            self.save()
+
+    def record_all(self, url, hits):
+        """Record a page's ``{field: selector}`` winners"""
+        for field, selector in hits.items():
+            self.record(url, field, selector)
+
+    def _trim(self):
+        """Drop the least recently updated domains past ``max_domains`` (caller holds the lock)"""
+        if len(self._domains) <= self.max_domains:
+            return
+        def updated(item):
+            return max((stats.get('updated', 0) for stats in item[1].values()), default=0)
+        keep = sorted(self._domains.items(), key=updated, reverse=True)[:self.max_domains]
+        self._domains = dict(keep)
+
+    def save(self):
+        """Write the statistics to ``path`` if anything changed"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._trim()
+            payload = json.dumps(self._domains)
+            self._dirty = False
+            self._last_save = time.time()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Unique per call: job-pool threads of one process save concurrently
+        fd, tmp_path = tempfile.mkstemp(dir=directory or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def report(self, domain=None):
+        """Winning selector per field for every domain (or one), with its share of the recent wins"""
+        with self._lock:
+            domains = {domain: self._domains.get(domain, {})} if domain else dict(self._domains)
+            report = {}
+            for name, fields in sorted(domains.items()):
+                report[name] = {}
+                for field, stats in sorted(fields.items()):
+                    total = sum(stats['scores'].values()) or 1
+                    report[name][field] = {
+                        'winner': stats['leader'],
+                        'share': round(stats['scores'].get(stats['leader'], 0) / total, 3),
+                        'samples': stats['samples'],
+                        'changes': stats['changes'],
+                        'last_change': stats['last_change']
+                    }
+            return report
+
+    def stats(self):
+        with self._lock:
+            return {'domains': len(self._domains), **self._counters}
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Single-flight request coalescing for the scrapers
+Concurrent calls for the same key share one in-flight call instead of each
+starting their own fetch (and, for AliExpress, their own browser)
+"""
+
+import copy
+import threading
+
+class _Call:
+    """One in-flight call and the callers waiting on it"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Runs at most one call per key at a time.
+
+    The first caller for a key runs the function; callers arriving while it is
+    running block until it finishes and get a copy of its result, or the same
+    exception.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, fn, *args):
+        """Call ``fn(*args)`` unless a call for ``key`` is already running, then wait for that one"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters['calls'] += 1
+            else:
+                call.waiters += 1
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            with self._lock:
+                call.waiters -= 1
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """Calls in flight, callers waiting on them and lifetime counters"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'waiters': sum(call.waiters for call in self._calls.values()),
+                **self._counters
+            }
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Bounded streaming downloads for the static scrape paths
+Page bodies are read in decoded chunks (gzip, deflate, and brotli when the
+brotli package is installed) with a cap on their size, so a runaway page is cut
+off instead of being buffered whole, and a parser can stop reading and let the
+connection close as soon as it has what it needs
+"""
+
+import requests
+from urllib3.util.request import ACCEPT_ENCODING
+
+# Largest page body (after decompression) the scrapers will read
+DEFAULT_MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# Bytes read from the socket at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Accept-Encoding for the page requests: gzip and deflate, plus br when urllib3 has a
+# brotli decoder installed (zstd is left out: the async engine cannot decode it)
+PAGE_ACCEPT_ENCODING = ', '.join(name for name in ACCEPT_ENCODING.split(',') if name != 'zstd')
+
+# 'stream' parses while the page downloads; 'buffered' reads the (capped) body first
+FETCH_MODES = ('stream', 'buffered')
+
+class ResponseTooLarge(requests.RequestException):
+    """The page body is larger than the configured cap"""
+
+def _check_length(length, max_bytes, url):
+    if length is not None and max_bytes and int(length) > max_bytes:
+        raise ResponseTooLarge(f"Response body of {url} is {length} bytes, over the {max_bytes} byte limit")
+
+def content_length(response):
+    """The Content-Length of a response as an int, or None when it is missing or malformed.
+
+    For a compressed body this is the length on the wire, less than the decoded one.
+    """
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+def iter_body(response, max_bytes=DEFAULT_MAX_BODY_BYTES, chunk_size=STREAM_CHUNK_SIZE):
+    """Decoded body chunks of a ``stream=True`` requests response.
+
+    Raises ResponseTooLarge before reading when Content-Length is over
+    ``max_bytes``, and as soon as the decoded body passes it otherwise (which
+    also stops compression bombs). Stopping early leaves the rest unread; close
+    the response to drop the connection.
+    """
+    _check_length(content_length(response), max_bytes, response.url)
+    received = 0
+    for chunk in response.iter_content(chunk_size):
+        received += len(chunk)
+        _check_length(received, max_bytes, response.url)
+        yield chunk
+
+def read_body(response, max_bytes=DEFAULT_MAX_BODY_BYTES, chunk_size=STREAM_CHUNK_SIZE):
+    """The whole decoded body of a ``stream=True`` requests response, up to ``max_bytes``"""
+    return b''.join(iter_body(response, max_bytes, chunk_size))
+
+def response_text(response, body):
+    """``body`` decoded with the response's charset, as ``response.text`` would for HTML"""
+    return body.decode(response.encoding or 'utf-8', errors='replace')
+
+async def read_body_async(response, max_bytes=DEFAULT_MAX_BODY_BYTES, chunk_size=STREAM_CHUNK_SIZE):
+    """The whole decoded body of an aiohttp response, up to ``max_bytes``; closes the connection when over it"""
+    try:
+        _check_length(response.content_length, max_bytes, response.url)
+        chunks = []
+        received = 0
+        async for chunk in response.content.iter_chunked(chunk_size):
+            received += len(chunk)
+            _check_length(received, max_bytes, response.url)
+            chunks.append(chunk)
+    except ResponseTooLarge:
+        response.close()
+        raise
+    return b''.join(chunks)
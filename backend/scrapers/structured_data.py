@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Structured product data extraction shared by the Python scrapers
+Reads schema.org Product JSON-LD, OpenGraph og:* / product:* meta tags and
+itemprop microdata, which most shops publish for search engines and which are
+cheaper and more reliable to read than the heuristic CSS cascades
+"""
+
+import json
+import re
+from urllib.parse import urljoin
+
+# Elements the extractor reads; added to the selector engines so strained and
+# early-stop parses keep them
+STRUCTURED_DATA_SELECTORS = [
+    'script[type="application/ld+json"]',
+    'meta[property]',
+    '[itemtype]',
+    '[itemprop]'
+]
+
+# Fields that make the structured data complete enough to skip the CSS cascades
+REQUIRED_FIELDS = ('title', 'price', 'images')
+
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₹': 'INR'}
+_SYMBOL_FOR = {code: symbol for symbol, code in CURRENCY_SYMBOLS.items()}
+
+_NUMBER_RE = re.compile(r'\d[\d.,]*')
+
+def parse_price(text):
+    """(value, currency) from price text such as '$1,299.00' or '12,50 €'; (None, None) if no number"""
+    if text is None:
+        return None, None
+    text = str(text)
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return None, None
+
+    number = match.group().rstrip('.,')
+    if re.search(r',\d{1,2}$', number) and '.' not in number[-3:]:
+        # Decimal comma: 1.299,50 or 12,50
+        number = number.replace('.', '').replace(',', '.')
+    else:
+        number = number.replace(',', '')
+    try:
+        value = float(number)
+    except ValueError:
+        return None, None
+
+    currency = next((code for symbol, code in CURRENCY_SYMBOLS.items() if symbol in text), None)
+    return value, currency
+
+def format_price(value, currency):
+    """Display price such as '$19.99', or 'CHF 19.99' for currencies without a symbol"""
+    symbol = _SYMBOL_FOR.get(currency or 'USD')
+    if symbol:
+        return f"{symbol}{value:,.2f}"
+    return f"{currency} {value:,.2f}"
+
+def _types(node):
+    node_type = node.get('@type')
+    if isinstance(node_type, list):
+        return [str(t) for t in node_type]
+    return [str(node_type)] if node_type else []
+
+def _find_product(node):
+    """First schema.org Product (or ProductGroup) node in a JSON-LD document"""
+    if isinstance(node, list):
+        for item in node:
+            found = _find_product(item)
+            if found:
+                return found
+    elif isinstance(node, dict):
+        if any(t.split('/')[-1] in ('Product', 'ProductGroup') for t in _types(node)):
+            return node
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                found = _find_product(value)
+                if found:
+                    return found
+    return None
+
+def _text(value):
+    """Plain string for a JSON-LD value that may be a string, a list or a {'name': ...} object"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('@value')
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+def _image_urls(value):
+    """Image URLs from a JSON-LD image value (string, ImageObject or a list of either)"""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return _image_urls(value.get('url') or value.get('contentUrl'))
+    if isinstance(value, list):
+        return [url for item in value for url in _image_urls(item)]
+    return []
+
+def _in_stock(value):
+    """True / False for a schema.org availability value, or None if unknown"""
+    if not value:
+        return None
+    value = str(value).lower().replace(' ', '').split('/')[-1]
+    if value in ('instock', 'limitedavailability', 'onlineonly', 'instoreonly', 'preorder', 'backorder'):
+        return True
+    if value in ('outofstock', 'soldout', 'discontinued'):
+        return False
+    return None
+
+def _from_json_ld(soup):
+    fields = {}
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            document = json.loads(script.get_text(), strict=False)
+        except ValueError:
+            continue
+        product = _find_product(document)
+        if not product:
+            continue
+
+        fields['title'] = _text(product.get('name'))
+        fields['description'] = _text(product.get('description'))
+        fields['brand'] = _text(product.get('brand'))
+        fields['images'] = _image_urls(product.get('image'))
+
+        offers = product.get('offers')
+        offers = offers if isinstance(offers, list) else [offers]
+        for offer in offers:
+            if not isinstance(offer, dict):
+                continue
+            spec = offer.get('priceSpecification')
+            spec = spec[0] if isinstance(spec, list) and spec else spec
+            raw = offer.get('price', offer.get('lowPrice'))
+            if raw is None and isinstance(spec, dict):
+                raw = spec.get('price')
+            value, symbol_currency = parse_price(raw)
+            if value is not None:
+                fields['price'] = value
+                fields['currency'] = offer.get('priceCurrency') or symbol_currency
+                fields['in_stock'] = _in_stock(offer.get('availability'))
+                break
+
+        rating = product.get('aggregateRating')
+        if isinstance(rating, dict):
+            fields['rating'], _ = parse_price(rating.get('ratingValue'))
+            count, _ = parse_price(rating.get('reviewCount', rating.get('ratingCount')))
+            fields['review_count'] = int(count) if count is not None else None
+        break
+    return fields
+
+def _from_open_graph(soup):
+    properties = {}
+    for meta in soup.find_all('meta', property=True):
+        name = meta.get('property', '').lower()
+        content = (meta.get('content') or '').strip()
+        if content:
+            properties.setdefault(name, []).append(content)
+
+    def first(*names):
+        for name in names:
+            if properties.get(name):
+                return properties[name][0]
+        return None
+
+    fields = {
+        'title': first('og:title'),
+        'description': first('og:description'),
+        'brand': first('product:brand', 'og:brand'),
+        'images': properties.get('og:image:secure_url') or properties.get('og:image') or properties.get('og:image:url') or [],
+        'in_stock': _in_stock(first('product:availability', 'og:availability'))
+    }
+    value, symbol_currency = parse_price(first('product:price:amount', 'og:price:amount',
+                                               'product:sale_price:amount'))
+    if value is not None:
+        fields['price'] = value
+        fields['currency'] = first('product:price:currency', 'og:price:currency') or symbol_currency
+    return fields
+
+def _owner_scope(element):
+    """Nearest ancestor that opens an itemscope"""
+    for parent in element.parents:
+        if parent.has_attr('itemscope'):
+            return parent
+    return None
+
+def _itemprop_value(element):
+    if element.name == 'meta':
+        return element.get('content')
+    if element.name in ('img', 'source'):
+        return element.get('src') or element.get('data-src')
+    if element.name in ('a', 'link'):
+        return element.get('href')
+    return element.get('content') or element.get_text(' ', strip=True)
+
+def _from_microdata(soup):
+    scope = soup.find(attrs={'itemtype': re.compile(r'schema\.org/Product', re.I)})
+    root = scope or soup
+    # One pass over the tree, grouping the itemprop elements by name (an element may carry several)
+    elements = {}
+    for element in root.find_all(attrs={'itemprop': True}):
+        for name in element['itemprop'].split():
+            elements.setdefault(name, []).append(element)
+
+    def props(name, own=False):
+        for element in elements.get(name, ()):
+            # Names and descriptions must belong to the product itself, not a nested review or brand
+            if own and scope is not None and _owner_scope(element) is not scope:
+                continue
+            value = _itemprop_value(element)
+            if value and value.strip():
+                yield element, value.strip()
+
+    fields = {}
+    for _, value in props('name', own=True):
+        fields['title'] = value
+        break
+    for _, value in props('description', own=True):
+        fields['description'] = value
+        break
+    fields['images'] = [value for _, value in props('image', own=True)]
+    for element, value in props('brand'):
+        nested = element.find(attrs={'itemprop': 'name'}) if element.has_attr('itemscope') else None
+        fields['brand'] = _itemprop_value(nested) if nested else value
+        break
+    for _, value in props('price'):
+        fields['price'], symbol_currency = parse_price(value)
+        currency = next(props('priceCurrency'), (None, None))[1]
+        fields['currency'] = currency or symbol_currency
+        break
+    for _, value in props('availability'):
+        fields['in_stock'] = _in_stock(value)
+        break
+    for _, value in props('ratingValue'):
+        fields['rating'], _ = parse_price(value)
+        break
+    for _, value in props('reviewCount'):
+        count, _ = parse_price(value)
+        fields['review_count'] = int(count) if count is not None else None
+        break
+    return fields
+
+def extract_structured_data(soup, base_url=None, microdata=True):
+    """Product fields from JSON-LD, OpenGraph and microdata, in that order of preference.
+
+    Returns a dict holding whichever of title, description, brand, price,
+    currency, images, in_stock, rating and review_count were found, plus
+    'sources' naming the formats that contributed. Image URLs are made
+    absolute against ``base_url``. Microdata, the slowest to read, is skipped
+    when JSON-LD and OpenGraph already give the REQUIRED_FIELDS, or when
+    ``microdata`` is False.
+    """
+    data = {'sources': []}
+    for source, extract in (('json-ld', _from_json_ld), ('opengraph', _from_open_graph), ('microdata', _from_microdata)):
+        if source == 'microdata' and (not microdata or has_required_fields(data)):
+            break
+        fields = extract(soup)
+        used = False
+        for name, value in fields.items():
+            if value in (None, '', []) or data.get(name) not in (None, '', []):
+                continue
+            if name == 'currency' and 'price' in data and data['price'] != fields.get('price'):
+                # A currency only belongs with the price it came from
+                continue
+            data[name] = value
+            used = True
+        if used:
+            data['sources'].append(source)
+
+    if data.get('images'):
+        images = []
+        for src in data['images']:
+            src = src.strip()
+            if src.startswith('//'):
+                src = 'https:' + src
+            elif base_url:
+                src = urljoin(base_url, src)
+            if src not in images:
+                images.append(src)
+        data['images'] = images
+    return data
+
+def has_required_fields(data):
+    """Whether the structured data covers every field the cascades would otherwise provide"""
+    return all(data.get(name) not in (None, '', []) for name in REQUIRED_FIELDS)
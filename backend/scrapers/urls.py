@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+URL helpers shared by the Python scrapers
+"""
+
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track the visit and never change the page content
+TRACKING_PARAMS = {
+    'gclid', 'fbclid', 'msclkid', 'spm', 'scm', 'pvid', 'algo_pvid', 'algo_exp_id',
+    'aff_fcid', 'aff_fsk', 'aff_platform', 'aff_trace_key', 'sk', 'terminal_id',
+    'afsmartredirect', 'gatewayadapt', 'mc_cid', 'mc_eid', 'ref_'
+}
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_url(url):
+    """Canonical form of a URL for use as a cache or de-duplication key.
+
+    Lower-cases the scheme and host, drops default ports, fragments and tracking
+    parameters (utm_* and the ones in TRACKING_PARAMS) and sorts what is left of
+    the query string.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+# Sites with their own scraper, by a substring of the host
+PLATFORMS = (('aliexpress', 'AliExpress'), ('amazon', 'Amazon'), ('ebay', 'eBay'))
+
+def platform_for(url):
+    """Platform name for a URL ('Generic' for sites without their own scraper)"""
+    host = (urlsplit(url.strip()).hostname or '').lower()
+    for marker, platform in PLATFORMS:
+        if marker in host:
+            return platform
+    return 'Generic'
@@ -1,5 +1,5 @@
 const axios = require('axios');
-const { scrapeWithPython, checkPythonAvailability } = require('./scrapers/pythonScraperWrapper');
+const { scrapeWithPython, checkPythonAvailability, stopPythonWorker } = require('./scrapers/pythonScraperWrapper');
 
 const BASE_URL = 'http://localhost:3001';
 
@@ -73,6 +73,7 @@ async function testPythonIntegration() {
   }
 
   console.log('\n🎉 Python integration test completed!');
+  stopPythonWorker();
 }
 
 testPythonIntegration();
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Parsing benchmark
+Compares tree builders and parse modes (full, strained, early-stop) on
+synthetic multi-megabyte product pages, with the fields at the top or (with no
+description) at the end, and on the saved pages of the benchmark corpus
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'scrapers'))
+
+from html_parsing import PARSE_MODES, PageParser, resolve_parser
+from python_scraper import GENERIC_SELECTOR_ENGINE, _generic_parse_complete
+from make_corpus import CORPUS_DIR, CORPUS_VERSION
+
+def synthetic_page(size_mb, fields_at_end=False):
+    """A product page with megabytes of listing markup after the fields, or before them.
+
+    With ``fields_at_end`` the page also has no description, so the early-stop
+    check never passes: the worst case for that mode.
+    """
+    fields = (
+        '<h1 class="product-title">Benchmark Product</h1>'
+        '<span itemprop="price">$19.99</span>'
+        + ''.join(f'<img src="https://cdn.example.com/{i}.jpg" alt="image {i}">' for i in range(5))
+    )
+    description = '' if fields_at_end else '<meta name="description" content="A product page used to benchmark the parsers">'
+    head = (
+        '<html><head><title>Benchmark Product</title>' + description
+        + '<style>' + 'body { color: #333; } ' * 2000 + '</style></head><body>'
+        + ('' if fields_at_end else fields)
+    )
+    card = (
+        '<div class="card"><a href="/item/{0}"><img src="/thumb/{0}.jpg"></a>'
+        '<span class="card-title">Related item {0}</span><span class="card-price">$1.{0}</span>'
+        '<script>window.track && window.track({0});</script></div>'
+    )
+    body = []
+    size = len(head)
+    index = 0
+    while size < size_mb * 1024 * 1024:
+        chunk = card.format(index)
+        body.append(chunk)
+        size += len(chunk)
+        index += 1
+    tail = fields if fields_at_end else ''
+    return (head + ''.join(body) + tail + '</body></html>').encode('utf-8')
+
+def corpus_pages(version):
+    """{file: bytes} of the saved pages in one corpus version"""
+    directory = os.path.join(CORPUS_DIR, f'v{version}')
+    with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    pages = {}
+    for entry in manifest['pages']:
+        with open(os.path.join(directory, entry['file']), 'rb') as f:
+            pages[entry['file']] = f.read()
+    return pages
+
+def measure(parser, content, repeat):
+    """Best wall time and peak traced memory for parsing content"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser.parse(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    soup = parser.parse(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del soup
+    return best, peak
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark HTML parser backends and parse modes')
+    parser.add_argument('--size-mb', type=float, default=3, help='Size of the synthetic page')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per configuration (best is reported)')
+    parser.add_argument('--corpus', type=int, default=CORPUS_VERSION, help='Corpus version of the saved pages')
+    args = parser.parse_args(argv)
+
+    pages = {
+        f'synthetic ({args.size_mb:g} MB)': synthetic_page(args.size_mb),
+        f'synthetic, fields at end ({args.size_mb:g} MB)': synthetic_page(args.size_mb, fields_at_end=True)
+    }
+    pages.update(corpus_pages(args.corpus))
+
+    builders = ['html.parser']
+    if resolve_parser('auto') == 'lxml':
+        builders.append('lxml')
+
+    print(f"{'page':<40} {'parser':<12} {'mode':<9} {'ms':>9} {'peak MB':>9}")
+    print('-' * 83)
+    for name, content in pages.items():
+        for builder in builders:
+            for mode in PARSE_MODES:
+                page_parser = PageParser(builder, mode, GENERIC_SELECTOR_ENGINE, _generic_parse_complete)
+                elapsed, peak = measure(page_parser, content, args.repeat)
+                print(f"{name[:40]:<40} {builder:<12} {mode:<9} {elapsed * 1000:>9.1f} {peak / (1024 * 1024):>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark
+Measures how long the scraper modules take to import in a fresh interpreter
+(and whether Selenium is loaded on the way), and the cold start of the web app:
+launch to first successful response, and SIGTERM to exit
+"""
+
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRAPERS_DIR = os.path.join(ROOT, 'backend', 'scrapers')
+APP_DIR = os.path.join(ROOT, 'scraper-app')
+
+IMPORT_SCRIPT = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(elapsed, any(name.startswith('selenium') for name in sys.modules))\n"
+)
+
+# Modules to import, and the directory each is imported from
+MODULES = {
+    'python_scraper': SCRAPERS_DIR,
+    'app': APP_DIR
+}
+
+def measure_import(module, cwd, env, repeat):
+    """Import times of ``module`` in ``repeat`` fresh interpreters, and whether Selenium was loaded"""
+    times = []
+    selenium_loaded = False
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SCRIPT.format(module=module)],
+            cwd=cwd, env=dict(env, PYTHONPATH=os.pathsep.join([cwd, SCRAPERS_DIR])), text=True
+        )
+        elapsed, loaded = output.split()
+        times.append(float(elapsed))
+        selenium_loaded = selenium_loaded or loaded == 'True'
+    return times, selenium_loaded
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_response(url, process, timeout):
+    """Seconds until ``url`` answers 200, or None if the server died or timed out"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.02)
+    return None
+
+def measure_cold_start(mode, workers, env, timeout):
+    """(launch to first response, SIGTERM to exit) in seconds for one server start"""
+    port = free_port()
+    command = [sys.executable, os.path.join(APP_DIR, 'run.py'), '--host', '127.0.0.1', '--port', str(port)]
+    if mode == 'production':
+        command += ['--production', '--workers', str(workers)]
+    else:
+        command += ['--skip-install']
+
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    try:
+        ready = wait_for_response(f'http://127.0.0.1:{port}/stats', process, timeout)
+    finally:
+        start = time.perf_counter()
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        stopped = time.perf_counter() - start
+    return ready, stopped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark import time and web app cold start')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters / server starts per measurement')
+    parser.add_argument('--workers', type=int, default=2, help='Workers for the production server')
+    parser.add_argument('--modes', default='production,development',
+                        help='Comma-separated server modes to start (production needs gunicorn)')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for a server to answer')
+    args = parser.parse_args(argv)
+
+    # Keep the app's caches, jobs and pages out of the working tree
+    scratch = tempfile.mkdtemp(prefix='bench_startup_')
+    env = dict(os.environ)
+    for name in ('HTTP_CACHE_DIR', 'RESULT_CACHE_DIR', 'PAGE_STORE_DIR', 'JOB_STATE_DIR'):
+        env[name] = os.path.join(scratch, name.lower())
+    env['PRICE_HISTORY_PATH'] = os.path.join(scratch, 'price_history.sqlite3')
+
+    print(f"{'import':<20} {'median ms':>10} {'min ms':>10} {'selenium loaded':>16}")
+    print('-' * 59)
+    for module, cwd in MODULES.items():
+        times, selenium_loaded = measure_import(module, cwd, env, args.repeat)
+        print(f"{module:<20} {statistics.median(times) * 1000:>10.1f} {min(times) * 1000:>10.1f} "
+              f"{'yes' if selenium_loaded else 'no':>16}")
+
+    print()
+    print(f"{'server':<20} {'first response ms':>18} {'shutdown ms':>12}")
+    print('-' * 52)
+    for mode in args.modes.split(','):
+        ready, stopped = [], []
+        for _ in range(args.repeat):
+            first, stop = measure_cold_start(mode, args.workers, env, args.timeout)
+            if first is None:
+                break
+            ready.append(first)
+            stopped.append(stop)
+        if not ready:
+            print(f"{mode:<20} {'failed to start':>18}")
+            continue
+        print(f"{mode:<20} {statistics.median(ready) * 1000:>18.1f} {statistics.median(stopped) * 1000:>12.1f}")
+
+if __name__ == '__main__':
+    main()
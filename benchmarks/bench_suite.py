@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite
+Serves the saved product pages in benchmarks/corpus from a local HTTP
+stand-in and measures every scrape stage on them: fetch, parse, the embedded
+AliExpress state, each extraction cascade, sales copy and page rendering, and
+the whole app scrape. Reports pages/sec, p50/p99 latency and peak traced
+memory per stage, checks the extracted fields against the corpus manifest and
+compares the run with a stored baseline; a regression fails the run.
+
+    python benchmarks/bench_suite.py                    # measure and compare with baseline.json
+    python benchmarks/bench_suite.py --update-baseline  # measure and store the result as the baseline
+"""
+
+import argparse
+import json
+import os
+import platform as platform_module
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRAPERS_DIR = os.path.join(ROOT, 'backend', 'scrapers')
+APP_DIR = os.path.join(ROOT, 'scraper-app')
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Default corpus version; must match the baseline's
+CORPUS_VERSION = 2
+
+def load_corpus(version):
+    """(manifest pages, {file: bytes}) for one corpus version"""
+    directory = os.path.join(CORPUS_DIR, f'v{version}')
+    with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    contents = {}
+    for page in manifest['pages']:
+        with open(os.path.join(directory, page['file']), 'rb') as f:
+            contents[page['file']] = f.read()
+    return manifest['pages'], contents
+
+class CorpusServer:
+    """Local HTTP stand-in serving the corpus pages at /<file>, optionally after a fixed delay"""
+    def __init__(self, contents, latency=0.0):
+        self.contents = contents
+        self.latency = latency
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                body = server.contents.get(self.path.lstrip('/'))
+                if server.latency:
+                    time.sleep(server.latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url(self, name):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/{name}'
+
+def calibrate(rounds=7):
+    """Seconds a fixed pure-Python workload takes on this machine (median of ``rounds``).
+
+    Stored with the baseline to show when a run is on a different machine; with
+    ``--scale-to-machine`` baseline latencies are scaled by the ratio of the two.
+    """
+    data = [{'id': i, 'name': f'item {i}', 'tags': ['a', 'b', 'c'], 'price': i * 1.5} for i in range(2000)]
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(5):
+            decoded = json.loads(json.dumps(data))
+            sorted(decoded, key=lambda item: (-item['price'], item['name']))
+            ''.join(item['name'] for item in decoded).count('1')
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def measure(run, inputs, repeat):
+    """Latency samples and peak traced memory of ``run`` over every input.
+
+    Each input is run once to warm up, then ``repeat`` timed times; memory is
+    measured in a separate untimed pass because tracing slows everything down.
+    """
+    for item in inputs:
+        run(item)
+
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            run(item)
+            latencies.append(time.perf_counter() - start)
+
+    peak = 0
+    for item in inputs:
+        tracemalloc.start()
+        run(item)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        'pages': len(inputs),
+        'pages_per_sec': round(len(latencies) / sum(latencies), 1) if sum(latencies) else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+def import_app(scratch):
+    """Import the Flask app with its caches, jobs and pages kept in ``scratch``"""
+    for name in ('HTTP_CACHE_DIR', 'RESULT_CACHE_DIR', 'PAGE_STORE_DIR', 'JOB_STATE_DIR'):
+        os.environ[name] = os.path.join(scratch, name.lower())
+    os.environ['SELECTOR_STATS_PATH'] = os.path.join(scratch, 'selectors.json')
+    os.environ['PRICE_HISTORY_PATH'] = os.path.join(scratch, 'price_history.sqlite3')
+    sys.path.insert(0, APP_DIR)
+    sys.path.insert(0, SCRAPERS_DIR)
+    cwd = os.getcwd()
+    # The app creates its template and static directories relative to the working directory
+    os.chdir(APP_DIR)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app
+
+class Page:
+    """A corpus page with everything the stages need precomputed"""
+    def __init__(self, entry, content, url):
+        self.entry = entry
+        self.content = content
+        self.local_url = url
+        self.url = entry['url']
+        self.layout = entry['layout']
+
+def build_stages(app, pages):
+    """{stage: (run(page), pages)}: every stage the suite measures and the pages it runs on"""
+    import aliexpress_static
+    import python_scraper
+    from html_parsing import PageParser
+    from rendering import SalesPageRenderer
+    from structured_data import extract_structured_data
+
+    app_scraper = app.ProductScraper()
+    generic_scraper = python_scraper.ProductScraper()
+    generator = app.generator
+    # No render cache: every call renders, as it would for a new product
+    renderer = SalesPageRenderer(app.TEMPLATE_DIR, cache_size=0)
+
+    app_full = PageParser('auto', 'full', app.PRODUCT_SELECTOR_ENGINE)
+    generic_full = PageParser('auto', 'full', python_scraper.GENERIC_SELECTOR_ENGINE)
+    app_early = PageParser('auto', 'early', app.PRODUCT_SELECTOR_ENGINE, app_scraper._parse_complete)
+    for page in pages:
+        page.soup = app_full.parse(page.content)
+        page.matches = app.PRODUCT_SELECTOR_ENGINE.match(page.soup)
+        page.generic_soup = generic_full.parse(page.content)
+        page.text = page.content.decode('utf-8')
+        page.product_data = app_scraper._parse_product(page.url, page.content)
+        page.sales_copy = generator.generate_sales_copy(page.product_data)
+
+    aliexpress = [page for page in pages if page.layout == 'aliexpress_state']
+    stages = {
+        'fetch': (lambda page: app_scraper.session.get(page.local_url, timeout=10).content, pages),
+        'parse': (lambda page: app_scraper.page_parser.parse(page.content), pages),
+        'parse_early': (lambda page: app_early.parse(page.content), pages),
+        'aliexpress_state': (lambda page: aliexpress_static.extract_fields(page.text), aliexpress),
+        'extract_structured': (lambda page: extract_structured_data(page.soup, page.url), pages),
+        'extract_title': (lambda page: app_scraper._extract_title(page.matches), pages),
+        'extract_price': (lambda page: app_scraper._extract_price(page.matches), pages),
+        'extract_description': (lambda page: app_scraper._extract_description(page.matches), pages),
+        'extract_main_image': (lambda page: app_scraper._extract_main_image(page.matches, page.url), pages),
+        'extract_generic': (lambda page: generic_scraper._extract_generic(page.url, page.generic_soup), pages),
+        'generate_sales_copy': (lambda page: generator.generate_sales_copy(page.product_data), pages),
+        'create_sales_page_html': (lambda page: renderer.render(page.product_data, page.sales_copy), pages),
+        'scrape': (lambda page: app_scraper._fetch_and_parse(page.local_url), pages)
+    }
+    return stages, (app_scraper, generic_scraper)
+
+def check_pages(pages, scrapers):
+    """Fields that no longer match the manifest, as readable messages"""
+    import aliexpress_static
+    from structured_data import parse_price
+
+    app_scraper, generic_scraper = scrapers
+    problems = []
+    for page in pages:
+        expected = page.entry['expected']
+        if page.layout == 'aliexpress_state':
+            state = aliexpress_static.extract_fields(page.text) or {}
+            found = {'embedded state': (state.get('title'), state.get('price'))}
+        else:
+            product_data = app_scraper._fetch_and_parse(page.local_url)
+            generic = generic_scraper._extract_generic(page.url, page.generic_soup)
+            found = {
+                'app': (product_data['title'], parse_price(product_data['price'])[0]),
+                'python_scraper': (generic['title'], generic['price']['current'])
+            }
+        for source, (title, price) in found.items():
+            if title != expected['title'] or price != expected['price']:
+                problems.append(f"{page.entry['file']} ({source}): got {title!r} / {price!r}, "
+                                f"expected {expected['title']!r} / {expected['price']!r}")
+    return problems
+
+def compare(results, baseline, tolerance, memory_tolerance, scale=1.0):
+    """Regressions against the baseline as readable messages.
+
+    A stage regresses when its p50 is more than ``tolerance`` slower than the
+    baseline's times ``scale`` (its p99 gets twice the margin), or its peak
+    memory grows by more than ``memory_tolerance``.
+    """
+    regressions = []
+    for stage, result in results.items():
+        reference = baseline['stages'].get(stage)
+        if reference is None:
+            continue
+        limits = {
+            'p50_ms': reference['p50_ms'] * scale * (1 + tolerance),
+            'p99_ms': reference['p99_ms'] * scale * (1 + 2 * tolerance),
+            'peak_kb': reference['peak_kb'] * (1 + memory_tolerance)
+        }
+        for metric, limit in limits.items():
+            # Sub-millisecond noise and allocator slack are not regressions
+            floor = 0.01 if metric != 'peak_kb' else 16
+            if result[metric] > limit and result[metric] - reference[metric] > floor:
+                regressions.append(f"{stage}: {metric} {result[metric]:g} > {limit:.3f} "
+                                   f"(baseline {reference[metric]:g})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every scrape stage on the saved page corpus')
+    parser.add_argument('--corpus', type=int, default=CORPUS_VERSION, help='Corpus version to run')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs of each stage per page')
+    parser.add_argument('--stages', help='Comma-separated stages to run (default: all)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay the stand-in server adds to each response')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--update-baseline', action='store_true', help='Store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='Allowed p50 slowdown (0.3 = 30%%)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help='Allowed peak memory growth')
+    parser.add_argument('--scale-to-machine', action='store_true',
+                        help='Scale baseline latencies by how fast this machine runs a fixed workload')
+    parser.add_argument('--json', metavar='FILE', help='Also write the results to FILE')
+    args = parser.parse_args(argv)
+
+    entries, contents = load_corpus(args.corpus)
+    app = import_app(tempfile.mkdtemp(prefix='bench_suite_'))
+
+    with CorpusServer(contents, args.latency_ms / 1000) as server:
+        pages = [Page(entry, contents[entry['file']], server.url(entry['file'])) for entry in entries]
+        stages, scrapers = build_stages(app, pages)
+        selected = args.stages.split(',') if args.stages else list(stages)
+        unknown = [name for name in selected if name not in stages]
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(unknown)} (choose from {', '.join(stages)})")
+
+        problems = check_pages(pages, scrapers)
+        calibration = calibrate()
+
+        print(f"corpus v{args.corpus}: {len(pages)} pages, {args.repeat} runs each")
+        print(f"{'stage':<24} {'pages':>6} {'pages/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak KB':>10}")
+        print('-' * 75)
+        results = {}
+        for name in selected:
+            run, inputs = stages[name]
+            results[name] = result = measure(run, inputs, args.repeat)
+            print(f"{name:<24} {result['pages']:>6} {result['pages_per_sec'] or 0:>10.1f} {result['p50_ms']:>10.3f} "
+                  f"{result['p99_ms']:>10.3f} {result['peak_kb']:>10.1f}")
+
+        # Calibrated on both sides of the run so a burst of machine load skews it less
+        calibration = (calibration + calibrate()) / 2
+        print(f"calibration {calibration * 1000:.1f} ms")
+
+    report = {
+        'corpus_version': args.corpus,
+        'calibration_ms': round(calibration * 1000, 3),
+        'python': platform_module.python_version(),
+        'stages': results
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if problems:
+        failed = True
+        print("\n❌ Extracted fields differ from the corpus manifest:")
+        for problem in problems:
+            print(f"   {problem}")
+
+    if args.update_baseline:
+        if failed:
+            print("\n❌ Not updating the baseline while extraction is wrong")
+            sys.exit(1)
+        if os.path.exists(args.baseline) and args.stages:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+            if previous.get('corpus_version') == args.corpus:
+                report['stages'] = {**previous['stages'], **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"\n✅ Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n⚠️  No baseline at {args.baseline}; run with --update-baseline to create one")
+    else:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('corpus_version') != args.corpus:
+            print(f"\n❌ Baseline is for corpus v{baseline.get('corpus_version')}, not v{args.corpus}; "
+                  f"rerun with --update-baseline")
+            sys.exit(1)
+        speed = calibration * 1000 / baseline['calibration_ms']
+        scale = speed if args.scale_to_machine else 1.0
+        if not args.scale_to_machine and abs(speed - 1) > 0.25:
+            print(f"\n⚠️  This machine ran the calibration workload x{speed:.2f} as long as the baseline's; "
+                  f"refresh the baseline here or pass --scale-to-machine")
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance, scale)
+        if regressions:
+            failed = True
+            print(f"\n❌ Regressions against the baseline (latency limits x{scale:.2f}):")
+            for regression in regressions:
+                print(f"   {regression}")
+        else:
+            print(f"\n✅ No regressions against the baseline (latency limits x{scale:.2f})")
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmark corpus builder
+Writes the saved product pages bench_suite.py serves from its local HTTP
+stand-in. Each sample product (shaped like src/data/product.json) is saved in
+the page layouts the scrapers meet: JSON-LD, OpenGraph, microdata, plain CSS
+cascades, lazy-loaded images, an AliExpress page with embedded state, a
+large listing page and the early-stop parser's worst case: a product at the end
+of the listing markup with no description.
+
+The corpus is versioned: pages are written to corpus/v<CORPUS_VERSION>, and a
+change to any layout or sample needs a new version (and a new baseline), so
+results are only ever compared on identical pages.
+"""
+
+import argparse
+import copy
+import html
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+PRODUCT_JSON = os.path.join(ROOT, 'src', 'data', 'product.json')
+
+CORPUS_VERSION = 2
+
+# Host each layout pretends to come from; decides the platform label and scraper path
+LAYOUT_HOSTS = {
+    'json_ld': 'https://shop.example.com/products/{slug}',
+    'open_graph': 'https://store.example.net/p/{slug}',
+    'microdata': 'https://www.example.org/item/{slug}',
+    'css_cascade': 'https://www.amazon.com/dp/{slug}',
+    'lazy_images': 'https://www.ebay.com/itm/{slug}',
+    'aliexpress_state': 'https://www.aliexpress.us/item/{slug}.html',
+    'large_listing': 'https://outlet.example.com/products/{slug}',
+    'fields_at_end': 'https://outlet.example.com/clearance/{slug}'
+}
+
+def sample_products():
+    """src/data/product.json plus two variants with other titles, prices, currencies and image counts"""
+    with open(PRODUCT_JSON, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+
+    lamp = copy.deepcopy(base)
+    lamp.update({
+        'id': 'prod_234567',
+        'title': 'Smart LED Desk Lamp with Wireless Charger',
+        'brand': 'Lumina',
+        'price': {'current': 49.5, 'original': 64.0, 'currency': 'USD', 'discount_percentage': 23},
+        'description': ('Adjustable colour temperature, five brightness levels and a 10W wireless charging pad '
+                        'in the base. The aluminium arm folds flat for travel and remembers your last setting.'),
+        'images': [{'url': f'https://images.example.com/lamp/{i}.jpg', 'alt': f'Desk lamp view {i}',
+                    'is_primary': i == 0} for i in range(8)]
+    })
+
+    kettle = copy.deepcopy(base)
+    kettle.update({
+        'id': 'prod_345678',
+        'title': 'Gooseneck Electric Kettle 0.9L',
+        'brand': 'Brewhaus',
+        'price': {'current': 1299.0, 'original': 1499.0, 'currency': 'GBP', 'discount_percentage': 13},
+        'description': ('Precise pour spout, temperature hold for sixty minutes and a stainless steel body. '
+                        'Heats a full kettle in under four minutes with a keep-warm base and auto shut-off.'),
+        'images': base['images'][:1]
+    })
+    return [base, lamp, kettle]
+
+def _symbol(currency):
+    return {'USD': '$', 'GBP': '£', 'EUR': '€'}.get(currency, '$')
+
+def _price_text(product):
+    price = product['price']
+    return f"{_symbol(price['currency'])}{price['current']:,.2f}"
+
+def _reviews(product):
+    return ''.join(
+        f'<div class="review-item"><span class="rating">{review["rating"]}</span>'
+        f'<p class="review-text">{html.escape(review["comment"])}</p>'
+        f'<span class="reviewer-name">{html.escape(review["user_name"])}</span></div>'
+        for review in product['reviews']['recent_reviews']
+    )
+
+def _chrome(body_open, extra_head=''):
+    """Site furniture shared by every layout: navigation, styles and tracking scripts"""
+    nav = ''.join(f'<li><a href="/c/{i}">Category {i}</a></li>' for i in range(40))
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        '<style>' + '.nav li { display: inline-block; padding: 4px; } ' * 200 + '</style>'
+        + extra_head + '</head><body>'
+        f'<header><ul class="nav">{nav}</ul></header>' + body_open
+    )
+
+def _footer():
+    links = ''.join(f'<a href="/help/{i}">Help topic {i}</a>' for i in range(60))
+    return (f'<footer>{links}</footer>'
+            '<script>window.dataLayer = window.dataLayer || []; dataLayer.push({"event": "view"});</script>'
+            '</body></html>')
+
+def _related(count):
+    return ''.join(
+        f'<div class="card"><a href="/item/{i}"><img src="/thumb/{i}.jpg" alt="thumbnail {i}"></a>'
+        f'<span class="card-title">Related item {i}</span><span class="card-price">${i % 90 + 1}.99</span></div>'
+        for i in range(count)
+    )
+
+def json_ld_page(product):
+    data = {
+        '@context': 'https://schema.org', '@type': 'Product', 'name': product['title'],
+        'description': product['description'], 'brand': {'@type': 'Brand', 'name': product['brand']},
+        'image': [image['url'] for image in product['images']],
+        'offers': {'@type': 'Offer', 'price': str(product['price']['current']),
+                   'priceCurrency': product['price']['currency'], 'availability': 'https://schema.org/InStock'}
+    }
+    head = f'<title>{html.escape(product["title"])}</title><script type="application/ld+json">{json.dumps(data)}</script>'
+    return _chrome(f'<main><h1>{html.escape(product["title"])}</h1>{_related(30)}</main>', head) + _footer()
+
+def open_graph_page(product):
+    meta = [('og:title', product['title']), ('og:description', product['description']),
+            ('product:price:amount', str(product['price']['current'])),
+            ('product:price:currency', product['price']['currency'])]
+    meta += [('og:image', image['url']) for image in product['images']]
+    head = ''.join(f'<meta property="{name}" content="{html.escape(value)}">' for name, value in meta)
+    return _chrome(f'<main><div class="gallery"></div>{_related(30)}</main>', head) + _footer()
+
+def microdata_page(product):
+    images = ''.join(f'<img itemprop="image" src="{image["url"]}" alt="{html.escape(image["alt"])}">'
+                     for image in product['images'])
+    body = (
+        '<main><div itemscope itemtype="https://schema.org/Product">'
+        f'<h1 itemprop="name">{html.escape(product["title"])}</h1>{images}'
+        f'<p itemprop="description">{html.escape(product["description"])}</p>'
+        '<div itemprop="offers" itemscope itemtype="https://schema.org/Offer">'
+        f'<span itemprop="price" content="{product["price"]["current"]}">{_price_text(product)}</span>'
+        f'<meta itemprop="priceCurrency" content="{product["price"]["currency"]}"></div></div>'
+        f'{_related(30)}</main>'
+    )
+    return _chrome(body, f'<title>{html.escape(product["title"])}</title>') + _footer()
+
+def css_cascade_page(product):
+    images = ''.join(f'<img src="{image["url"]}" alt="{html.escape(image["alt"])}">' for image in product['images'])
+    body = (
+        f'<main><div class="breadcrumbs">{html.escape(product["category"])}</div>'
+        f'<h1 class="product-title">{html.escape(product["title"])}</h1>'
+        f'<div class="product-image">{images}</div>'
+        f'<div class="product-price">{_price_text(product)}</div>'
+        f'<div class="product-description">{html.escape(product["description"])}</div>'
+        f'<section class="reviews">{_reviews(product)}</section>{_related(30)}</main>'
+    )
+    return _chrome(body, f'<title>{html.escape(product["title"])}</title>') + _footer()
+
+def lazy_images_page(product):
+    """Fields only the last selectors of each cascade find: data-src images, a meta description"""
+    images = ''.join(f'<img data-src="{image["url"]}" alt="main {html.escape(image["alt"])}">'
+                     for image in product['images'])
+    body = (
+        f'<main><div class="x-item-title"><span class="product-name">{html.escape(product["title"])}</span></div>'
+        f'<div class="gallery">{images}</div>'
+        f'<div class="x-bin-price"><span class="ux-textspans">{_price_text(product)}</span></div>'
+        f'{_related(30)}</main>'
+    )
+    head = (f'<title>{html.escape(product["title"])}</title>'
+            f'<meta name="description" content="{html.escape(product["description"])}">')
+    return _chrome(body, head) + _footer()
+
+def aliexpress_state_page(product):
+    price = product['price']
+    state = {'data': {
+        'productInfoComponent': {'subject': product['title']},
+        'priceComponent': {
+            'minActivityAmount': {'value': price['current'], 'currency': price['currency']},
+            'minAmount': {'value': price['original'], 'currency': price['currency']}
+        },
+        'imageComponent': {'imagePathList': [image['url'].replace('https:', '') for image in product['images']]},
+        'feedbackComponent': {'averageStar': str(product['reviews']['average_rating']),
+                              'totalValidNum': product['reviews']['total_reviews']},
+        'inventoryComponent': {'totalAvailQuantity': product['availability']['stock_quantity']}
+    }}
+    script = f'<script>window.runParams = {json.dumps(state)};</script>'
+    body = f'<div id="root"><h1 class="product-title-text">{html.escape(product["title"])}</h1></div>{script}'
+    return _chrome(body, f'<title>{html.escape(product["title"])} - AliExpress</title>') + _footer()
+
+def large_listing_page(product):
+    """The product near the top of several hundred kilobytes of listing markup"""
+    return css_cascade_page(product).replace(_related(30), _related(1500))
+
+def fields_at_end_page(product):
+    """The product after several hundred kilobytes of listing markup, with no description anywhere,
+    so the early-stop check never passes before the end of the page"""
+    images = ''.join(f'<img src="{image["url"]}" alt="{html.escape(image["alt"])}">' for image in product['images'])
+    body = (
+        f'<main>{_related(1500)}'
+        f'<h1 class="product-title">{html.escape(product["title"])}</h1>'
+        f'<div class="product-image">{images}</div>'
+        f'<div class="product-price">{_price_text(product)}</div></main>'
+    )
+    return _chrome(body, f'<title>{html.escape(product["title"])}</title>') + _footer()
+
+LAYOUTS = {
+    'json_ld': json_ld_page,
+    'open_graph': open_graph_page,
+    'microdata': microdata_page,
+    'css_cascade': css_cascade_page,
+    'lazy_images': lazy_images_page,
+    'aliexpress_state': aliexpress_state_page,
+    'large_listing': large_listing_page,
+    'fields_at_end': fields_at_end_page
+}
+
+# Layouts saved for every sample; the rest only for the first one
+EVERY_SAMPLE = ('json_ld', 'open_graph', 'microdata', 'css_cascade', 'lazy_images', 'aliexpress_state')
+
+def build(output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    pages = []
+    for index, product in enumerate(sample_products()):
+        for layout, render in LAYOUTS.items():
+            if layout not in EVERY_SAMPLE and index:
+                continue
+            name = f"{product['id']}_{layout}.html"
+            with open(os.path.join(output_dir, name), 'w', encoding='utf-8') as f:
+                f.write(render(product))
+            pages.append({
+                'file': name,
+                'layout': layout,
+                'url': LAYOUT_HOSTS[layout].format(slug=product['id']),
+                'expected': {'title': product['title'], 'price': product['price']['current']}
+            })
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': CORPUS_VERSION, 'pages': pages}, f, indent=2)
+        f.write('\n')
+    return pages
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the benchmark corpus of saved product pages')
+    parser.add_argument('--output', default=os.path.join(CORPUS_DIR, f'v{CORPUS_VERSION}'),
+                        help='Directory for the pages and manifest.json')
+    args = parser.parse_args(argv)
+
+    pages = build(args.output)
+    print(f"Wrote {len(pages)} pages to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -1,151 +1,407 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, Response, g
 import requests
-from bs4 import BeautifulSoup
 import os
+import sys
 from datetime import datetime
 import re
 from urllib.parse import urljoin, urlparse
 import json
+import time
+from functools import partial
+
+# Helpers shared with the backend's Python scraper
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'scrapers'))
+from async_engine import AsyncFetcher, scrape_many_async
+from concurrency import scrape_many
+from html_parsing import PageParser
+from http_cache import HttpCache
+import metrics
+from result_cache import ResultCache, is_scrape_error
+from selector_engine import SelectorEngine
+from selector_stats import SelectorStats
+from singleflight import SingleFlight
+from streaming import FETCH_MODES, content_length, iter_body, read_body
+from jobs import DONE, FAILED, JobQueue, QueueFull
+from page_store import PageStore
+from price_history import PriceHistory, product_fingerprint
+from rate_limit import RateLimiter, RetryPolicy, install_limiter
+from rendering import SalesPageRenderer
+from structured_data import STRUCTURED_DATA_SELECTORS, extract_structured_data, format_price, has_required_fields
+from urls import normalize_url, platform_for
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
 
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
 # Create templates and static directories if they don't exist
 os.makedirs('templates', exist_ok=True)
 os.makedirs('static/css', exist_ok=True)
 os.makedirs('static/js', exist_ok=True)
 
+# On-disk cache of fetched product pages, shared by every request
+HTTP_CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', os.path.join('cache', 'http'))
+HTTP_CACHE_TTL = int(os.environ.get('HTTP_CACHE_TTL', 600))
+HTTP_CACHE_MAX_MB = int(os.environ.get('HTTP_CACHE_MAX_MB', 256))
+
+# Adaptive per-domain concurrency for outgoing fetches, and retries for transient failures
+RATE_LIMIT_MAX_PER_DOMAIN = int(os.environ.get('RATE_LIMIT_MAX_PER_DOMAIN', 16))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 3))
+
+# 'stream' parses pages as they download (and stops reading once every field is found
+# when PARSE_MODE is 'early'); 'buffered' reads the body first. Pages over MAX_PAGE_MB
+# (decompressed) fail either way
+FETCH_MODE = os.environ.get('FETCH_MODE', 'stream')
+PARSE_MODE = os.environ.get('PARSE_MODE', 'strained')
+MAX_PAGE_MB = float(os.environ.get('MAX_PAGE_MB', 8))
+
+# Scraped product data, reused for repeat URLs and refreshed in the background once stale
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join('cache', 'results'))
+RESULT_FRESH_SECONDS = int(os.environ.get('RESULT_FRESH_SECONDS', 3600))
+RESULT_MAX_STALE_SECONDS = int(os.environ.get('RESULT_MAX_STALE_SECONDS', 86400))
+
+# Which selector wins each field on each site; winners are tried first on later pages
+SELECTOR_STATS_PATH = os.environ.get('SELECTOR_STATS_PATH', os.path.join('cache', 'selectors.json'))
+
+# Generated sales pages, stored once per distinct content
+PAGE_STORE_DIR = os.environ.get('PAGE_STORE_DIR', 'pages')
+PAGE_STORE_MAX_MB = int(os.environ.get('PAGE_STORE_MAX_MB', 512))
+PAGE_STORE_MAX_AGE_DAYS = int(os.environ.get('PAGE_STORE_MAX_AGE_DAYS', 30))
+
+# Product fingerprints and price points; a product unchanged since its last page reuses that page
+PRICE_HISTORY_PATH = os.environ.get('PRICE_HISTORY_PATH', os.path.join('cache', 'price_history.sqlite3'))
+
+# Background generation jobs
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 100))
+JOB_RETRIES = int(os.environ.get('JOB_RETRIES', 2))
+JOB_STATE_DIR = os.environ.get('JOB_STATE_DIR', os.path.join('cache', 'jobs'))
+
+# Each server process's metrics, added up at /metrics (empty: this process's only)
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join('cache', 'metrics'))
+
+# Ordered selector fallbacks for each product field; the first usable match wins
+PRODUCT_SELECTORS = {
+    'title': [
+        'h1[data-testid="product-title"]',
+        'h1.product-title',
+        'h1.title',
+        'h1',
+        '.product-name',
+        '.product-title',
+        '[data-testid="product-title"]',
+        'title'
+    ],
+    'price': [
+        '[data-testid="price"]',
+        '.price',
+        '.product-price',
+        '.current-price',
+        '.price-current',
+        '[class*="price"]'
+    ],
+    'description': [
+        '[data-testid="product-description"]',
+        '.product-description',
+        '.description',
+        '.product-details',
+        '.product-info',
+        'meta[name="description"]'
+    ],
+    'image': [
+        '[data-testid="product-image"] img',
+        '.product-image img',
+        '.main-image img',
+        '.hero-image img',
+        '.product-photo img',
+        'img[alt*="product"]',
+        'img[alt*="main"]',
+        'img'
+    ]
+}
+
+# Compiled once; resolves every field's selectors in a single pass over the page.
+# The structured data elements are included so strained parses keep them
+PRODUCT_SELECTOR_ENGINE = SelectorEngine({**PRODUCT_SELECTORS, 'structured': STRUCTURED_DATA_SELECTORS})
+
 class ProductScraper:
-    def __init__(self):
+    def __init__(self, parser='auto', parse_mode='strained', http_cache=None, result_cache=None, rate_limiter=None,
+                 retry_policy=None, selector_stats=None, fetch_mode='stream', max_body_bytes=8 * 1024 * 1024):
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode: {fetch_mode}")
+        self.fetch_mode = fetch_mode
+        self.max_body_bytes = max_body_bytes
+        self.page_parser = PageParser(parser, parse_mode, PRODUCT_SELECTOR_ENGINE, self._parse_complete)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.http_cache = http_cache
+        install_limiter(self.session, self.rate_limiter, self.retry_policy, cache=http_cache)
+        self.result_cache = result_cache
+        self.single_flight = SingleFlight()
+        # Optional per-domain selector ordering (SelectorStats instance)
+        self.selector_stats = selector_stats
     
     def scrape_product(self, url):
-        """Scrape product details from a given URL"""
+        """Scrape product details from a given URL, answering from the result cache when configured"""
+        if self.result_cache is not None:
+            return self.result_cache.get_or_scrape(url, self._scrape_coalesced)
+        return self._scrape_coalesced(url)
+    
+    def _scrape_coalesced(self, url):
+        """Scrape a URL, joining an identical scrape that is already running"""
+        return self.single_flight.do(normalize_url(url), self._scrape_product, url)
+    
+    def _scrape_product(self, url):
+        """Fetch and parse a product page, recording its timing and outcome"""
+        with metrics.platform_scope(platform_for(url)):
+            try:
+                with metrics.stage('scrape'):
+                    product_data = self._fetch_and_parse(url)
+            except Exception as e:
+                metrics.record_result(None, error=e)
+                raise
+            metrics.record_result(product_data)
+            return product_data
+    
+    def _fetch_and_parse(self, url):
         try:
-            response = self.session.get(url, timeout=10)
+            with metrics.stage('fetch'):
+                response = self.session.get(url, timeout=10, stream=True)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+        except requests.RequestException as e:
+            raise Exception(f"Failed to fetch URL: {str(e)}") from e
+        
+        # Closing drops the connection when an early-stop parse left the rest unread
+        with response:
+            if self.fetch_mode == 'stream':
+                chunks = metrics.timed_iter(iter_body(response, self.max_body_bytes), 'download')
+                return self._parse_product(url, chunks, content_length(response))
+            try:
+                with metrics.stage('download'):
+                    content = read_body(response, self.max_body_bytes)
+            except requests.RequestException as e:
+                raise Exception(f"Failed to fetch URL: {str(e)}") from e
+            return self._parse_product(url, content)
+    
+    def _parse_product(self, url, content, size=None):
+        """Extract product details from a page body: bytes, or an iterable of chunks still downloading (``size`` bytes long, if known)"""
+        try:
+            orders = self._selector_orders(url)
+            is_complete = partial(self._parse_complete, orders=orders)
+            with metrics.stage('parse'):
+                if isinstance(content, (bytes, str)):
+                    soup = self.page_parser.parse(content, is_complete)
+                else:
+                    soup = self.page_parser.parse_stream(content, is_complete, size)
+            
+            extract_started = time.perf_counter()
+            # Structured data (JSON-LD, OpenGraph, microdata) first; the selector
+            # cascades only run for the fields it does not provide
+            data = extract_structured_data(soup, url)
+            fields = {}
+            if data.get('title'):
+                fields['title'] = data['title']
+            if data.get('price') is not None:
+                fields['price'] = format_price(data['price'], data.get('currency'))
+            if data.get('description') and len(data['description']) > 20:
+                desc = data['description']
+                fields['description'] = desc[:500] + "..." if len(desc) > 500 else desc
+            if data.get('images'):
+                fields['image'] = data['images'][0]
+            
+            if len(fields) < 4:
+                matches = PRODUCT_SELECTOR_ENGINE.match(soup)
+                hits = {}
+                if 'title' not in fields:
+                    fields['title'] = self._extract_title(matches, orders['title'], hits)
+                if 'price' not in fields:
+                    fields['price'] = self._extract_price(matches, orders['price'], hits)
+                if 'description' not in fields:
+                    fields['description'] = self._extract_description(matches, orders['description'], hits)
+                if 'image' not in fields:
+                    fields['image'] = self._extract_main_image(matches, url, orders['image'], hits)
+                if self.selector_stats is not None:
+                    self.selector_stats.record_all(url, hits)
             
             # Extract product information
             product_data = {
-                'title': self._extract_title(soup),
-                'price': self._extract_price(soup),
-                'description': self._extract_description(soup),
-                'image': self._extract_main_image(soup, url),
+                'title': fields['title'],
+                'price': fields['price'],
+                'description': fields['description'],
+                'image': fields['image'],
                 'url': url,
                 'scraped_at': datetime.now().isoformat()
             }
+            metrics.observe('extract', time.perf_counter() - extract_started)
             
             return product_data
             
         except requests.RequestException as e:
-            raise Exception(f"Failed to fetch URL: {str(e)}")
+            # Raised while a streamed page was still downloading
+            raise Exception(f"Failed to fetch URL: {str(e)}") from e
         except Exception as e:
-            raise Exception(f"Failed to parse product data: {str(e)}")
+            raise Exception(f"Failed to parse product data: {str(e)}") from e
     
-    def _extract_title(self, soup):
-        """Extract product title with multiple fallbacks"""
-        selectors = [
-            'h1[data-testid="product-title"]',
-            'h1.product-title',
-            'h1.title',
-            'h1',
-            '.product-name',
-            '.product-title',
-            '[data-testid="product-title"]',
-            'title'
-        ]
+    def scrape_many(self, urls, max_workers=8, max_per_domain=2):
+        """Scrape many URLs concurrently, yielding (url, product_data, error) as each finishes"""
+        return scrape_many(self.scrape_product, urls, max_workers=max_workers, max_per_domain=max_per_domain)
+    
+    async def scrape_product_async(self, url, fetcher=None):
+        """Async version of scrape_product on the pooled async engine"""
+        if fetcher is None:
+            async with self.async_fetcher() as fetcher:
+                return await self.scrape_product_async(url, fetcher)
         
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element and element.get_text(strip=True):
-                return element.get_text(strip=True)
+        with metrics.platform_scope(platform_for(url)):
+            try:
+                with metrics.stage('scrape'):
+                    try:
+                        with metrics.stage('fetch'):
+                            content = await fetcher.fetch(url)
+                    except Exception as e:
+                        raise Exception(f"Failed to fetch URL: {str(e)}") from e
+                    
+                    product_data = await fetcher.run_parse(self._parse_product, url, content)
+            except Exception as e:
+                metrics.record_result(None, error=e)
+                raise
+            metrics.record_result(product_data)
+            return product_data
+    
+    async def scrape_many_async(self, urls, max_concurrency=100, limit_per_host=8):
+        """Scrape many URLs from one event loop, yielding (url, product_data, error) as each finishes"""
+        async with self.async_fetcher(limit=max_concurrency, limit_per_host=limit_per_host) as fetcher:
+            async for item in scrape_many_async(lambda url: self.scrape_product_async(url, fetcher), urls, max_concurrency):
+                yield item
+    
+    def async_fetcher(self, **kwargs):
+        """AsyncFetcher sharing this scraper's request headers"""
+        return AsyncFetcher(headers=self.session.headers, limiter=self.rate_limiter, retry=self.retry_policy,
+                            max_bytes=self.max_body_bytes, **kwargs)
+    
+    def _selector_orders(self, url):
+        """Selector order for each field on this page: the site's past winners first when stats are kept"""
+        if self.selector_stats is None:
+            return dict(PRODUCT_SELECTORS)
+        return self.selector_stats.orders_for(url, PRODUCT_SELECTORS)
+    
+    def _parse_complete(self, soup, orders=None):
+        """Early-stop check: JSON-LD / OpenGraph have every field, or every field's cascade (in ``orders``) is settled.
+        Microdata is left out: reading it scans the whole tree"""
+        if has_required_fields(extract_structured_data(soup, microdata=False)):
+            return True
+        matches = PRODUCT_SELECTOR_ENGINE.match(soup)
+        accepts = {
+            'title': self._title_from,
+            'price': self._price_from,
+            'description': self._description_from,
+            'image': self._image_src_from
+        }
+        orders = orders or PRODUCT_SELECTORS
+        return all(PRODUCT_SELECTOR_ENGINE.settled(matches, field, accept, orders[field]) for field, accept in accepts.items())
+    
+    def _extract_title(self, matches, selectors=None, hits=None):
+        """Extract product title with multiple fallbacks, noting the winning selector in ``hits``"""
+        for selector in selectors or PRODUCT_SELECTORS['title']:
+            title = self._title_from(matches.select_one(selector))
+            if title:
+                if hits is not None:
+                    hits['title'] = selector
+                return title
         
         return "Amazing Product"
     
-    def _extract_price(self, soup):
-        """Extract product price with multiple fallbacks"""
-        selectors = [
-            '[data-testid="price"]',
-            '.price',
-            '.product-price',
-            '.current-price',
-            '.price-current',
-            '[class*="price"]'
-        ]
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                price_text = element.get_text(strip=True)
-                # Extract price using regex
-                price_match = re.search(r'[\$€£¥₹]\s*[\d,]+\.?\d*', price_text)
-                if price_match:
-                    return price_match.group()
+    def _extract_price(self, matches, selectors=None, hits=None):
+        """Extract product price with multiple fallbacks, noting the winning selector in ``hits``"""
+        for selector in selectors or PRODUCT_SELECTORS['price']:
+            price = self._price_from(matches.select_one(selector))
+            if price:
+                if hits is not None:
+                    hits['price'] = selector
+                return price
         
         return "Contact us for pricing"
     
-    def _extract_description(self, soup):
-        """Extract product description with multiple fallbacks"""
-        selectors = [
-            '[data-testid="product-description"]',
-            '.product-description',
-            '.description',
-            '.product-details',
-            '.product-info',
-            'meta[name="description"]'
-        ]
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                if element.name == 'meta':
-                    desc = element.get('content', '')
-                else:
-                    desc = element.get_text(strip=True)
-                
-                if desc and len(desc) > 20:
-                    return desc[:500] + "..." if len(desc) > 500 else desc
+    def _extract_description(self, matches, selectors=None, hits=None):
+        """Extract product description with multiple fallbacks, noting the winning selector in ``hits``"""
+        for selector in selectors or PRODUCT_SELECTORS['description']:
+            desc = self._description_from(matches.select_one(selector))
+            if desc:
+                if hits is not None:
+                    hits['description'] = selector
+                return desc[:500] + "..." if len(desc) > 500 else desc
         
         return "Discover this incredible product that will transform your experience. High-quality materials, innovative design, and exceptional value make this a must-have item."
     
-    def _extract_main_image(self, soup, base_url):
-        """Extract main product image with multiple fallbacks"""
-        selectors = [
-            '[data-testid="product-image"] img',
-            '.product-image img',
-            '.main-image img',
-            '.hero-image img',
-            '.product-photo img',
-            'img[alt*="product"]',
-            'img[alt*="main"]',
-            'img'
-        ]
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                img_src = element.get('src') or element.get('data-src') or element.get('data-lazy')
-                if img_src:
-                    # Convert relative URLs to absolute
-                    if img_src.startswith('//'):
-                        img_src = 'https:' + img_src
-                    elif img_src.startswith('/'):
-                        parsed_url = urlparse(base_url)
-                        img_src = f"{parsed_url.scheme}://{parsed_url.netloc}{img_src}"
-                    elif not img_src.startswith('http'):
-                        img_src = urljoin(base_url, img_src)
-                    
-                    return img_src
+    def _extract_main_image(self, matches, base_url, selectors=None, hits=None):
+        """Extract main product image with multiple fallbacks, noting the winning selector in ``hits``"""
+        for selector in selectors or PRODUCT_SELECTORS['image']:
+            img_src = self._image_src_from(matches.select_one(selector))
+            if img_src:
+                if hits is not None:
+                    hits['image'] = selector
+                # Convert relative URLs to absolute
+                if img_src.startswith('//'):
+                    img_src = 'https:' + img_src
+                elif img_src.startswith('/'):
+                    parsed_url = urlparse(base_url)
+                    img_src = f"{parsed_url.scheme}://{parsed_url.netloc}{img_src}"
+                elif not img_src.startswith('http'):
+                    img_src = urljoin(base_url, img_src)
+                
+                return img_src
         
         return "https://via.placeholder.com/400x300?text=Product+Image"
+    
+    def _title_from(self, element):
+        """Title text of a matched element, or None if it is empty"""
+        if element and element.get_text(strip=True):
+            return element.get_text(strip=True)
+        return None
+    
+    def _price_from(self, element):
+        """Price with its currency symbol from a matched element, or None"""
+        if element:
+            price_text = element.get_text(strip=True)
+            # Extract price using regex
+            price_match = re.search(r'[\$€£¥₹]\s*[\d,]+\.?\d*', price_text)
+            if price_match:
+                return price_match.group()
+        return None
+    
+    def _description_from(self, element):
+        """Description text from a matched element or meta tag, or None if too short"""
+        if element:
+            if element.name == 'meta':
+                desc = element.get('content', '')
+            else:
+                desc = element.get_text(strip=True)
+            
+            if desc and len(desc) > 20:
+                return desc
+        return None
+    
+    def _image_src_from(self, element):
+        """Image source of a matched element, including lazy-load attributes"""
+        if element:
+            return element.get('src') or element.get('data-src') or element.get('data-lazy')
+        return None
 
 class SalesPageGenerator:
     def __init__(self):
-        self.scraper = ProductScraper()
+        http_cache = HttpCache(HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024)
+        result_cache = ResultCache(RESULT_CACHE_DIR, fresh_for=RESULT_FRESH_SECONDS, max_stale=RESULT_MAX_STALE_SECONDS)
+        self.scraper = ProductScraper(http_cache=http_cache, result_cache=result_cache,
+                                      rate_limiter=RateLimiter(max_limit=RATE_LIMIT_MAX_PER_DOMAIN),
+                                      retry_policy=RetryPolicy(retries=HTTP_RETRIES),
+                                      selector_stats=SelectorStats(SELECTOR_STATS_PATH), fetch_mode=FETCH_MODE,
+                                      parse_mode=PARSE_MODE, max_body_bytes=int(MAX_PAGE_MB * 1024 * 1024))
+        # Compiled once at startup; rendered pages are cached by a hash of their inputs
+        self.renderer = SalesPageRenderer(TEMPLATE_DIR)
     
     def generate_sales_copy(self, product_data):
         """Generate compelling sales copy from product data"""
@@ -195,150 +451,79 @@ class SalesPageGenerator:
     
     def create_sales_page_html(self, product_data, sales_copy):
         """Generate complete HTML sales page"""
-        html_content = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{sales_copy['headline']}</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
-    <style>
-        .hero-section {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 80px 0;
-        }}
-        .product-image {{
-            max-width: 100%;
-            height: auto;
-            border-radius: 15px;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.3);
-        }}
-        .price-tag {{
-            background: #ff6b6b;
-            color: white;
-            padding: 15px 30px;
-            border-radius: 50px;
-            font-size: 2rem;
-            font-weight: bold;
-            display: inline-block;
-            margin: 20px 0;
-        }}
-        .cta-button {{
-            background: linear-gradient(45deg, #ff6b6b, #ee5a24);
-            border: none;
-            padding: 20px 50px;
-            font-size: 1.5rem;
-            font-weight: bold;
-            border-radius: 50px;
-            color: white;
-            text-decoration: none;
-            display: inline-block;
-            margin: 30px 0;
-            transition: transform 0.3s ease;
-        }}
-        .cta-button:hover {{
-            transform: scale(1.05);
-            color: white;
-        }}
-        .benefit-item {{
-            background: #f8f9fa;
-            padding: 20px;
-            margin: 10px 0;
-            border-radius: 10px;
-            border-left: 5px solid #28a745;
-        }}
-        .urgency-banner {{
-            background: #ff4757;
-            color: white;
-            padding: 15px;
-            text-align: center;
-            font-weight: bold;
-            animation: pulse 2s infinite;
-        }}
-        @keyframes pulse {{
-            0% {{ opacity: 1; }}
-            50% {{ opacity: 0.7; }}
-            100% {{ opacity: 1; }}
-        }}
-        .guarantee-section {{
-            background: #e8f5e8;
-            padding: 30px;
-            border-radius: 15px;
-            margin: 30px 0;
-        }}
-    </style>
-</head>
-<body>
-    <!-- Urgency Banner -->
-    <div class="urgency-banner">
-        <i class="fas fa-clock"></i> {sales_copy['urgency_text']}
-    </div>
-
-    <!-- Hero Section -->
-    <section class="hero-section">
-        <div class="container">
-            <div class="row align-items-center">
-                <div class="col-lg-6">
-                    <h1 class="display-4 fw-bold mb-4">{sales_copy['headline']}</h1>
-                    <p class="lead mb-4">{sales_copy['description']}</p>
-                    <div class="price-tag">{product_data['price']}</div>
-                    <br>
-                    <a href="#order" class="cta-button">
-                        <i class="fas fa-shopping-cart"></i> {sales_copy['call_to_action']}
-                    </a>
-                </div>
-                <div class="col-lg-6 text-center">
-                    <img src="{product_data['image']}" alt="{product_data['title']}" class="product-image">
-                </div>
-            </div>
-        </div>
-    </section>
-
-    <!-- Benefits Section -->
-    <section class="py-5">
-        <div class="container">
-            <div class="row">
-                <div class="col-lg-8 mx-auto">
-                    <h2 class="text-center mb-5">Why Choose This Product?</h2>
-                    {''.join([f'<div class="benefit-item"><i class="fas fa-check-circle text-success me-2"></i>{benefit}</div>' for benefit in sales_copy['benefits']])}
-                </div>
-            </div>
-        </div>
-    </section>
-
-    <!-- Guarantee Section -->
-    <section class="py-5">
-        <div class="container">
-            <div class="guarantee-section text-center">
-                <h3><i class="fas fa-shield-alt text-success"></i> {sales_copy['guarantee_text']}</h3>
-                <p class="lead">We're so confident you'll love this product that we offer a full 30-day money-back guarantee. No questions asked!</p>
-            </div>
-        </div>
-    </section>
-
-    <!-- Final CTA Section -->
-    <section id="order" class="py-5 bg-light">
-        <div class="container text-center">
-            <h2 class="mb-4">Ready to Transform Your Life?</h2>
-            <p class="lead mb-4">Don't miss out on this incredible opportunity!</p>
-            <a href="#order" class="cta-button">
-                <i class="fas fa-rocket"></i> {sales_copy['call_to_action']}
-            </a>
-            <p class="mt-3 text-muted">Secure checkout • Fast delivery • 30-day guarantee</p>
-        </div>
-    </section>
-
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
-</body>
-</html>
-        """
-        return html_content
+        return self.renderer.render(product_data, sales_copy)
+    
+    def stream_sales_page_html(self, product_data, sales_copy):
+        """Generate the HTML sales page in chunks"""
+        return self.renderer.stream(product_data, sales_copy)
 
 # Initialize the generator
 generator = SalesPageGenerator()
+page_store = PageStore(PAGE_STORE_DIR, max_bytes=PAGE_STORE_MAX_MB * 1024 * 1024,
+                       max_age=PAGE_STORE_MAX_AGE_DAYS * 24 * 3600)
+price_history = PriceHistory(PRICE_HISTORY_PATH)
+jobs = JobQueue(max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, max_retries=JOB_RETRIES,
+               state_dir=JOB_STATE_DIR)
+shared_metrics = metrics.SharedMetrics(METRICS_DIR) if METRICS_DIR else None
+
+def shutdown():
+    """Finish running jobs, stop background refreshes and save selector stats before the process exits"""
+    jobs.shutdown(wait=True)
+    generator.scraper.result_cache.close()
+    generator.scraper.selector_stats.save()
+    price_history.close()
+    if shared_metrics is not None:
+        shared_metrics.save()
+
+def _unchanged_page(url, fingerprint, store):
+    """(sales copy, page id) of the page last generated for this product, if neither it nor the templates changed"""
+    known = price_history.lookup(url)
+    if (known is None or known['fingerprint'] != fingerprint or known['render_version'] != generator.renderer.version
+            or known['sales_copy'] is None or not store.touch(known['page_id'])):
+        return None
+    return known['sales_copy'], known['page_id']
+
+def generate_page(url, store=None):
+    """The whole pipeline for one URL: scrape, write copy, render and store the page (in ``store``, default page_store).
+
+    A product whose fingerprint is the same as when its stored page was
+    generated reuses that page and its copy instead. A failed scrape raises
+    instead of rendering its fallback data.
+    """
+    store = store or page_store
+    started = time.perf_counter()
+    with metrics.trace() as timings, metrics.platform_scope(platform_for(url)):
+        # Scrape product data
+        product_data = generator.scraper.scrape_product(url)
+        
+        # Fallback data from a failed scrape gets no page and is not tracked
+        if is_scrape_error(product_data):
+            raise Exception(f"Failed to scrape URL: {product_data['source']['error']}")
+        fingerprint = product_fingerprint(product_data)
+        unchanged = _unchanged_page(url, fingerprint, store)
+        if unchanged:
+            sales_copy, page_id = unchanged
+            price_history.record(url, product_data, fingerprint)
+        else:
+            # Generate sales copy
+            with metrics.stage('copy'):
+                sales_copy = generator.generate_sales_copy(product_data)
+            
+            # Create the sales page HTML, storing it under its content hash as it renders
+            store_started = time.perf_counter()
+            chunks = metrics.timed_iter(generator.stream_sales_page_html(product_data, sales_copy), 'render')
+            page_id = store.put_stream(chunks)
+            metrics.observe('store', time.perf_counter() - store_started - timings.get('render', 0))
+            price_history.record(url, product_data, fingerprint, page_id, sales_copy, generator.renderer.version)
+    timings['total'] = time.perf_counter() - started
+    
+    return {
+        'product_data': product_data,
+        'sales_copy': sales_copy,
+        'page_id': page_id,
+        'unchanged': bool(unchanged),
+        'timings_ms': metrics.timings_ms(timings)
+    }
 
 @app.route('/')
 def index():
@@ -355,55 +540,147 @@ def generate():
         return redirect(url_for('index'))
     
     try:
-        # Scrape product data
-        product_data = generator.scraper.scrape_product(url)
-        
-        # Generate sales copy
-        sales_copy = generator.generate_sales_copy(product_data)
-        
-        # Create sales page HTML
-        sales_page_html = generator.create_sales_page_html(product_data, sales_copy)
-        
-        # Save to file
-        filename = f"sales_page_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-        filepath = os.path.join('static', filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(sales_page_html)
-        
-        # Store data in session for results page
-        session_data = {
-            'product_data': product_data,
-            'sales_copy': sales_copy,
-            'filename': filename,
-            'filepath': filepath
-        }
-        
-        return render_template('results.html', **session_data)
-        
-    except Exception as e:
-        flash(f'Error generating sales page: {str(e)}', 'error')
+        # Runs in the background; identical pending requests share one job
+        job_id = jobs.submit(normalize_url(url), generate_page, url)
+    except QueueFull as e:
+        flash(str(e), 'error')
         return redirect(url_for('index'))
+    
+    return redirect(url_for('job_page', job_id=job_id))
 
-@app.route('/download/<filename>')
-def download_file(filename):
-    """Download the generated sales page"""
-    filepath = os.path.join('static', filename)
-    if os.path.exists(filepath):
-        return send_file(filepath, as_attachment=True)
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    """Progress page that polls the job status until the sales page is ready"""
+    job = jobs.get(job_id)
+    if job is None:
+        flash('Job not found', 'error')
+        return redirect(url_for('index'))
+    if job.status in (DONE, FAILED):
+        return redirect(url_for('job_result', job_id=job_id))
+    return render_template('job.html', job=job.to_dict())
+
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    """Job status as JSON, with the result URL once it has finished"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    status = job.to_dict()
+    if job.status in (DONE, FAILED):
+        status['result_url'] = url_for('job_result', job_id=job_id)
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Results page for a finished job"""
+    job = jobs.get(job_id)
+    if job is None:
+        flash('Job not found', 'error')
+        return redirect(url_for('index'))
+    if job.status == FAILED:
+        flash(f'Error generating sales page: {job.error}', 'error')
+        return redirect(url_for('index'))
+    if job.status != DONE:
+        return redirect(url_for('job_page', job_id=job_id))
+    
+    return render_template('results.html', **job.result)
+
+def _send_page(page_id, as_attachment=False):
+    """Serve a stored page in the best encoding the client accepts, answering 304 to a matching ETag"""
+    if page_store.path(page_id) is None:
+        return None
+    
+    # Pages never change under an id, so every variant's ETag is derived from it
+    etags = {encoding: page_id if encoding == 'identity' else f"{page_id}-{encoding}"
+             for encoding in page_store.encodings()}
+    if any(request.if_none_match.contains(etag) for etag in etags.values()):
+        response = Response(status=304)
     else:
+        encoding = next(enc for enc in page_store.encodings()
+                        if enc == 'identity' or request.accept_encodings[enc])
+        response = send_file(page_store.path(page_id, encoding), mimetype='text/html',
+                             as_attachment=as_attachment, download_name=f"sales_page_{page_id}.html",
+                             conditional=False, etag=False)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etags[encoding])
+    
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/download/<page_id>')
+def download_file(page_id):
+    """Download the generated sales page"""
+    response = _send_page(page_id, as_attachment=True)
+    if response is None:
         flash('File not found', 'error')
         return redirect(url_for('index'))
+    return response
 
-@app.route('/preview/<filename>')
-def preview_file(filename):
+@app.route('/preview/<page_id>')
+def preview_file(page_id):
     """Preview the generated sales page"""
-    filepath = os.path.join('static', filename)
-    if os.path.exists(filepath):
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-    else:
+    response = _send_page(page_id)
+    if response is None:
         return "File not found", 404
+    return response
+
+# Latency of the app's own endpoints, alongside the scrape stage metrics
+REQUEST_SECONDS = metrics.REGISTRY.histogram('app_request_seconds', 'Time to handle each request',
+                                             ('endpoint', 'status'))
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unknown',
+                                status=response.status_code)
+    if shared_metrics is not None:
+        shared_metrics.start()
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Stage timings, scrape outcomes and request latency in the Prometheus text format, over every server process"""
+    text = shared_metrics.render() if shared_metrics is not None else metrics.REGISTRY.render()
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/selectors')
+def selector_report():
+    """Winning selector per field for each site (``?domain=`` for one site)"""
+    return jsonify(generator.scraper.selector_stats.report(request.args.get('domain')))
+
+@app.route('/history')
+def price_history_report():
+    """Price points and change counts of a product URL (``?url=``, optionally ``&days=``)"""
+    url = request.args.get('url', '').strip()
+    if not url:
+        return jsonify({'error': 'No URL provided'}), 400
+    days = request.args.get('days', type=float)
+    history = price_history.history(url, since=time.time() - days * 86400 if days else None)
+    if history is None:
+        return jsonify({'error': 'URL not tracked'}), 404
+    return jsonify(history)
+
+@app.route('/stats')
+def stats():
+    """Cache counters as JSON"""
+    return jsonify({
+        'http_cache': generator.scraper.http_cache.stats(),
+        'result_cache': generator.scraper.result_cache.stats(),
+        'single_flight': generator.scraper.single_flight.stats(),
+        'rate_limiter': generator.scraper.rate_limiter.stats(),
+        'selector_stats': generator.scraper.selector_stats.stats(),
+        'render_cache': generator.renderer.stats(),
+        'page_store': page_store.stats(),
+        'price_history': price_history.stats(),
+        'jobs': jobs.stats()
+    })
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
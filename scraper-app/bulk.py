@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Bulk sales page generation
+Streams product URLs from a CSV or JSONL file (or stdin), skips duplicates,
+scrapes and renders them with bounded parallelism and appends one JSON line
+per URL to results.jsonl next to the rendered pages. The results file is also
+the checkpoint: rerunning with the same output directory skips every URL
+already in it, so an interrupted run carries on where it stopped
+
+    python bulk.py catalog.csv --output runs/catalog
+    python bulk.py catalog.jsonl --output runs/catalog --workers 16 --retry-failed
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RESULTS_FILE = 'results.jsonl'
+CHECKPOINT_FILE = 'checkpoint.json'
+PAGES_DIR = 'pages'
+
+# Column (CSV) or key (JSONL) names that hold the URL, when --url-column is not given
+URL_COLUMNS = ('url', 'product_url', 'product url', 'link', 'href')
+
+def detect_format(path):
+    """'jsonl' for .jsonl / .ndjson / .json files, otherwise 'csv'"""
+    return 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+def _is_url(value):
+    return value.lower().startswith(('http://', 'https://'))
+
+def read_rows(stream, fmt, url_column=None):
+    """Yield (row number, URL or None, row dict) from a CSV or JSONL text stream.
+
+    CSV files need a header row unless their first column holds the URLs from
+    the first line on; the URL column is ``url_column`` or the first one named
+    like URL_COLUMNS. JSONL lines are objects with a ``url_column`` (default
+    'url') key, or bare JSON strings.
+    """
+    if fmt == 'csv':
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        names = [name.strip() for name in header]
+        lowered = [name.lower() for name in names]
+        if url_column is None and not set(lowered) & set(URL_COLUMNS) and header and _is_url(header[0].strip()):
+            # No header row: the first column holds the URLs
+            names, index, reader = None, 0, itertools.chain([header], reader)
+        elif url_column is not None:
+            if url_column not in names:
+                raise ValueError(f"Column '{url_column}' not found in the CSV header: {', '.join(names)}")
+            index = names.index(url_column)
+        else:
+            index = next((lowered.index(name) for name in URL_COLUMNS if name in lowered), 0)
+
+        for number, cells in enumerate(reader, 1):
+            if not any(cell.strip() for cell in cells):
+                continue
+            url = cells[index].strip() if index < len(cells) else ''
+            row = dict(zip(names, cells)) if names else {}
+            yield number, url or None, row
+        return
+
+    key = url_column or 'url'
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None, {'raw': line}
+            continue
+        if isinstance(record, str):
+            yield number, record.strip() or None, {}
+        elif isinstance(record, dict):
+            yield number, str(record.get(key) or '').strip() or None, record
+        else:
+            yield number, None, {'raw': line}
+
+def count_rows(path, fmt):
+    """Approximate number of rows in an input file, for the progress estimate"""
+    with open(path, 'rb') as f:
+        lines = sum(1 for line in f if line.strip())
+    return max(0, lines - 1) if fmt == 'csv' else lines
+
+class BulkRun:
+    """One resumable bulk run writing into an output directory.
+
+    ``generate(url, store)`` turns a URL into ``{'product_data', 'sales_copy',
+    'page_id', 'timings_ms'}``, storing the page in ``store``. Results are
+    appended to ``results.jsonl`` as they finish (in completion order) and a
+    summary of the run is kept in ``checkpoint.json``. URLs whose result is
+    already in the file are skipped, including failed ones unless
+    ``retry_failed`` is set.
+    """
+    def __init__(self, output_dir, generate, store, max_workers=8, max_per_domain=2, retry_failed=False,
+                 progress_interval=10, checkpoint_interval=5, log=None):
+        self.output_dir = output_dir
+        self.generate = generate
+        self.store = store
+        self.max_workers = max_workers
+        self.max_per_domain = max_per_domain
+        self.retry_failed = retry_failed
+        self.progress_interval = progress_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.log = log or sys.stderr
+        self.results_path = os.path.join(output_dir, RESULTS_FILE)
+        self.checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.done = set()
+        self.seen = set()
+        self.pending = {}
+        self.latencies = []
+        self.counters = {'rows': 0, 'invalid': 0, 'duplicates': 0, 'already_done': 0, 'ok': 0, 'failed': 0}
+        self.previous_seconds = 0.0
+        self.total_rows = None
+        self._load()
+
+    def _load(self):
+        """Collect the URLs finished by earlier runs, dropping a half-written last line"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                self.previous_seconds = json.load(f).get('elapsed_seconds', 0.0)
+        except (OSError, ValueError):
+            pass
+        if not os.path.exists(self.results_path):
+            return
+
+        with open(self.results_path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'ok' or not self.retry_failed:
+                self.done.add(record['key'])
+            else:
+                self.done.discard(record['key'])
+
+    def urls(self, rows, limit=None):
+        """New, unique, valid URLs from ``rows``, remembering each one's row for its result"""
+        from urls import normalize_url
+
+        started = 0
+        for number, url, row in rows:
+            self.counters['rows'] += 1
+            if not url or not _is_url(url):
+                self.counters['invalid'] += 1
+                print(f"⚠️  Row {number}: no usable URL", file=self.log)
+                continue
+            key = normalize_url(url)
+            if key in self.done:
+                self.counters['already_done'] += 1
+                continue
+            if key in self.seen:
+                self.counters['duplicates'] += 1
+                continue
+            if limit is not None and started >= limit:
+                return
+            self.seen.add(key)
+            self.pending[url] = (number, key, row)
+            started += 1
+            yield url
+
+    def run(self, rows, limit=None):
+        """Generate a page for every new URL in ``rows``; returns the counters"""
+        from concurrency import scrape_many
+
+        self.started = time.monotonic()
+        last_progress = last_checkpoint = self.started
+        window = [(self.started, 0)]
+        with open(self.results_path, 'a', encoding='utf-8') as results:
+            try:
+                urls = self.urls(rows, limit)
+                for url, result, error in scrape_many(lambda url: self.generate(url, self.store), urls,
+                                                      self.max_workers, self.max_per_domain):
+                    results.write(json.dumps(self._record(url, result, error), default=str) + '\n')
+                    results.flush()
+
+                    now = time.monotonic()
+                    if now - last_checkpoint >= self.checkpoint_interval:
+                        self._checkpoint(results)
+                        last_checkpoint = now
+                    if self.progress_interval and now - last_progress >= self.progress_interval:
+                        window = [point for point in window if now - point[0] <= 60] + [(now, self.finished)]
+                        self._progress(window)
+                        last_progress = now
+            finally:
+                self._checkpoint(results, complete=sys.exc_info()[0] is None)
+        return dict(self.counters)
+
+    @property
+    def finished(self):
+        return self.counters['ok'] + self.counters['failed']
+
+    def _record(self, url, result, error):
+        from result_cache import is_scrape_error
+
+        number, key, row = self.pending.pop(url)
+        record = {'row': number, 'url': url, 'key': key, 'input': row,
+                  'finished_at': datetime.now().isoformat()}
+        # Fallback data from a failed scrape is a failure, whatever made the page
+        if error is None and is_scrape_error(result['product_data']):
+            error = result['product_data']['source']['error']
+        if error is None:
+            self.counters['ok'] += 1
+            self.latencies.append(result['timings_ms'].get('total', 0))
+            record.update({
+                'status': 'ok',
+                'page_id': result['page_id'],
+                'page': f"{PAGES_DIR}/{result['page_id']}.html",
+                'unchanged': result.get('unchanged', False),
+                'product': result['product_data'],
+                'sales_copy': result['sales_copy'],
+                'timings_ms': result['timings_ms']
+            })
+        else:
+            self.counters['failed'] += 1
+            record.update({'status': 'failed', 'error': error})
+        return record
+
+    def _checkpoint(self, results, complete=False):
+        """Make the results durable and write the run summary"""
+        results.flush()
+        os.fsync(results.fileno())
+        state = dict(self.counters, complete=complete, elapsed_seconds=round(self.elapsed(), 1),
+                     updated_at=datetime.now().isoformat())
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.checkpoint_path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.checkpoint_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def elapsed(self):
+        """Seconds spent on this output directory, across resumed runs"""
+        return self.previous_seconds + time.monotonic() - self.started
+
+    def _progress(self, window):
+        (first_time, first_done), (last_time, last_done) = window[0], window[-1]
+        recent = (last_done - first_done) / (last_time - first_time) if last_time > first_time else 0
+        overall = self.finished / (time.monotonic() - self.started)
+        counters = self.counters
+        line = (f"⏳ {counters['rows']}{f'/{self.total_rows}' if self.total_rows else ''} rows | "
+                f"{counters['ok']} ok, {counters['failed']} failed, {counters['duplicates']} duplicates, "
+                f"{counters['already_done']} done before | {recent:.1f} pages/s (avg {overall:.1f})")
+        if self.total_rows and recent > 0:
+            remaining = max(0, self.total_rows - counters['rows']) + len(self.pending)
+            line += f" | ~{remaining / recent / 60:.0f} min left"
+        print(line, file=self.log, flush=True)
+
+    def report(self):
+        """Summary of this run for the end of the output"""
+        seconds = time.monotonic() - self.started
+        counters = self.counters
+        lines = [
+            f"Rows read:        {counters['rows']}",
+            f"Pages generated:  {counters['ok']}",
+            f"Failed:           {counters['failed']}",
+            f"Duplicates:       {counters['duplicates']}",
+            f"Done before:      {counters['already_done']}",
+            f"Invalid rows:     {counters['invalid']}",
+            f"Time:             {seconds:.1f}s ({self.finished / seconds if seconds else 0:.2f} pages/s)"
+        ]
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            lines.append(f"Latency per URL:  p50 {statistics.median(ordered):.0f} ms, "
+                         f"p99 {ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]:.0f} ms")
+        return '\n'.join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate sales pages for every product URL in a CSV or JSONL file')
+    parser.add_argument('input', help="CSV or JSONL file of product URLs ('-' for stdin)")
+    parser.add_argument('--output', required=True, help='Directory for results.jsonl, checkpoint.json and pages/')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+    parser.add_argument('--url-column', help='CSV column or JSONL key holding the URL')
+    parser.add_argument('--workers', type=int, default=8, help='Pages generated at once')
+    parser.add_argument('--per-domain', type=int, default=2, help='Pages generated at once per domain')
+    parser.add_argument('--limit', type=int, help='Generate at most this many new pages, then stop')
+    parser.add_argument('--retry-failed', action='store_true', help='Try URLs that failed in earlier runs again')
+    parser.add_argument('--restart', action='store_true', help='Forget earlier runs in the output directory')
+    parser.add_argument('--progress-interval', type=float, default=10, help='Seconds between progress lines (0: none)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format or ('jsonl' if args.input == '-' else detect_format(args.input))
+    input_path = args.input if args.input == '-' else os.path.abspath(args.input)
+    output_dir = os.path.abspath(args.output)
+
+    if args.restart:
+        for name in (RESULTS_FILE, CHECKPOINT_FILE):
+            if os.path.exists(os.path.join(output_dir, name)):
+                os.remove(os.path.join(output_dir, name))
+
+    # The app resolves its templates and caches relative to its own directory
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+    from app import generate_page, shutdown
+    from page_store import PageStore
+
+    # Bulk output is never evicted
+    store = PageStore(os.path.join(output_dir, PAGES_DIR), max_bytes=float('inf'), max_age=float('inf'))
+    run = BulkRun(output_dir, generate_page, store, max_workers=args.workers, max_per_domain=args.per_domain,
+                  retry_failed=args.retry_failed, progress_interval=args.progress_interval)
+    if run.done:
+        print(f"🔁 Resuming: {len(run.done)} URLs already done in {output_dir}", file=sys.stderr)
+    if input_path != '-':
+        run.total_rows = count_rows(input_path, fmt)
+
+    stream = sys.stdin if input_path == '-' else open(input_path, 'r', encoding='utf-8-sig', newline='')
+    try:
+        run.run(read_rows(stream, fmt, args.url_column), limit=args.limit)
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted; run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        shutdown()
+
+    print("✅ Bulk run finished", file=sys.stderr)
+    print(run.report(), file=sys.stderr)
+    print(f"📄 Results: {run.results_path}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
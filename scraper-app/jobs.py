@@ -0,0 +1,202 @@
+"""
+Background job queue for the page generation pipeline
+Requests enqueue work and return a job id straight away; a bounded pool runs
+the jobs, retries failures with backoff and merges identical pending jobs
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+class QueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+class Job:
+    """One unit of work and its progress"""
+    def __init__(self, key, fn, args):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.status = QUEUED
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Job restored from its saved state (without the work itself)"""
+        job = cls(None, None, ())
+        for name in ('id', 'status', 'attempts', 'error', 'created_at', 'finished_at', 'result'):
+            setattr(job, name, data.get(name))
+        return job
+
+class JobQueue:
+    """Bounded worker pool with retries and de-duplication.
+
+    ``submit`` returns the id of an existing queued or running job with the same
+    key instead of starting another. A failing job is retried up to
+    ``max_retries`` times, ``retry_delay`` seconds apart and doubling each time,
+    without holding a worker while it waits. Finished jobs are kept for
+    ``retention`` seconds so their status and result can be polled. With a
+    ``state_dir`` job states are also written there as JSON, so any process
+    sharing the directory (e.g. sibling server workers) can answer a poll.
+    """
+    def __init__(self, max_workers=4, max_pending=100, max_retries=2, retry_delay=1.0, retention=3600,
+                 state_dir=None):
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.retention = retention
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}
+        self._counters = {'submitted': 0, 'deduplicated': 0, 'retries': 0, 'completed': 0, 'failed': 0}
+
+    def submit(self, key, fn, *args):
+        """Queue ``fn(*args)`` and return its job id, or the id of an identical pending job"""
+        with self._lock:
+            self._prune()
+            job = self._active.get(key)
+            if job is not None:
+                self._counters['deduplicated'] += 1
+                return job.id
+            if len(self._active) >= self.max_pending:
+                raise QueueFull('Too many jobs are waiting, please try again shortly')
+
+            job = Job(key, fn, args)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._counters['submitted'] += 1
+
+        self._save(job)
+        self._executor.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        """The job with this id, or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.state_dir and job_id.isalnum():
+            try:
+                with open(os.path.join(self.state_dir, job_id + '.json'), 'r', encoding='utf-8') as f:
+                    job = Job.from_dict(json.load(f))
+            except (OSError, ValueError):
+                job = None
+        return job
+
+    def _save(self, job):
+        """Write a job's state for other processes"""
+        if not self.state_dir:
+            return
+        path = os.path.join(self.state_dir, job.id + '.json')
+        state = dict(job.to_dict(), result=job.result)
+        # A temp file of its own per write, so saves of one job from several threads never share it
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, default=str)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _run(self, job):
+        with self._lock:
+            job.status = RUNNING
+            job.attempts += 1
+        self._save(job)
+
+        try:
+            result = job.fn(*job.args)
+        except Exception as e:
+            if job.attempts <= self.max_retries:
+                delay = self.retry_delay * (2 ** (job.attempts - 1))
+                with self._lock:
+                    job.status = QUEUED
+                    job.error = str(e)
+                    self._counters['retries'] += 1
+                self._save(job)
+                timer = threading.Timer(delay, self._resubmit, (job,))
+                timer.daemon = True
+                timer.start()
+                return
+            self._finish(job, FAILED, error=str(e))
+            return
+
+        self._finish(job, DONE, result=result)
+
+    def _resubmit(self, job):
+        try:
+            self._executor.submit(self._run, job)
+        except RuntimeError:
+            # The queue was shut down while the job waited to retry
+            self._finish(job, FAILED, error=job.error)
+
+    def _finish(self, job, status, result=None, error=None):
+        with self._lock:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._counters['completed' if status == DONE else 'failed'] += 1
+        self._save(job)
+
+    def _prune(self):
+        """Forget finished jobs past the retention time (caller holds the lock)"""
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+        # Saved states, including those of other processes and earlier runs
+        if self.state_dir:
+            for name in os.listdir(self.state_dir):
+                path = os.path.join(self.state_dir, name)
+                try:
+                    if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                'queued': statuses.count(QUEUED),
+                'running': statuses.count(RUNNING),
+                'done': statuses.count(DONE),
+                'failed': statuses.count(FAILED),
+                **self._counters
+            }
+
+    def shutdown(self, wait=True):
+        """Stop taking jobs and, with ``wait``, finish the ones already running"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,192 @@
+"""
+Content-addressed storage for generated sales pages
+Pages are stored once under the hash of their content, with gzip (and brotli,
+when installed) copies made at write time, and old pages are evicted by age
+and total size
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ID_LENGTH = 24
+PAGE_ID_RE = re.compile(r'^[0-9a-f]{%d}$' % ID_LENGTH)
+
+# Stored variants: encoding name -> file suffix
+ENCODINGS = {'identity': '.html', 'gzip': '.html.gz', 'br': '.html.br'}
+
+def _temp_file(directory):
+    """A uniquely named temporary file in ``directory``: (fd, path). The name is skipped by _pages"""
+    return tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class PageStore:
+    """Directory of pages named by the SHA-256 of their content.
+
+    Storing a page that already exists only refreshes its age. Pages older than
+    ``max_age`` seconds are evicted, then the oldest pages until the directory
+    (compressed copies included) is under ``max_bytes``. Eviction runs at most
+    every ``evict_interval`` seconds as pages are added. A relative
+    ``directory`` is resolved against the working directory when the store is
+    created, so the paths it hands out stay valid wherever they are opened.
+    """
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, max_age=30 * 24 * 3600, evict_interval=60):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._last_evict = 0
+        self._counters = {'stored': 0, 'deduplicated': 0, 'evicted': 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, page_id, encoding='identity'):
+        """File holding a page in the given encoding, or None if it is not stored"""
+        if not PAGE_ID_RE.match(page_id or ''):
+            return None
+        path = os.path.join(self.directory, page_id + ENCODINGS[encoding])
+        return path if os.path.exists(path) else None
+
+    def encodings(self):
+        """Encodings written for every page"""
+        return ['br', 'gzip', 'identity'] if brotli is not None else ['gzip', 'identity']
+
+    def put(self, html):
+        """Store a page and return its id"""
+        return self.put_stream([html])
+
+    def put_stream(self, chunks):
+        """Store a page written from an iterable of text chunks and return its id"""
+        digest = hashlib.sha256()
+        fd, tmp_path = _temp_file(self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    data = chunk.encode('utf-8')
+                    digest.update(data)
+                    f.write(data)
+
+            page_id = digest.hexdigest()[:ID_LENGTH]
+            path = os.path.join(self.directory, page_id + ENCODINGS['identity'])
+            # Workers storing the same page at once each write their own temp files; whichever
+            # finds the page already there counts it as a duplicate, and a replace that loses
+            # the race only swaps in identical bytes
+            stored = not os.path.exists(path)
+            if stored:
+                self._write_compressed(tmp_path, page_id)
+                stored = not os.path.exists(path)
+            if stored:
+                os.replace(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+
+        if stored:
+            self._count('stored')
+        else:
+            self._touch(page_id)
+            self._count('deduplicated')
+
+        self._maybe_evict()
+        return page_id
+
+    def _write_compressed(self, source, page_id):
+        """Write the precompressed copies next to the page"""
+        with open(source, 'rb') as f:
+            data = f.read()
+        variants = {'gzip': gzip.compress(data, compresslevel=9)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        for encoding, payload in variants.items():
+            fd, tmp_path = _temp_file(self.directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, os.path.join(self.directory, page_id + ENCODINGS[encoding]))
+            except BaseException:
+                _remove_quietly(tmp_path)
+                raise
+
+    def touch(self, page_id):
+        """Reset a stored page's age so eviction keeps it; False if it is not stored"""
+        if self.path(page_id) is None:
+            return False
+        self._touch(page_id)
+        return True
+
+    def _touch(self, page_id):
+        for suffix in ENCODINGS.values():
+            try:
+                os.utime(os.path.join(self.directory, page_id + suffix))
+            except OSError:
+                pass
+
+    def _pages(self):
+        """(mtime, page_id, total bytes) for every stored page"""
+        pages = {}
+        for name in os.listdir(self.directory):
+            page_id = name.split('.', 1)[0]
+            if not PAGE_ID_RE.match(page_id):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            mtime, size = pages.get(page_id, (0, 0))
+            pages[page_id] = (max(mtime, stat.st_mtime), size + stat.st_size)
+        return sorted((mtime, page_id, size) for page_id, (mtime, size) in pages.items())
+
+    def _remove(self, page_id):
+        for suffix in ENCODINGS.values():
+            _remove_quietly(os.path.join(self.directory, page_id + suffix))
+        self._count('evicted')
+
+    def _maybe_evict(self):
+        with self._lock:
+            if time.time() - self._last_evict < self.evict_interval:
+                return
+            self._last_evict = time.time()
+        self.evict()
+
+    def evict(self):
+        """Drop pages past the age limit, then the oldest pages until under the size limit"""
+        pages = self._pages()
+        cutoff = time.time() - self.max_age
+        total = sum(size for _, _, size in pages)
+        for mtime, page_id, size in pages:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            self._remove(page_id)
+            total -= size
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self):
+        pages = self._pages()
+        with self._lock:
+            return {
+                'pages': len(pages),
+                'bytes': sum(size for _, _, size in pages),
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age,
+                'encodings': self.encodings(),
+                **self._counters
+            }
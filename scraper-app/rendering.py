@@ -0,0 +1,100 @@
+"""
+Sales page rendering
+The page template is compiled once, static fragments are rendered once, and
+finished pages are cached by a hash of their inputs
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+# Templates without any per-page data, rendered once and inserted as-is
+STATIC_FRAGMENTS = {
+    'styles': '_sales_page_styles.html'
+}
+
+# Product keys that change on every scrape and are not shown on the page
+VOLATILE_KEYS = frozenset({'scraped_at', 'source'})
+
+def render_key(product_data, sales_copy):
+    """Stable hash of the render inputs, leaving out VOLATILE_KEYS so a rescrape of an unchanged product hits"""
+    product = {key: value for key, value in product_data.items() if key not in VOLATILE_KEYS}
+    payload = json.dumps([product, sales_copy], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class SalesPageRenderer:
+    """Renders sales pages from a precompiled, autoescaping Jinja template.
+
+    ``render`` returns the whole page and keeps the last ``cache_size`` pages in
+    an LRU cache keyed by ``render_key``; ``stream`` yields the page in chunks
+    as the template produces them.
+    """
+    def __init__(self, template_dir, template_name='sales_page.html', cache_size=256):
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(['html']),
+            auto_reload=False
+        )
+        self.template = self.env.get_template(template_name)
+        self.fragments = {
+            name: Markup(self.env.get_template(path).render().strip())
+            for name, path in STATIC_FRAGMENTS.items()
+        }
+        # Changes with any template, so pages generated from older templates can be told apart
+        sources = ''.join(self.env.loader.get_source(self.env, name)[0] for name in sorted(self.env.list_templates()))
+        self.version = hashlib.sha256(sources.encode('utf-8')).hexdigest()[:12]
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def _context(self, product_data, sales_copy):
+        return {'product_data': product_data, 'sales_copy': sales_copy, 'fragments': self.fragments}
+
+    def render(self, product_data, sales_copy):
+        """The complete page, from the cache when these inputs were rendered before"""
+        key = render_key(product_data, sales_copy)
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                self._counters['hits'] += 1
+                return html
+            self._counters['misses'] += 1
+
+        html = self.template.render(self._context(product_data, sales_copy))
+        self._store(key, html)
+        return html
+
+    def stream(self, product_data, sales_copy):
+        """Yield the page in chunks as the template produces them; a cached page is yielded whole"""
+        key = render_key(product_data, sales_copy)
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+            self._counters['hits' if html is not None else 'misses'] += 1
+        if html is not None:
+            yield html
+            return
+
+        chunks = []
+        for chunk in self.template.generate(self._context(product_data, sales_copy)):
+            chunks.append(chunk)
+            yield chunk
+        self._store(key, ''.join(chunks))
+
+    def _store(self, key, html):
+        with self._lock:
+            self._cache[key] = html
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._cache), 'max_entries': self.cache_size, **self._counters}
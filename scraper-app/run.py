@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 """
 Simple script to run the Flask scraper app
+
+    python run.py                 # development server, installs requirements first
+    python run.py --skip-install  # development server, no install step
+    python run.py --production    # pre-forked gunicorn workers, no install step
 """
 
+import argparse
 import os
 import sys
 import subprocess
 
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
 def check_python_version():
     """Check if Python version is compatible"""
     if sys.version_info < (3, 7):
@@ -24,36 +31,124 @@ def install_requirements():
         print("❌ Failed to install requirements")
         sys.exit(1)
 
-def run_flask_app():
+def clear_metrics():
+    """Drop the metrics snapshots of an earlier run, so /metrics totals start from zero"""
+    from app import METRICS_DIR
+    from metrics import SharedMetrics
+    if METRICS_DIR:
+        SharedMetrics.clear(METRICS_DIR)
+
+def run_flask_app(host='0.0.0.0', port=5000):
     """Run the Flask application"""
     print("🚀 Starting Flask application...")
-    print("📍 The app will be available at: http://localhost:5000")
+    print(f"📍 The app will be available at: http://localhost:{port}")
     print("🛑 Press Ctrl+C to stop the server")
     print("-" * 50)
     
     try:
         # Import and run the app
         from app import app
-        app.run(debug=True, port=5000, host='0.0.0.0')
+        clear_metrics()
+        app.run(debug=True, port=port, host=host)
     except KeyboardInterrupt:
         print("\n👋 Flask app stopped")
     except Exception as e:
         print(f"❌ Error starting Flask app: {e}")
         sys.exit(1)
 
+def run_production(bind, workers, threads, timeout, graceful_timeout):
+    """Serve the app from pre-forked gunicorn workers.
+
+    The app is imported once in the master (``preload_app``) and forked into
+    each worker, so workers start in milliseconds and share the imported code.
+    On SIGTERM or SIGINT the workers stop accepting requests, finish what they
+    are serving and their running jobs (up to ``graceful_timeout`` seconds),
+    then exit.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("❌ gunicorn is not installed (it is not available on Windows); run: pip install -r requirements.txt")
+        sys.exit(1)
+
+    def on_starting(server):
+        clear_metrics()
+
+    def on_worker_exit(server, worker):
+        from app import shutdown
+        shutdown()
+
+    class ProductionServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    print("🚀 Starting production server...")
+    print(f"📍 Listening on {bind} with {workers} workers x {threads} threads")
+    print("🛑 Send SIGTERM or press Ctrl+C for a graceful shutdown")
+    print("-" * 50)
+
+    ProductionServer({
+        'bind': bind,
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        'preload_app': True,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+        'on_starting': on_starting,
+        'worker_exit': on_worker_exit
+    }).run()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the product scraper app')
+    parser.add_argument('--production', action='store_true',
+                        help='Serve with pre-forked gunicorn workers; never installs requirements')
+    parser.add_argument('--skip-install', action='store_true', help='Do not install requirements before starting')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)),
+                        help='Worker processes in production mode (default: WEB_CONCURRENCY or the CPU count)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 4)),
+                        help='Request threads per worker in production mode')
+    parser.add_argument('--timeout', type=int, default=30, help='Seconds before a silent worker is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds workers get to finish requests and jobs on shutdown')
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    
+    # The app resolves its templates, caches and pages relative to this directory
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+    
     print("🎯 Product Scraper & Sales Page Generator")
     print("=" * 50)
     
     check_python_version()
     
-    # Check if requirements.txt exists
-    if not os.path.exists("requirements.txt"):
-        print("❌ requirements.txt not found")
-        sys.exit(1)
+    if args.production:
+        run_production(f"{args.host}:{args.port}", args.workers, args.threads,
+                       args.timeout, args.graceful_timeout)
+        sys.exit(0)
+    
+    if not args.skip_install:
+        # Check if requirements.txt exists
+        if not os.path.exists("requirements.txt"):
+            print("❌ requirements.txt not found")
+            sys.exit(1)
     
-    # Install requirements
-    install_requirements()
+        # Install requirements
+        install_requirements()
     
     # Run the Flask app
-    run_flask_app()
+    run_flask_app(args.host, args.port)
@@ -1,25 +1,32 @@
+"""
+The sales page as the original f-string in app.py built it, before the Jinja
+template replaced it; the rendering tests check the template against it
+"""
 
+def create_sales_page_html(product_data, sales_copy):
+    """Generate complete HTML sales page"""
+    html_content = f"""
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>🚀 Aliexpress - Limited Time Offer!</title>
+    <title>{sales_copy['headline']}</title>
     <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
     <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
     <style>
-        .hero-section {
+        .hero-section {{
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 80px 0;
-        }
-        .product-image {
+        }}
+        .product-image {{
             max-width: 100%;
             height: auto;
             border-radius: 15px;
             box-shadow: 0 10px 30px rgba(0,0,0,0.3);
-        }
-        .price-tag {
+        }}
+        .price-tag {{
             background: #ff6b6b;
             color: white;
             padding: 15px 30px;
@@ -28,8 +35,8 @@
             font-weight: bold;
             display: inline-block;
             margin: 20px 0;
-        }
-        .cta-button {
+        }}
+        .cta-button {{
             background: linear-gradient(45deg, #ff6b6b, #ee5a24);
             border: none;
             padding: 20px 50px;
@@ -41,43 +48,43 @@
             display: inline-block;
             margin: 30px 0;
             transition: transform 0.3s ease;
-        }
-        .cta-button:hover {
+        }}
+        .cta-button:hover {{
             transform: scale(1.05);
             color: white;
-        }
-        .benefit-item {
+        }}
+        .benefit-item {{
             background: #f8f9fa;
             padding: 20px;
             margin: 10px 0;
             border-radius: 10px;
             border-left: 5px solid #28a745;
-        }
-        .urgency-banner {
+        }}
+        .urgency-banner {{
             background: #ff4757;
             color: white;
             padding: 15px;
             text-align: center;
             font-weight: bold;
             animation: pulse 2s infinite;
-        }
-        @keyframes pulse {
-            0% { opacity: 1; }
-            50% { opacity: 0.7; }
-            100% { opacity: 1; }
-        }
-        .guarantee-section {
+        }}
+        @keyframes pulse {{
+            0% {{ opacity: 1; }}
+            50% {{ opacity: 0.7; }}
+            100% {{ opacity: 1; }}
+        }}
+        .guarantee-section {{
             background: #e8f5e8;
             padding: 30px;
             border-radius: 15px;
             margin: 30px 0;
-        }
+        }}
     </style>
 </head>
 <body>
     <!-- Urgency Banner -->
     <div class="urgency-banner">
-        <i class="fas fa-clock"></i> ⏰ Only 3 left in stock!
+        <i class="fas fa-clock"></i> {sales_copy['urgency_text']}
     </div>
 
     <!-- Hero Section -->
@@ -85,16 +92,16 @@
         <div class="container">
             <div class="row align-items-center">
                 <div class="col-lg-6">
-                    <h1 class="display-4 fw-bold mb-4">🚀 Aliexpress - Limited Time Offer!</h1>
-                    <p class="lead mb-4">Discover this incredible product that will transform your experience. High-quality materials, innovative design, and exceptional value make this a must-have item.</p>
-                    <div class="price-tag">Contact us for pricing</div>
+                    <h1 class="display-4 fw-bold mb-4">{sales_copy['headline']}</h1>
+                    <p class="lead mb-4">{sales_copy['description']}</p>
+                    <div class="price-tag">{product_data['price']}</div>
                     <br>
                     <a href="#order" class="cta-button">
-                        <i class="fas fa-shopping-cart"></i> 👉 Order Now - Limited Stock!
+                        <i class="fas fa-shopping-cart"></i> {sales_copy['call_to_action']}
                     </a>
                 </div>
                 <div class="col-lg-6 text-center">
-                    <img src="https://via.placeholder.com/400x300?text=Product+Image" alt="Aliexpress" class="product-image">
+                    <img src="{product_data['image']}" alt="{product_data['title']}" class="product-image">
                 </div>
             </div>
         </div>
@@ -106,7 +113,7 @@
             <div class="row">
                 <div class="col-lg-8 mx-auto">
                     <h2 class="text-center mb-5">Why Choose This Product?</h2>
-                    <div class="benefit-item"><i class="fas fa-check-circle text-success me-2"></i>✅ Premium Quality Materials</div><div class="benefit-item"><i class="fas fa-check-circle text-success me-2"></i>✅ Fast & Secure Shipping</div><div class="benefit-item"><i class="fas fa-check-circle text-success me-2"></i>✅ 30-Day Money-Back Guarantee</div><div class="benefit-item"><i class="fas fa-check-circle text-success me-2"></i>✅ 24/7 Customer Support</div><div class="benefit-item"><i class="fas fa-check-circle text-success me-2"></i>✅ Limited Stock Available</div>
+                    {''.join([f'<div class="benefit-item"><i class="fas fa-check-circle text-success me-2"></i>{benefit}</div>' for benefit in sales_copy['benefits']])}
                 </div>
             </div>
         </div>
@@ -116,7 +123,7 @@
     <section class="py-5">
         <div class="container">
             <div class="guarantee-section text-center">
-                <h3><i class="fas fa-shield-alt text-success"></i> 🛡️ 30-Day Money-Back Guarantee</h3>
+                <h3><i class="fas fa-shield-alt text-success"></i> {sales_copy['guarantee_text']}</h3>
                 <p class="lead">We're so confident you'll love this product that we offer a full 30-day money-back guarantee. No questions asked!</p>
             </div>
         </div>
@@ -128,7 +135,7 @@
             <h2 class="mb-4">Ready to Transform Your Life?</h2>
             <p class="lead mb-4">Don't miss out on this incredible opportunity!</p>
             <a href="#order" class="cta-button">
-                <i class="fas fa-rocket"></i> 👉 Order Now - Limited Stock!
+                <i class="fas fa-rocket"></i> {sales_copy['call_to_action']}
             </a>
             <p class="mt-3 text-muted">Secure checkout • Fast delivery • 30-day guarantee</p>
         </div>
@@ -137,4 +144,5 @@
     <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
 </body>
 </html>
-        
\ No newline at end of file
+        """
+    return html_content
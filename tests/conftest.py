@@ -0,0 +1,103 @@
+"""
+Shared fixtures for the scraper tests
+The scraper modules live in backend/scrapers and scraper-app rather than in an
+installed package, so both directories go on sys.path. ``site`` serves canned
+responses from a local HTTP server and records every request it gets.
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'scrapers'))
+sys.path.insert(0, os.path.join(ROOT, 'scraper-app'))
+
+class Site:
+    """Routes of a local test server and a log of the requests it served.
+
+    A route maps a path (query string included, or without it as a fallback)
+    to a response tuple ``(status, headers, body)`` or to a function of the
+    request handler returning one. ``in_flight`` and ``peak`` track how many
+    requests were being answered at once.
+    """
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    @property
+    def base(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def url(self, path):
+        return self.base + path
+
+    def route(self, path, response=None, status=200, headers=None, body=b''):
+        self.routes[path] = response if response is not None else (status, headers or {}, body)
+
+    def paths(self):
+        with self._lock:
+            return [path for path, _ in self.requests]
+
+    def _respond(self, handler):
+        with self._lock:
+            self.requests.append((handler.path, dict(handler.headers)))
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            response = self.routes.get(handler.path) or self.routes.get(handler.path.split('?')[0])
+            if response is None:
+                response = (404, {}, b'not found')
+            elif callable(response):
+                response = response(handler)
+            status, headers, body = response
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            handler.send_response(status)
+            for name, value in headers.items():
+                handler.send_header(name, value)
+            handler.send_header('Content-Length', str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.site._respond(self)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def site():
+    site = Site()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.site = site
+    site.server = server
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield site
+    server.shutdown()
+    server.server_close()
+
+def wait_until(condition, timeout=5.0, interval=0.01):
+    """Poll ``condition`` until it is true or ``timeout`` seconds pass; returns its last value"""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = condition()
+        if value or time.monotonic() >= deadline:
+            return value
+        time.sleep(interval)
@@ -0,0 +1,68 @@
+import re
+
+from python_scraper import ALIEXPRESS_EXTRACT_SCRIPT, ALIEXPRESS_SELECTORS, ProductScraper
+
+def _payload(**fields):
+    """An ALIEXPRESS_EXTRACT_SCRIPT result: one entry per selector, None where nothing matched"""
+    payload = {field: [None] * len(ALIEXPRESS_SELECTORS[field]) for field in ('title', 'price', 'description')}
+    payload['images'] = [[] for _ in ALIEXPRESS_SELECTORS['images']]
+    payload['reviews'] = []
+    for field, values in fields.items():
+        if field == 'reviews':
+            payload['reviews'] = values
+        else:
+            for index, value in values.items():
+                payload[field][index] = value
+    return payload
+
+def test_script_returns_every_field_the_parser_reads():
+    returned = set(re.findall(r'^    (\w+):', ALIEXPRESS_EXTRACT_SCRIPT, re.MULTILINE))
+
+    assert returned == {'title', 'price', 'description', 'images', 'reviews'}
+
+def test_fields_follow_the_selector_order():
+    scraper = ProductScraper()
+    hits = {}
+    payload = _payload(
+        title={0: '  ', 2: ' Desk Lamp \n', 3: 'Other heading'},
+        price={0: 'Free shipping', 1: 'US $1,234.50', 3: '$2.00'},
+        description={3: 'A bright lamp. ' * 50},
+        images={1: [{'src': 'https://ae01.alicdn.com/1.jpg', 'data_src': None, 'alt': 'Front'},
+                    {'src': '', 'data_src': 'https://ae01.alicdn.com/2.jpg', 'alt': None},
+                    {'src': 'data:image/gif;base64,xx', 'data_src': None, 'alt': None}]},
+        reviews=[{'rating': ' 5 ', 'comment': ' Great ', 'author': ' Ann '},
+                 {'rating': None, 'comment': 'No stars', 'author': 'Bob'}]
+    )
+
+    fields = scraper._parse_extraction_payload(payload, hits=hits)
+
+    assert fields['title'] == 'Desk Lamp'
+    assert fields['price']['current'] == 1234.5
+    assert len(fields['description']) == 500
+    assert [image['url'] for image in fields['images']] == ['https://ae01.alicdn.com/1.jpg', 'https://ae01.alicdn.com/2.jpg']
+    assert [image['is_primary'] for image in fields['images']] == [True, False]
+    assert fields['reviews']['recent_reviews'] == [{'rating': '5', 'comment': 'Great', 'author': 'Ann'}]
+    assert hits == {'title': 'h1.product-title', 'price': '[data-pl="product-price"]',
+                    'description': '.description', 'images': '.product-image img'}
+    scraper.close()
+
+def test_empty_payload_gives_the_defaults():
+    scraper = ProductScraper()
+
+    fields = scraper._parse_extraction_payload(_payload())
+
+    assert fields['title'] == 'AliExpress Product'
+    assert fields['price']['current'] == 0
+    assert fields['description'] == 'Product description not available'
+    assert fields['images'][0]['url'].startswith('https://via.placeholder.com/')
+    scraper.close()
+
+def test_reordered_selectors_stay_aligned_with_the_payload():
+    scraper = ProductScraper()
+    selectors = dict(ALIEXPRESS_SELECTORS, title=list(reversed(ALIEXPRESS_SELECTORS['title'])))
+    payload = _payload(title={0: 'From .title-text', 4: 'From h1[data-pl]'})
+    hits = {}
+
+    assert scraper._parse_extraction_payload(payload, selectors, hits)['title'] == 'From .title-text'
+    assert hits['title'] == '.title-text'
+    scraper.close()
@@ -0,0 +1,80 @@
+import json
+
+from aliexpress_static import extract_fields, find_embedded_state, has_required_fields
+from python_scraper import ProductScraper
+
+RUN_PARAMS = {
+    'data': {
+        'titleModule': {'subject': ' Desk Lamp ', 'feedbackRating': {'averageStar': '4.8', 'totalValidNum': 120}},
+        'priceModule': {'minActivityAmount': {'value': 12.5, 'currency': 'EUR'},
+                        'minAmount': {'value': 20.0, 'currency': 'EUR'}},
+        'imageModule': {'imagePathList': ['//ae01.alicdn.com/1.jpg', 'https://ae01.alicdn.com/2.jpg']},
+        'quantityModule': {'totalAvailQuantity': 7},
+        'descriptionModule': {'description': 'https://desc.example.com/1'},
+        'pageModule': {'description': 'A bright {desk} lamp'}
+    }
+}
+
+def _page(script):
+    return f'<html><head><script>{script}</script></head><body></body></html>'
+
+def test_run_params_json():
+    fields = extract_fields(_page(f'window.runParams = {json.dumps(RUN_PARAMS)};'))
+
+    assert fields == {
+        'title': 'Desk Lamp', 'price': 12.5, 'currency': 'EUR', 'original_price': 20.0,
+        'images': ['https://ae01.alicdn.com/1.jpg', 'https://ae01.alicdn.com/2.jpg'],
+        'description': 'A bright {desk} lamp', 'rating': 4.8, 'review_count': 120, 'stock': 7
+    }
+    assert has_required_fields(fields)
+
+def test_data_member_of_a_js_object_literal():
+    data = json.dumps(RUN_PARAMS['data'])
+    script = f"window.runParams = {{ csrfToken: 'x{{', data: {data}, abTest: function () {{ return \"}}\"; }} }};"
+
+    states = find_embedded_state(_page(script))
+
+    assert states == [RUN_PARAMS['data']]
+    assert extract_fields(_page(script))['title'] == 'Desk Lamp'
+
+def test_price_range_text_when_there_are_no_amounts():
+    state = {'data': {'subject': 'Lamp', 'formatedActivityPrice': 'US $1,012.34 - 1,500.00',
+                      'formatedPrice': 'US $1,800.00 - 2,000.00', 'imagePathList': ['//ae01.alicdn.com/1.jpg']}}
+
+    fields = extract_fields(_page(f'window._dida_config_._init_data_ = {json.dumps(state)}'))
+
+    assert (fields['price'], fields['original_price'], fields['currency']) == (1012.34, 1800.0, 'USD')
+
+def test_pages_without_state():
+    assert extract_fields(_page('var x = 1;')) is None
+    assert extract_fields(_page('window.runParams = {broken')) is None
+    assert not has_required_fields(extract_fields(_page('window.runParams = {"data": {"subject": "Lamp"}}')))
+
+def test_static_state_skips_the_browser(site, monkeypatch):
+    site.route('/item/1.html', body=_page(f'window.runParams = {json.dumps(RUN_PARAMS)};'))
+    scraper = ProductScraper()
+    monkeypatch.setattr(scraper, '_scrape_aliexpress_browser', lambda url: 'browser')
+
+    result = scraper.scrape_aliexpress(site.url('/item/1.html'))
+
+    assert result['title'] == 'Desk Lamp'
+    assert result['price'] == {'current': 12.5, 'original': 20.0, 'currency': 'EUR', 'discount_percentage': 38}
+    assert result['availability']['stock_quantity'] == 7
+    scraper.close()
+
+def test_incomplete_or_missing_state_falls_back_to_the_browser(site, monkeypatch):
+    site.route('/item/partial.html', body=_page('window.runParams = {"data": {"subject": "Lamp"}}'))
+    site.route('/item/blocked.html', status=403, body='captcha')
+    scraper = ProductScraper()
+    browser = []
+    monkeypatch.setattr(scraper, '_scrape_aliexpress_browser', lambda url: browser.append(url) or 'browser')
+
+    assert scraper.scrape_aliexpress(site.url('/item/partial.html')) == 'browser'
+    assert scraper.scrape_aliexpress(site.url('/item/blocked.html')) == 'browser'
+    assert browser == [site.url('/item/partial.html'), site.url('/item/blocked.html')]
+
+    scraper.aliexpress_mode = 'static'
+    result = scraper.scrape_aliexpress(site.url('/item/partial.html'))
+    assert result['source']['error'] == 'Product state not found in page'
+    assert len(browser) == 2
+    scraper.close()
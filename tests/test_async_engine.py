@@ -0,0 +1,121 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from async_engine import AsyncFetcher, scrape_many_async
+from python_scraper import ProductScraper
+from rate_limit import RetryPolicy
+
+def _product_page(name, price):
+    data = {'@context': 'https://schema.org', '@type': 'Product', 'name': name, 'description': f'{name} for sale',
+            'image': f'https://img.example.com/{name}.jpg',
+            'offers': {'@type': 'Offer', 'price': str(price), 'priceCurrency': 'USD'}}
+    return f'<html><head><script type="application/ld+json">{json.dumps(data)}</script></head><body></body></html>'
+
+def _slow(body, seconds=0.1):
+    def respond(handler):
+        time.sleep(seconds)
+        return 200, {}, body
+    return respond
+
+def _scraper(**kwargs):
+    return ProductScraper(retry_policy=RetryPolicy(retries=1, backoff=0.01), **kwargs)
+
+async def _collect(items):
+    return [item async for item in items]
+
+def test_fetch_keeps_to_the_per_host_limit(site):
+    for i in range(8):
+        site.route(f'/page/{i}', _slow(f'page {i}'))
+
+    async def fetch_all():
+        async with AsyncFetcher(limit_per_host=3) as fetcher:
+            return await asyncio.gather(*(fetcher.fetch(site.url(f'/page/{i}')) for i in range(8)))
+
+    bodies = asyncio.run(fetch_all())
+
+    assert bodies == [f'page {i}'.encode() for i in range(8)]
+    assert site.peak == 3
+
+def test_scrape_many_keeps_to_max_concurrency(site):
+    for i in range(6):
+        site.route(f'/products/{i}', _slow(_product_page(f'item{i}', 10 + i)))
+    scraper = _scraper()
+
+    results = asyncio.run(_collect(scraper.scrape_many_async([site.url(f'/products/{i}') for i in range(6)],
+                                                             max_concurrency=2, limit_per_host=8)))
+
+    assert len(results) == 6
+    assert all(error is None for _, _, error in results)
+    assert site.peak == 2
+    scraper.close()
+
+def test_every_input_url_gets_its_own_result(site):
+    # Results arrive in completion order; each carries its URL, so callers can put them back in input order
+    site.route('/products/slow', _slow(_product_page('slow', 1), seconds=0.3))
+    for name in ('a', 'b', 'c'):
+        site.route(f'/products/{name}', body=_product_page(name, 2))
+    urls = [site.url(f'/products/{name}') for name in ('slow', 'a', 'b', 'c')]
+    scraper = _scraper()
+
+    results = asyncio.run(_collect(scraper.scrape_many_async(urls)))
+
+    assert [url for url, _, _ in results][-1] == urls[0]
+    by_url = {url: result for url, result, _ in results}
+    assert [by_url[url]['title'] for url in urls] == ['slow', 'a', 'b', 'c']
+    scraper.close()
+
+def test_throttled_page_is_retried_then_becomes_fallback_data(site):
+    site.route('/products/busy', status=429, body=b'slow down')
+    scraper = _scraper()
+
+    result = asyncio.run(scraper.scrape_product_async(site.url('/products/busy')))
+
+    assert '429' in result['source']['error']
+    assert site.paths() == ['/products/busy', '/products/busy']
+    assert scraper.rate_limiter.stats()['127.0.0.1']['throttled'] == 2
+    scraper.close()
+
+def test_throttled_page_succeeds_on_retry(site):
+    statuses = [429]
+    site.route('/products/lamp', lambda handler: (statuses.pop(), {}, b'busy') if statuses
+               else (200, {}, _product_page('lamp', 5)))
+    scraper = _scraper()
+
+    result = asyncio.run(scraper.scrape_product_async(site.url('/products/lamp')))
+
+    assert result['title'] == 'lamp'
+    assert result['price']['current'] == 5.0
+    assert len(site.requests) == 2
+    scraper.close()
+
+def test_parsing_runs_off_the_event_loop():
+    async def parse_thread():
+        async with AsyncFetcher() as fetcher:
+            return await fetcher.run_parse(threading.get_ident)
+
+    assert asyncio.run(parse_thread()) != threading.get_ident()
+
+def test_failed_scrapes_are_yielded_with_their_error():
+    async def scrape(url):
+        if url == 'bad':
+            raise ValueError('no good')
+        await asyncio.sleep(0)
+        return url.upper()
+
+    results = asyncio.run(_collect(scrape_many_async(scrape, ['ok', 'bad'], max_concurrency=1)))
+
+    assert results == [('ok', 'OK', None), ('bad', None, 'no good')]
+
+@pytest.mark.parametrize('status', [404, 500])
+def test_http_errors_become_fallback_data(site, status):
+    site.route('/products/gone', status=status, body=b'error')
+    scraper = _scraper()
+
+    result = asyncio.run(scraper.scrape_product_async(site.url('/products/gone')))
+
+    assert str(status) in result['source']['error']
+    scraper.close()
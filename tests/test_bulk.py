@@ -0,0 +1,141 @@
+import io
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from bulk import BulkRun, read_rows
+
+class _Generator:
+    """Stands in for app.generate_page, failing for URLs containing 'fail'"""
+    def __init__(self, fallback=()):
+        self.calls = []
+        self.fallback = set(fallback)
+
+    def __call__(self, url, store):
+        self.calls.append(url)
+        if 'fail' in url:
+            raise Exception(f'Failed to scrape URL: {url}')
+        product = {'title': url.rsplit('/', 1)[-1], 'source': {}}
+        if url in self.fallback:
+            product['source']['error'] = 'timeout'
+        return {'product_data': product, 'sales_copy': {}, 'page_id': store.put(url),
+                'timings_ms': {'total': 5}}
+
+class _Store:
+    def put(self, html):
+        return str(abs(hash(html)))
+
+def _run(tmp_path, urls, generate=None, **kwargs):
+    run = BulkRun(str(tmp_path), generate or _Generator(), _Store(), max_workers=2, progress_interval=0,
+                  log=io.StringIO(), **kwargs)
+    rows = [(number, url, {}) for number, url in enumerate(urls, 1)]
+    return run, run.run(rows)
+
+def _results(tmp_path):
+    with open(tmp_path / 'results.jsonl', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_read_rows_from_csv_with_a_url_column():
+    stream = io.StringIO('name,Product URL\nLamp,https://shop.example.com/lamp\n,\nChair,\n')
+
+    rows = list(read_rows(stream, 'csv'))
+
+    assert rows == [(1, 'https://shop.example.com/lamp', {'name': 'Lamp', 'Product URL': 'https://shop.example.com/lamp'}),
+                    (3, None, {'name': 'Chair', 'Product URL': ''})]
+
+def test_read_rows_from_csv_without_a_header():
+    stream = io.StringIO('https://shop.example.com/a,1\nhttps://shop.example.com/b,2\n')
+
+    assert [url for _, url, _ in read_rows(stream, 'csv')] == ['https://shop.example.com/a', 'https://shop.example.com/b']
+
+def test_read_rows_rejects_a_missing_column():
+    with pytest.raises(ValueError):
+        list(read_rows(io.StringIO('link\nhttps://shop.example.com/a\n'), 'csv', url_column='url'))
+
+def test_read_rows_from_jsonl():
+    stream = io.StringIO('{"url": "https://shop.example.com/a", "sku": 1}\n"https://shop.example.com/b"\n\nnot json\n[1]\n')
+
+    rows = list(read_rows(stream, 'jsonl'))
+
+    assert [(number, url) for number, url, _ in rows] == [
+        (1, 'https://shop.example.com/a'), (2, 'https://shop.example.com/b'), (4, None), (5, None)]
+    assert rows[0][2]['sku'] == 1
+
+def test_run_records_every_url_once(tmp_path):
+    urls = ['https://a.example.com/lamp', 'https://a.example.com/lamp?utm_source=x', 'ftp://nope',
+            'https://b.example.com/fail']
+
+    _, counters = _run(tmp_path, urls)
+
+    assert (counters['ok'], counters['failed'], counters['duplicates'], counters['invalid']) == (1, 1, 1, 1)
+    results = {record['url']: record for record in _results(tmp_path)}
+    assert results['https://a.example.com/lamp']['status'] == 'ok'
+    assert results['https://b.example.com/fail']['error'] == 'Failed to scrape URL: https://b.example.com/fail'
+    with open(tmp_path / 'checkpoint.json', encoding='utf-8') as f:
+        assert json.load(f)['complete'] is True
+    assert sorted(os.listdir(tmp_path)) == ['checkpoint.json', 'results.jsonl']
+
+def test_fallback_data_is_recorded_as_failed(tmp_path):
+    url = 'https://a.example.com/lamp'
+
+    _, counters = _run(tmp_path, [url], _Generator(fallback=[url]))
+
+    assert counters['failed'] == 1
+    assert _results(tmp_path)[0]['error'] == 'timeout'
+
+def test_rerun_skips_finished_urls(tmp_path):
+    urls = ['https://a.example.com/1', 'https://a.example.com/fail']
+    _run(tmp_path, urls)
+
+    generate = _Generator()
+    _, counters = _run(tmp_path, urls + ['https://a.example.com/2'], generate)
+
+    assert generate.calls == ['https://a.example.com/2']
+    assert counters['already_done'] == 2
+
+def test_retry_failed_runs_failed_urls_again(tmp_path):
+    urls = ['https://a.example.com/1', 'https://a.example.com/fail']
+    _run(tmp_path, urls)
+
+    generate = _Generator()
+    _run(tmp_path, urls, generate, retry_failed=True)
+
+    assert generate.calls == ['https://a.example.com/fail']
+
+def test_half_written_last_line_is_dropped(tmp_path):
+    _run(tmp_path, ['https://a.example.com/1', 'https://a.example.com/2'])
+    with open(tmp_path / 'results.jsonl', 'ab') as f:
+        f.write(b'{"row": 3, "url": "https://a.example.com/3", "key"')
+
+    generate = _Generator()
+    _run(tmp_path, ['https://a.example.com/1', 'https://a.example.com/3'], generate)
+
+    assert generate.calls == ['https://a.example.com/3']
+    assert len(_results(tmp_path)) == 3
+
+def test_concurrent_checkpoints(tmp_path):
+    run = BulkRun(str(tmp_path), _Generator(), _Store(), log=io.StringIO())
+    run.started = time.monotonic()
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def checkpoint(results):
+        barrier.wait()
+        try:
+            for _ in range(20):
+                run._checkpoint(results)
+        except Exception as e:
+            errors.append(e)
+
+    with open(run.results_path, 'a', encoding='utf-8') as results:
+        threads = [threading.Thread(target=checkpoint, args=(results,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert sorted(os.listdir(tmp_path)) == ['checkpoint.json', 'results.jsonl']
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from concurrency import scrape_many
+
+class _Tracker:
+    """Counts scrapes running at once, overall and per domain"""
+    def __init__(self, duration=0.05):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.running = {}
+        self.peak = {}
+        self.total = 0
+        self.peak_total = 0
+
+    def scrape(self, url):
+        domain = url.split('/')[2]
+        with self.lock:
+            self.running[domain] = self.running.get(domain, 0) + 1
+            self.peak[domain] = max(self.peak.get(domain, 0), self.running[domain])
+            self.total += 1
+            self.peak_total = max(self.peak_total, self.total)
+        time.sleep(self.duration)
+        with self.lock:
+            self.running[domain] -= 1
+            self.total -= 1
+        if url.endswith('/fail'):
+            raise RuntimeError('scrape failed')
+        return {'url': url}
+
+def test_caps_total_and_per_domain_concurrency():
+    tracker = _Tracker()
+    urls = [f'https://{host}.example.com/{i}' for i in range(6) for host in ('a', 'b', 'c', 'd')]
+
+    results = list(scrape_many(tracker.scrape, urls, max_workers=6, max_per_domain=2))
+
+    assert sorted(url for url, _, _ in results) == sorted(urls)
+    assert tracker.peak_total == 6
+    assert max(tracker.peak.values()) == 2
+
+def test_one_busy_domain_does_not_block_the_others():
+    tracker = _Tracker(duration=0.1)
+    urls = [f'https://slow.example.com/{i}' for i in range(6)] + ['https://fast.example.com/1']
+
+    order = [url for url, _, _ in scrape_many(tracker.scrape, urls, max_workers=4, max_per_domain=1)]
+
+    assert order.index('https://fast.example.com/1') <= 1
+
+def test_errors_are_yielded_with_their_url():
+    tracker = _Tracker(duration=0)
+
+    results = {url: (result, error) for url, result, error in
+               scrape_many(tracker.scrape, ['https://a.example.com/ok', 'https://a.example.com/fail'])}
+
+    assert results['https://a.example.com/ok'] == ({'url': 'https://a.example.com/ok'}, None)
+    assert results['https://a.example.com/fail'] == (None, 'scrape failed')
+
+def test_lazy_input_is_read_only_as_far_as_needed():
+    tracker = _Tracker(duration=0.02)
+    consumed = []
+
+    def urls():
+        for i in range(1000):
+            consumed.append(i)
+            yield f'https://same.example.com/{i}'
+
+    results = scrape_many(tracker.scrape, urls(), max_workers=2, max_per_domain=1, read_ahead=5)
+    next(results)
+    assert len(consumed) <= 8
+    results.close()
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+from bs4 import BeautifulSoup
+
+from crawler import BloomFilter, Crawler, classify_link, extract_links
+from python_scraper import ProductScraper
+from result_cache import ResultCache
+
+def _listing(products, next_page=None, categories=()):
+    links = ''.join(f'<a href="{href}">{href}</a>' for href in products)
+    links += ''.join(f'<a href="{href}">category</a>' for href in categories)
+    if next_page:
+        links += f'<a rel="next" href="{next_page}">Next</a>'
+    return f'<html><body>{links}</body></html>'
+
+def _product_page(name, price):
+    data = {'@context': 'https://schema.org', '@type': 'Product', 'name': name, 'description': f'{name} for sale',
+            'image': f'https://img.example.com/{name}.jpg',
+            'offers': {'@type': 'Offer', 'price': str(price), 'priceCurrency': 'USD'}}
+    return f'<html><head><script type="application/ld+json">{json.dumps(data)}</script></head><body></body></html>'
+
+@pytest.fixture
+def shop(site):
+    """A store with a paginated category, a subcategory and a product robots.txt keeps out"""
+    site.route('/robots.txt', body='User-agent: *\nDisallow: /products/secret\n')
+    site.route('/collections/all', body=_listing(['/products/a', '/products/b'], '/collections/all?page=2',
+                                                 ['/collections/lamps']))
+    site.route('/collections/all?page=2', body=_listing(['/products/b', '/products/c', '/products/secret']))
+    site.route('/collections/lamps', body=_listing(['/products/d', 'https://elsewhere.example.com/products/x']))
+    for i, name in enumerate('abcd'):
+        site.route(f'/products/{name}', body=_product_page(name, 10 + i))
+    site.route('/products/secret', body=_product_page('secret', 1))
+    return site
+
+def _crawl(scraper, url, **options):
+    crawler = Crawler(scraper, delay=0, **options)
+    results = {result_url.rsplit('/', 1)[-1]: (result, error) for result_url, result, error in crawler.crawl(url)}
+    return crawler, results
+
+def test_crawl_follows_pages_and_categories(shop):
+    scraper = ProductScraper()
+
+    crawler, results = _crawl(scraper, shop.url('/collections/all'))
+
+    assert sorted(results) == ['a', 'b', 'c', 'd']
+    assert results['c'][0]['price']['current'] == 12.0
+    assert all(error is None for _, error in results.values())
+    stats = crawler.stats()
+    assert (stats['pages'], stats['products'], stats['duplicates'], stats['blocked']) == (3, 4, 1, 1)
+    assert '/products/secret' not in shop.paths()
+    scraper.close()
+
+def test_crawl_limits(shop):
+    scraper = ProductScraper()
+
+    crawler, _ = _crawl(scraper, shop.url('/collections/all'), max_depth=0)
+    assert crawler.stats()['pages'] == 2
+
+    crawler, results = _crawl(scraper, shop.url('/collections/all'), max_pages=1)
+    assert crawler.stats()['pages'] == 1
+    assert sorted(results) == ['a', 'b']
+
+    _, results = _crawl(scraper, shop.url('/collections/all'), max_products=1)
+    assert sorted(results) == ['a']
+    scraper.close()
+
+def test_fresh_cached_products_are_not_fetched_again(shop, tmp_path):
+    scraper = ProductScraper(result_cache=ResultCache(str(tmp_path)))
+    _crawl(scraper, shop.url('/collections/all'))
+    fetched = len([path for path in shop.paths() if path.startswith('/products/')])
+
+    _, results = _crawl(scraper, shop.url('/collections/all'))
+
+    assert sorted(results) == ['a', 'b', 'c', 'd']
+    assert len([path for path in shop.paths() if path.startswith('/products/')]) == fetched
+    scraper.close()
+
+def test_extract_links_sorts_products_pages_and_categories():
+    html = '''<base href="https://shop.example.com/">
+        <script type="application/ld+json">{"@type": "ItemList", "itemListElement": [
+            {"@type": "ListItem", "url": "/products/listed"}]}</script>
+        <a href="/products/lamp#reviews">Lamp</a><a href="/products/lamp">Lamp again</a>
+        <a href="/collections/lamps?page=2">2</a><a class="pagination-next" href="/collections/lamps/p3">Next</a>
+        <a href="/collections/chairs">Chairs</a><a href="/about">About</a>
+        <a href="https://other.example.com/products/x">Elsewhere</a>'''
+
+    products, next_pages, categories = extract_links(BeautifulSoup(html, 'html.parser'),
+                                                     'https://shop.example.com/collections/lamps')
+
+    assert products == ['https://shop.example.com/products/listed', 'https://shop.example.com/products/lamp']
+    assert next_pages == ['https://shop.example.com/collections/lamps?page=2',
+                          'https://shop.example.com/collections/lamps/p3']
+    assert categories == ['https://shop.example.com/collections/chairs']
+
+def test_classify_link():
+    assert classify_link('https://www.amazon.com/dp/B000123') == 'product'
+    assert classify_link('https://shop.example.com/item-123456.html') == 'product'
+    assert classify_link('https://shop.example.com/category/lamps') == 'listing'
+    assert classify_link('https://shop.example.com/lamps?page=3') == 'listing'
+    assert classify_link('https://shop.example.com/about') is None
+
+def test_bloom_filter_remembers_what_it_saw():
+    seen = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = [f'https://shop.example.com/products/{i}' for i in range(1000)]
+
+    assert all(seen.add(url) for url in urls[:500])
+    assert not seen.add(urls[0])
+    assert all(url in seen for url in urls[:500])
+    assert sum(url in seen for url in urls[500:]) < 25
+    assert len(seen) == 500
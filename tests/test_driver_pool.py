@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from python_scraper import WebDriverPool, _PooledDriver
+
+class _FakeDriver:
+    """Records what the pool asks of a browser"""
+    def __init__(self):
+        self.healthy = True
+        self.quit_called = False
+        self.pages = []
+
+    def execute_script(self, script, *args):
+        if not self.healthy:
+            raise RuntimeError('browser crashed')
+        return 1 if script == 'return 1' else 0
+
+    def delete_all_cookies(self):
+        pass
+
+    def get(self, url):
+        self.pages.append(url)
+
+    def quit(self):
+        self.quit_called = True
+
+class _Pool(WebDriverPool):
+    """WebDriverPool that launches fake drivers instead of Chrome"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.launched = []
+
+    def _launch(self):
+        driver = _FakeDriver()
+        self.launched.append(driver)
+        return _PooledDriver(driver)
+
+def test_drivers_are_reused_and_reset():
+    pool = _Pool(max_size=2)
+
+    with pool.lease() as first:
+        pass
+    with pool.lease() as second:
+        pass
+
+    assert first is second
+    assert first.pages == ['about:blank', 'about:blank']
+    stats = pool.stats()
+    assert (stats['live'], stats['idle'], stats['hits'], stats['misses']) == (1, 1, 1, 1)
+
+def test_driver_is_recycled_after_max_pages():
+    pool = _Pool(max_pages=2)
+
+    for _ in range(3):
+        with pool.lease():
+            pass
+
+    assert len(pool.launched) == 2
+    assert pool.launched[0].quit_called
+    assert pool.stats()['recycled'] == 1
+
+def test_unhealthy_idle_driver_is_replaced():
+    pool = _Pool()
+    with pool.lease() as driver:
+        pass
+    driver.healthy = False
+
+    with pool.lease() as replacement:
+        assert replacement is not driver
+
+    assert driver.quit_called
+    assert pool.stats()['discarded'] == 1
+
+def test_acquire_times_out_when_every_driver_is_leased():
+    pool = _Pool(max_size=1, acquire_timeout=0.2)
+    entry = pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+
+    # A released driver goes to a waiting caller
+    threading.Timer(0.05, pool.release, (entry,)).start()
+    pool.acquire_timeout = 5
+    assert pool.acquire() is entry
+
+def test_close_quits_idle_drivers_and_refuses_leases():
+    pool = _Pool()
+    with pool.lease() as driver:
+        pass
+
+    pool.close()
+
+    assert driver.quit_called
+    assert pool.stats()['live'] == 0
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,55 @@
+import pytest
+
+from html_parsing import PageParser
+from python_scraper import GENERIC_SELECTOR_ENGINE, _generic_parse_complete
+
+FIELDS = ('<title>Desk Lamp</title><meta name="description" content="A bright lamp">'
+          '<span itemprop="price">$19.99</span>'
+          + ''.join(f'<img src="https://img.example.com/{i}.jpg">' for i in range(5)))
+FILLER = ''.join(f'<div class="card"><span class="card-title">Related {i}</span></div>' for i in range(20000))
+
+def _page(fields_at_end=False):
+    body = FILLER + FIELDS if fields_at_end else FIELDS + FILLER
+    return f'<html><head></head><body>{body}</body></html>'.encode('utf-8')
+
+def _chunks(content, read, size=16 * 1024):
+    for start in range(0, len(content), size):
+        read.append(size)
+        yield content[start:start + size]
+
+def _parser(mode):
+    return PageParser('html.parser', mode, GENERIC_SELECTOR_ENGINE, _generic_parse_complete)
+
+def _fields(soup):
+    return (soup.select_one('title').text, soup.select_one('meta[name="description"]')['content'],
+            soup.select_one('[itemprop="price"]').text)
+
+@pytest.mark.parametrize('mode', ['full', 'strained', 'early'])
+def test_every_mode_finds_the_fields(mode):
+    for fields_at_end in (False, True):
+        assert _fields(_parser(mode).parse(_page(fields_at_end))) == ('Desk Lamp', 'A bright lamp', '$19.99')
+
+def test_early_stream_stops_reading_once_the_fields_are_found():
+    content = _page()
+    read = []
+
+    soup = _parser('early').parse_stream(_chunks(content, read), size=len(content))
+
+    assert _fields(soup) == ('Desk Lamp', 'A bright lamp', '$19.99')
+    assert sum(read) < len(content) / 4
+
+@pytest.mark.parametrize('size', [True, False])
+def test_early_stream_reads_everything_when_the_fields_come_last(size):
+    content = _page(fields_at_end=True)
+    read = []
+
+    soup = _parser('early').parse_stream(_chunks(content, read), size=len(content) if size else None)
+
+    assert _fields(soup) == ('Desk Lamp', 'A bright lamp', '$19.99')
+    assert sum(read) >= len(content)
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        PageParser('html.parser', 'lazy', GENERIC_SELECTOR_ENGINE)
+    with pytest.raises(ValueError):
+        PageParser('html.parser', 'early')
@@ -0,0 +1,112 @@
+import os
+import threading
+
+import requests
+
+from http_cache import HttpCache, install_cache
+
+def _session(cache):
+    session = requests.Session()
+    install_cache(session, cache)
+    return session
+
+def test_fresh_entry_is_served_without_a_request(site, tmp_path):
+    site.route('/page', headers={'ETag': '"v1"'}, body=b'<html>one</html>')
+    session = _session(HttpCache(str(tmp_path), ttl=600))
+
+    first = session.get(site.url('/page'))
+    second = session.get(site.url('/page'))
+
+    assert first.content == second.content == b'<html>one</html>'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert site.paths() == ['/page']
+
+def test_stale_entry_is_revalidated_with_its_validators(site, tmp_path):
+    def page(handler):
+        if handler.headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b''
+        return 200, {'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'}, b'<html>one</html>'
+    site.route('/page', page)
+    cache = HttpCache(str(tmp_path), ttl=0)
+    session = _session(cache)
+
+    session.get(site.url('/page'))
+    response = session.get(site.url('/page'))
+
+    assert response.headers['X-Cache'] == 'REVALIDATED'
+    assert response.content == b'<html>one</html>'
+    headers = site.requests[1][1]
+    assert headers['If-None-Match'] == '"v1"'
+    assert headers['If-Modified-Since'] == 'Wed, 01 Jan 2025 00:00:00 GMT'
+    assert cache.stats()['revalidated'] == 1
+
+def test_changed_page_replaces_the_entry(site, tmp_path):
+    bodies = iter([b'old', b'new'])
+    site.route('/page', lambda handler: (200, {'ETag': '"x"'}, next(bodies)))
+    cache = HttpCache(str(tmp_path), ttl=0)
+    session = _session(cache)
+
+    session.get(site.url('/page'))
+    assert session.get(site.url('/page')).content == b'new'
+    assert cache.get(site.url('/page'))['body'] == b'new'
+
+def test_no_store_and_errors_are_not_cached(site, tmp_path):
+    site.route('/private', headers={'Cache-Control': 'no-store'}, body=b'secret')
+    site.route('/broken', status=500, body=b'oops')
+    cache = HttpCache(str(tmp_path))
+    session = _session(cache)
+
+    session.get(site.url('/private'))
+    session.get(site.url('/broken'))
+
+    assert cache.get(site.url('/private')) is None
+    assert cache.get(site.url('/broken')) is None
+
+def test_streamed_body_is_cached_only_when_read_to_the_end(site, tmp_path):
+    site.route('/big', body=b'x' * 200000)
+    cache = HttpCache(str(tmp_path))
+    session = _session(cache)
+
+    with session.get(site.url('/big'), stream=True) as response:
+        next(response.iter_content(1024))
+    assert cache.get(site.url('/big')) is None
+
+    with session.get(site.url('/big'), stream=True) as response:
+        body = b''.join(response.iter_content(65536))
+    assert cache.get(site.url('/big'))['body'] == body
+
+def test_tracking_parameters_share_an_entry(site, tmp_path):
+    site.route('/page', body=b'page')
+    session = _session(HttpCache(str(tmp_path)))
+
+    session.get(site.url('/page?utm_source=mail'))
+    response = session.get(site.url('/page'))
+
+    assert response.headers['X-Cache'] == 'HIT'
+
+def test_entries_survive_a_restart_and_are_evicted_past_the_size_cap(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=250)
+    for i in range(3):
+        cache.put(f'https://shop.example.com/{i}', 200, {}, b'x' * 100)
+
+    reopened = HttpCache(str(tmp_path), max_bytes=250)
+    assert cache.get('https://shop.example.com/0') is None
+    assert reopened.get('https://shop.example.com/2')['body'] == b'x' * 100
+
+def test_concurrent_puts_of_one_url_leave_a_whole_entry(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    url = 'https://shop.example.com/p'
+
+    def write(i):
+        for _ in range(20):
+            cache.put(url, 200, {'ETag': str(i)}, bytes([65 + i]) * 50000)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    body = cache.get(url)['body']
+    assert len(body) == 50000 and len(set(body)) == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
@@ -0,0 +1,113 @@
+import os
+import threading
+
+import pytest
+
+from conftest import wait_until
+from jobs import DONE, FAILED, Job, JobQueue, QueueFull
+
+def _flaky(failures):
+    """Function failing ``failures`` times before returning the number of calls"""
+    calls = []
+
+    def run():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError(f'attempt {len(calls)} failed')
+        return len(calls)
+    return run
+
+def test_job_runs_and_keeps_its_result():
+    queue = JobQueue()
+
+    job_id = queue.submit('page-1', lambda a, b: a + b, 2, 3)
+
+    assert wait_until(lambda: queue.get(job_id).status == DONE)
+    job = queue.get(job_id)
+    assert (job.result, job.attempts, job.error) == (5, 1, None)
+    queue.shutdown()
+
+def test_identical_pending_jobs_are_merged():
+    queue = JobQueue()
+    release = threading.Event()
+
+    first = queue.submit('page-1', release.wait, 5)
+    assert queue.submit('page-1', release.wait, 5) == first
+    assert queue.submit('page-2', release.wait, 5) != first
+    release.set()
+
+    assert wait_until(lambda: queue.stats()['done'] == 2)
+    assert queue.stats()['deduplicated'] == 1
+    # Once finished, the same key runs again
+    assert queue.submit('page-1', lambda: None) != first
+    queue.shutdown()
+
+def test_failures_are_retried_with_backoff():
+    queue = JobQueue(max_retries=2, retry_delay=0.05)
+
+    job_id = queue.submit('page-1', _flaky(2))
+
+    assert wait_until(lambda: queue.get(job_id).status == DONE)
+    job = queue.get(job_id)
+    assert (job.result, job.attempts, job.error) == (3, 3, None)
+    assert queue.stats()['retries'] == 2
+    queue.shutdown()
+
+def test_job_fails_once_the_retries_run_out():
+    queue = JobQueue(max_retries=1, retry_delay=0.05)
+
+    job_id = queue.submit('page-1', _flaky(5))
+
+    assert wait_until(lambda: queue.get(job_id).status == FAILED)
+    job = queue.get(job_id)
+    assert (job.attempts, job.error) == (2, 'attempt 2 failed')
+    queue.shutdown()
+
+def test_submit_refuses_work_past_max_pending():
+    queue = JobQueue(max_workers=1, max_pending=2)
+    release = threading.Event()
+    queue.submit('page-1', release.wait, 5)
+    queue.submit('page-2', release.wait, 5)
+
+    with pytest.raises(QueueFull):
+        queue.submit('page-3', release.wait, 5)
+    release.set()
+    queue.shutdown()
+
+def test_another_queue_sharing_the_state_dir_answers_polls(tmp_path):
+    worker = JobQueue(state_dir=str(tmp_path))
+    sibling = JobQueue(state_dir=str(tmp_path))
+
+    job_id = worker.submit('page-1', lambda: {'page_id': 'abc'})
+
+    assert wait_until(lambda: sibling.get(job_id) is not None and sibling.get(job_id).status == DONE)
+    assert sibling.get(job_id).result == {'page_id': 'abc'}
+    assert sibling.get('missing') is None
+    assert sibling.get('../etc') is None
+    worker.shutdown()
+    sibling.shutdown()
+
+def test_concurrent_saves_of_one_job(tmp_path):
+    queue = JobQueue(state_dir=str(tmp_path))
+    job = Job('page-1', lambda: None, ())
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def save():
+        barrier.wait()
+        try:
+            for _ in range(20):
+                queue._save(job)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == [job.id + '.json']
+    assert queue.get(job.id).status == job.status
+    queue.shutdown()
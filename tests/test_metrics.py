@@ -0,0 +1,79 @@
+import json
+import os
+
+from metrics import Registry, SharedMetrics
+
+def _registry():
+    registry = Registry()
+    counter = registry.counter('scrapes_total', 'Scrapes by outcome', ('platform', 'outcome'))
+    histogram = registry.histogram('stage_seconds', 'Stage time', ('stage',), buckets=(0.1, 1))
+    return registry, counter, histogram
+
+def _write_snapshot(directory, name, registry):
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+        json.dump(registry.snapshot(), f)
+
+def test_prometheus_text_format():
+    registry, counter, histogram = _registry()
+    counter.inc(platform='Amazon', outcome='ok')
+    counter.inc(2, platform='we"ird\\\nshop', outcome='error')
+    for seconds in (0.05, 0.1, 0.5, 3):
+        histogram.observe(seconds, stage='fetch')
+
+    assert registry.render().splitlines() == [
+        '# HELP scrapes_total Scrapes by outcome',
+        '# TYPE scrapes_total counter',
+        'scrapes_total{platform="Amazon",outcome="ok"} 1',
+        'scrapes_total{platform="we\\"ird\\\\\\nshop",outcome="error"} 2',
+        '# HELP stage_seconds Stage time',
+        '# TYPE stage_seconds histogram',
+        'stage_seconds_bucket{stage="fetch",le="0.1"} 2',
+        'stage_seconds_bucket{stage="fetch",le="1.0"} 3',
+        'stage_seconds_bucket{stage="fetch",le="+Inf"} 4',
+        'stage_seconds_sum{stage="fetch"} 3.65',
+        'stage_seconds_count{stage="fetch"} 4',
+    ]
+
+def test_counters_are_summed_across_process_files(tmp_path):
+    registry, counter, histogram = _registry()
+    shared = SharedMetrics(str(tmp_path), registry, interval=3600)
+    counter.inc(platform='Amazon', outcome='ok')
+    histogram.observe(0.5, stage='fetch')
+    for name, count in (('101-1.json', 2), ('102-1.json', 3)):
+        other, other_counter, other_histogram = _registry()
+        other_counter.inc(count, platform='Amazon', outcome='ok')
+        other_histogram.observe(0.05, stage='fetch')
+        _write_snapshot(str(tmp_path), name, other)
+    # Torn writes and leftovers of interrupted saves are skipped
+    (tmp_path / '103-1.json').write_text('{"scrapes_total": [[')
+    (tmp_path / 'abc.tmp').write_text('{}')
+
+    text = shared.render()
+
+    assert 'scrapes_total{platform="Amazon",outcome="ok"} 6' in text
+    assert 'stage_seconds_bucket{stage="fetch",le="0.1"} 2' in text
+    assert 'stage_seconds_count{stage="fetch"} 3' in text
+
+def test_own_snapshot_is_not_counted_twice(tmp_path):
+    registry, counter, _ = _registry()
+    shared = SharedMetrics(str(tmp_path), registry, interval=3600)
+    counter.inc(platform='Amazon', outcome='ok')
+    shared.save()
+    counter.inc(platform='Amazon', outcome='ok')
+
+    assert 'scrapes_total{platform="Amazon",outcome="ok"} 2' in shared.render()
+    assert [name for name in os.listdir(tmp_path) if not name.endswith('.json')] == []
+
+def test_clear_drops_the_files_of_an_earlier_run(tmp_path):
+    stale, stale_counter, _ = _registry()
+    stale_counter.inc(5, platform='Amazon', outcome='ok')
+    _write_snapshot(str(tmp_path), '4242-1.json', stale)
+    (tmp_path / 'notes.txt').write_text('kept')
+
+    SharedMetrics.clear(str(tmp_path))
+    registry, counter, _ = _registry()
+    counter.inc(platform='Amazon', outcome='ok')
+
+    assert os.listdir(tmp_path) == ['notes.txt']
+    assert 'scrapes_total{platform="Amazon",outcome="ok"} 1' in SharedMetrics(str(tmp_path), registry, interval=3600).render()
+    SharedMetrics.clear(str(tmp_path / 'missing'))
@@ -0,0 +1,116 @@
+import gzip
+import os
+import threading
+import time
+
+from page_store import PageStore
+
+PAGE = '<html><body>' + 'Lamp ' * 2000 + '</body></html>'
+
+def _age(store, page_id, seconds):
+    """Backdate every stored copy of a page"""
+    when = time.time() - seconds
+    for name in os.listdir(store.directory):
+        if name.startswith(page_id):
+            os.utime(os.path.join(store.directory, name), (when, when))
+
+def test_identical_pages_are_stored_once(tmp_path):
+    store = PageStore(str(tmp_path))
+
+    page_id = store.put(PAGE)
+
+    assert store.put_stream([PAGE[:100], PAGE[100:]]) == page_id
+    assert store.put(PAGE + ' ') != page_id
+    stats = store.stats()
+    assert (stats['pages'], stats['stored'], stats['deduplicated']) == (2, 2, 1)
+
+def test_compressed_copies_match_the_page(tmp_path):
+    store = PageStore(str(tmp_path))
+
+    page_id = store.put(PAGE)
+
+    with open(store.path(page_id), encoding='utf-8') as f:
+        assert f.read() == PAGE
+    with open(store.path(page_id, 'gzip'), 'rb') as f:
+        assert gzip.decompress(f.read()).decode('utf-8') == PAGE
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_concurrent_puts_of_one_page(tmp_path):
+    store = PageStore(str(tmp_path))
+    barrier = threading.Barrier(8)
+    ids, errors = [], []
+
+    def put():
+        barrier.wait()
+        try:
+            ids.append(store.put(PAGE))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(set(ids)) == 1 and len(ids) == 8
+    stats = store.stats()
+    assert stats['pages'] == 1
+    assert stats['stored'] >= 1 and stats['stored'] + stats['deduplicated'] == 8
+    with open(store.path(ids[0]), encoding='utf-8') as f:
+        assert f.read() == PAGE
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_relative_directory_paths_survive_a_chdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = PageStore('pages')
+    page_id = store.put(PAGE)
+    monkeypatch.chdir('/')
+
+    path = store.path(page_id)
+
+    assert os.path.isabs(path)
+    assert path == os.path.join(str(tmp_path), 'pages', page_id + '.html')
+
+def test_unknown_and_malformed_ids_have_no_path(tmp_path):
+    store = PageStore(str(tmp_path))
+
+    assert store.path('0' * 24) is None
+    assert store.path('../../etc/passwd') is None
+    assert store.touch('0' * 24) is False
+
+def test_pages_past_the_age_limit_are_evicted(tmp_path):
+    store = PageStore(str(tmp_path), max_age=3600)
+    old, new = store.put('old page'), store.put('new page')
+    _age(store, old, 7200)
+
+    store.evict()
+
+    assert store.path(old) is None
+    assert store.path(new) is not None
+
+def test_oldest_pages_go_first_past_the_size_limit(tmp_path):
+    store = PageStore(str(tmp_path))
+    ids = [store.put(f'<p>{i}</p>' + 'x' * 1000) for i in range(3)]
+    for age, page_id in zip((300, 200, 100), ids):
+        _age(store, page_id, age)
+    store.max_bytes = store.stats()['bytes'] - 1
+
+    store.evict()
+
+    assert store.path(ids[0]) is None
+    assert store.path(ids[1]) is not None and store.path(ids[2]) is not None
+
+def test_touch_and_dedupe_keep_a_page_from_eviction(tmp_path):
+    store = PageStore(str(tmp_path), max_age=3600)
+    touched, stored_again = store.put('touched page'), store.put('stored again')
+    _age(store, touched, 7200)
+    _age(store, stored_again, 7200)
+
+    assert store.touch(touched) is True
+    store.put('stored again')
+    store.evict()
+
+    assert store.path(touched) is not None
+    assert store.path(stored_again) is not None
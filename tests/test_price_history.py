@@ -0,0 +1,60 @@
+import time
+
+from price_history import PriceHistory, product_fingerprint
+
+URL = 'https://shop.example.com/products/lamp'
+
+def _product(price=10.0, title='Desk Lamp', description='A bright lamp'):
+    return {'title': title, 'description': description, 'images': [{'url': 'https://img.example.com/1.jpg'}],
+            'price': {'current': price, 'original': 20.0, 'currency': 'USD'},
+            'reviews': {'average_rating': 4.5, 'total_reviews': 12}}
+
+def test_fingerprint_ignores_metadata_and_whitespace():
+    product = _product()
+
+    assert product_fingerprint(dict(product, scraped_at='now', source={'platform': 'Shopify'})) == product_fingerprint(product)
+    assert product_fingerprint(_product(title='  Desk\n  Lamp ')) == product_fingerprint(product)
+    assert product_fingerprint(_product(price=9.0)) != product_fingerprint(product)
+
+def test_fingerprint_reads_display_prices():
+    product = {'title': 'Lamp', 'price': '$10.00', 'image': 'https://img.example.com/1.jpg'}
+
+    assert product_fingerprint(product) != product_fingerprint(dict(product, price='$12.00'))
+
+def test_record_outcomes_and_price_points(tmp_path):
+    history = PriceHistory(str(tmp_path / 'history.db'))
+
+    assert history.record(URL, _product()) == 'new'
+    assert history.record(URL + '?utm_source=feed', _product()) == 'unchanged'
+    time.sleep(0.01)
+    assert history.record(URL, _product(price=8.0)) == 'changed'
+    # A change that leaves the price alone adds no price point
+    assert history.record(URL, _product(price=8.0, description='A very bright lamp')) == 'changed'
+
+    result = history.history(URL)
+    assert (result['checks'], result['changes']) == (4, 2)
+    assert [point['current'] for point in result['prices']] == [10.0, 8.0]
+    assert [point['current'] for point in history.history(URL, limit=1)['prices']] == [8.0]
+    assert history.stats() == {'new': 1, 'changed': 2, 'unchanged': 1, 'products': 1, 'price_points': 2}
+    assert history.history('https://shop.example.com/other') is None
+
+def test_generated_page_is_kept_until_the_product_changes(tmp_path):
+    history = PriceHistory(str(tmp_path / 'history.db'))
+    copy = {'headline': 'Light up your desk'}
+
+    history.record(URL, _product(), page_id='a' * 24, sales_copy=copy, render_version='v1')
+    history.record(URL, _product())
+    entry = history.lookup(URL)
+    assert (entry['page_id'], entry['sales_copy'], entry['render_version']) == ('a' * 24, copy, 'v1')
+
+    history.record(URL, _product(price=8.0))
+    entry = history.lookup(URL)
+    assert (entry['page_id'], entry['sales_copy']) == (None, None)
+
+def test_history_is_shared_through_the_database(tmp_path):
+    path = str(tmp_path / 'history.db')
+    PriceHistory(path).record(URL, _product())
+
+    reopened = PriceHistory(path)
+    assert reopened.record(URL, _product()) == 'unchanged'
+    reopened.close()
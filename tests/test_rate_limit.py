@@ -0,0 +1,137 @@
+import time
+
+import pytest
+import requests
+
+from rate_limit import RateLimiter, RetryPolicy, deadline, install_limiter, parse_retry_after
+
+def _session(limiter=None, retry=None):
+    session = requests.Session()
+    limiter = limiter or RateLimiter()
+    install_limiter(session, limiter, retry or RetryPolicy(backoff=0.01))
+    return session, limiter
+
+def _flaky(*statuses, headers=None):
+    """Route answering with each of ``statuses`` in turn, then 200"""
+    remaining = list(statuses)
+
+    def respond(handler):
+        if remaining:
+            return remaining.pop(0), headers or {}, b'busy'
+        return 200, {}, b'ok'
+    return respond
+
+def test_transient_failures_are_retried(site):
+    site.route('/page', _flaky(503, 502))
+    session, limiter = _session()
+
+    response = session.get(site.url('/page'))
+
+    assert response.status_code == 200
+    assert response.text == 'ok'
+    assert len(site.requests) == 3
+    assert limiter.stats()['127.0.0.1']['retries'] == 2
+
+def test_retry_after_is_waited_for(site):
+    site.route('/page', _flaky(429, headers={'Retry-After': '1'}))
+    session, _ = _session()
+
+    started = time.monotonic()
+    assert session.get(site.url('/page')).status_code == 200
+    assert time.monotonic() - started >= 1
+
+def test_last_response_is_returned_after_the_retries(site):
+    site.route('/page', status=503, body=b'down')
+    session, _ = _session(retry=RetryPolicy(retries=2, backoff=0.01))
+
+    response = session.get(site.url('/page'))
+
+    assert response.status_code == 503
+    assert len(site.requests) == 3
+
+def test_retry_after_past_the_budget_is_not_waited_for(site):
+    site.route('/page', _flaky(503, headers={'Retry-After': '10'}))
+    session, _ = _session(retry=RetryPolicy(total=2))
+
+    started = time.monotonic()
+    assert session.get(site.url('/page')).status_code == 503
+    assert time.monotonic() - started < 1
+
+def test_expired_deadline_sends_nothing(site):
+    site.route('/page', body=b'ok')
+    session, _ = _session()
+
+    with deadline(time.monotonic() - 1):
+        with pytest.raises(requests.Timeout):
+            session.get(site.url('/page'))
+    assert site.requests == []
+
+def test_deadline_cuts_the_read_timeout(site):
+    def slow(handler):
+        time.sleep(1.5)
+        return 200, {}, b'late'
+    site.route('/slow', slow)
+    session, _ = _session(retry=RetryPolicy(retries=0))
+
+    started = time.monotonic()
+    with deadline(time.monotonic() + 0.3):
+        with pytest.raises(requests.Timeout):
+            session.get(site.url('/slow'), timeout=30)
+    assert time.monotonic() - started < 1.2
+
+def test_slot_is_held_until_the_body_is_closed(site):
+    site.route('/big', body=b'x' * 100000)
+    session, limiter = _session(RateLimiter(initial=1, max_limit=1))
+
+    response = session.get(site.url('/big'), stream=True)
+    assert limiter.stats()['127.0.0.1']['in_flight'] == 1
+    response.close()
+    assert limiter.stats()['127.0.0.1']['in_flight'] == 0
+
+    session.get(site.url('/big'))
+    assert limiter.stats()['127.0.0.1']['in_flight'] == 0
+
+def test_throttling_halves_the_limit_once_per_round():
+    limiter = RateLimiter(initial=8)
+    tickets = [limiter.acquire('https://shop.example.com/') for _ in range(4)]
+
+    for ticket in tickets:
+        limiter.release(ticket, status=429)
+
+    stats = limiter.stats()['shop.example.com']
+    assert stats['limit'] == 4
+    assert stats['throttled'] == 4
+    assert stats['in_flight'] == 0
+
+def test_successes_raise_the_limit_up_to_the_cap():
+    limiter = RateLimiter(initial=1, max_limit=2)
+
+    for _ in range(5):
+        limiter.release(limiter.acquire('https://shop.example.com/'), status=200)
+
+    assert limiter.stats()['shop.example.com']['limit'] == 2
+
+def test_retry_after_pauses_the_domain():
+    limiter = RateLimiter()
+    limiter.release(limiter.acquire('https://shop.example.com/'), status=503, retry_after=0.3)
+
+    started = time.monotonic()
+    limiter.release(limiter.acquire('https://shop.example.com/'), status=200)
+    assert time.monotonic() - started >= 0.25
+    assert limiter.stats()['shop.example.com']['waits'] == 1
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after('Wed, 01 Jan 2020 00:00:00 GMT') == 0.0
+    assert 50 < parse_retry_after(time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 60))) <= 60
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+def test_backoff_delays_grow_and_stop():
+    policy = RetryPolicy(retries=3, backoff=1, max_delay=3)
+
+    assert all(0 <= policy.delay(0) <= 1 for _ in range(20))
+    assert all(0 <= policy.delay(2) <= 3 for _ in range(20))
+    assert policy.delay(3) is None
+    assert policy.delay(0, retry_after=5) is None
+    assert policy.delay(0, retry_after=2) == 2
@@ -0,0 +1,80 @@
+import os
+import re
+
+from markupsafe import escape
+
+from baseline_sales_page import create_sales_page_html
+from conftest import ROOT
+from rendering import SalesPageRenderer, render_key
+
+TEMPLATE_DIR = os.path.join(ROOT, 'scraper-app', 'templates')
+
+PRODUCT = {'title': 'Desk Lamp', 'price': '$19.99', 'image': 'https://img.example.com/1.jpg',
+           'scraped_at': '2025-01-01T00:00:00Z', 'source': {'platform': 'Generic'}}
+COPY = {'headline': 'Light up your desk', 'description': 'A bright, adjustable lamp',
+        'call_to_action': 'Buy now', 'urgency_text': 'Only 3 left!', 'guarantee_text': '30-day guarantee',
+        'benefits': ['Bright', 'Adjustable']}
+
+def _normalize(html):
+    """Markup with the whitespace between tags collapsed"""
+    return re.sub(r'>\s+<', '><', html).strip()
+
+def _escaped(value):
+    if isinstance(value, list):
+        return [_escaped(item) for item in value]
+    return str(escape(value)) if isinstance(value, str) else value
+
+def test_page_matches_the_original_f_string():
+    html = SalesPageRenderer(TEMPLATE_DIR).render(PRODUCT, COPY)
+
+    assert _normalize(html) == _normalize(create_sales_page_html(PRODUCT, COPY))
+
+def test_product_fields_are_escaped():
+    product = dict(PRODUCT, title='Lamp" onerror="alert(1)', price='<b>$5</b>')
+    copy = dict(COPY, headline='<script>alert("x")</script>', benefits=['Safe & sound', '<img src=x>'])
+
+    html = SalesPageRenderer(TEMPLATE_DIR).render(product, copy)
+
+    assert '<script>alert' not in html and '<img src=x>' not in html
+    assert 'alt="Lamp&#34; onerror=&#34;alert(1)"' in html
+    # Apart from the escaping the page is the original one
+    expected = create_sales_page_html({key: _escaped(value) for key, value in product.items()},
+                                      {key: _escaped(value) for key, value in copy.items()})
+    assert _normalize(html) == _normalize(expected)
+
+def test_render_key_ignores_scrape_metadata():
+    rescraped = dict(PRODUCT, scraped_at='2025-02-01T00:00:00Z', source={'platform': 'Generic', 'changed': False})
+
+    assert render_key(rescraped, COPY) == render_key(PRODUCT, COPY)
+    assert render_key(dict(PRODUCT, price='$18.99'), COPY) != render_key(PRODUCT, COPY)
+
+def test_repeat_renders_come_from_the_cache():
+    renderer = SalesPageRenderer(TEMPLATE_DIR)
+
+    first = renderer.render(PRODUCT, COPY)
+    streamed = ''.join(renderer.stream(dict(PRODUCT, scraped_at='later'), COPY))
+
+    assert streamed == first
+    stats = renderer.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+def test_streamed_page_is_cached_whole():
+    renderer = SalesPageRenderer(TEMPLATE_DIR)
+
+    streamed = ''.join(renderer.stream(PRODUCT, COPY))
+
+    assert renderer.render(PRODUCT, COPY) == streamed
+    assert renderer.stats()['hits'] == 1
+
+def test_cache_hits_keep_pages_from_eviction():
+    renderer = SalesPageRenderer(TEMPLATE_DIR, cache_size=2)
+    pages = [dict(PRODUCT, title=f'Lamp {i}') for i in range(3)]
+
+    for use in (renderer.render, lambda product, copy: ''.join(renderer.stream(product, copy))):
+        renderer._cache.clear()
+        use(pages[0], COPY)
+        use(pages[1], COPY)
+        use(pages[0], COPY)
+        use(pages[2], COPY)
+        assert render_key(pages[0], COPY) in renderer._cache
+        assert render_key(pages[1], COPY) not in renderer._cache
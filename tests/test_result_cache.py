@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+from conftest import wait_until
+from result_cache import ResultCache, is_scrape_error
+
+URL = 'https://shop.example.com/products/lamp'
+
+def _product(title='Lamp'):
+    return {'title': title, 'price': {'current': 10.0}, 'source': {'platform': 'Generic'}}
+
+def test_fresh_result_is_reused(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    calls = []
+
+    def scrape(url):
+        calls.append(url)
+        return _product()
+
+    assert cache.get_or_scrape(URL, scrape) == _product()
+    assert cache.get_or_scrape(URL + '?utm_source=feed', scrape) == _product()
+    assert calls == [URL]
+    assert cache.state(URL) == 'fresh'
+    assert cache.stats()['hits'] == 1
+
+def test_stale_result_is_served_while_one_refresh_runs(tmp_path):
+    cache = ResultCache(str(tmp_path), fresh_for=0, max_stale=60)
+    cache.put(URL, _product('Old'))
+    release = threading.Event()
+    calls = []
+
+    def scrape(url):
+        calls.append(url)
+        release.wait(5)
+        return _product('New')
+
+    assert cache.get_or_scrape(URL, scrape)['title'] == 'Old'
+    assert cache.get_or_scrape(URL, scrape)['title'] == 'Old'
+    release.set()
+    assert wait_until(lambda: cache.stats()['refreshes'] == 1)
+    assert len(calls) == 1
+    assert cache.get(URL)[0]['title'] == 'New'
+    cache.close()
+
+def test_expired_result_is_scraped_again(tmp_path):
+    cache = ResultCache(str(tmp_path), fresh_for=0, max_stale=0)
+    cache.put(URL, _product('Old'))
+
+    assert cache.state(URL) is None
+    assert cache.get_or_scrape(URL, lambda url: _product('New'))['title'] == 'New'
+
+def test_fallback_data_is_not_cached(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    failed = {'title': 'Generic Product', 'source': {'error': 'timeout'}}
+
+    assert is_scrape_error(failed)
+    cache.get_or_scrape(URL, lambda url: failed)
+    assert cache.get(URL) == (None, None)
+
+def test_results_are_copies(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put(URL, _product())
+
+    cache.get(URL)[0]['title'] = 'Changed'
+    assert cache.get(URL)[0]['title'] == 'Lamp'
+
+def test_results_persist_and_evict_oldest(tmp_path):
+    cache = ResultCache(str(tmp_path), max_entries=2)
+    for i in range(3):
+        cache.put(f'{URL}/{i}', _product(str(i)))
+        time.sleep(0.01)
+
+    reopened = ResultCache(str(tmp_path), max_entries=2)
+    assert reopened.get(f'{URL}/0') == (None, None)
+    assert reopened.get(f'{URL}/2')[0]['title'] == '2'
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.json')]) == 2
+
+def test_concurrent_puts_leave_a_whole_entry(tmp_path):
+    cache = ResultCache(str(tmp_path))
+
+    def write(i):
+        for _ in range(20):
+            cache.put(URL, _product(str(i) * 5000))
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    title = ResultCache(str(tmp_path)).get(URL)[0]['title']
+    assert len(title) == 5000 and len(set(title)) == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
@@ -0,0 +1,72 @@
+from bs4 import BeautifulSoup
+
+from selector_engine import SelectorEngine, compile_selector
+
+HTML = '''
+<html><head>
+  <title>Desk Lamp</title>
+  <meta name="description" content="A bright lamp">
+  <meta property="og:price:amount" content="19.99">
+</head><body>
+  <div id="main" class="product page">
+    <h1 class="title product-title">Desk Lamp</h1>
+    <div class="pricing">
+      <span class="price old" data-price="24.99">$24.99</span>
+      <span class="price sale" data-price="19.99">$19.99</span>
+    </div>
+    <ul><li><a href="/products/bulb" rel="related item">Bulb</a></li></ul>
+  </div>
+  <span class="price">$1.00</span>
+</body></html>
+'''
+
+SELECTORS = [
+    'title', 'h1', '#main', 'h1.title', '.price.sale', '[data-price]', 'span[data-price="19.99"]',
+    'meta[property*="price"]', 'a[href^="/products"]', 'a[href$="bulb"]', 'a[rel~=item]',
+    '#main .pricing span', 'div .price', 'h1, .missing', '.missing', 'ul span', '*[name=description]'
+]
+
+def _soup():
+    return BeautifulSoup(HTML, 'html.parser')
+
+def test_first_matches_agree_with_soupsieve():
+    soup = _soup()
+    engine = SelectorEngine({'all': SELECTORS})
+
+    matches = engine.match(soup)
+
+    assert engine.unsupported == []
+    for selector in SELECTORS:
+        assert matches.select_one(selector) is soup.select_one(selector), selector
+
+def test_unsupported_syntax_falls_back_to_soupsieve():
+    soup = _soup()
+    engine = SelectorEngine({'price': ['div > span:nth-of-type(2)', '.price']})
+
+    matches = engine.match(soup)
+
+    assert compile_selector('div > span') is None
+    assert engine.unsupported == ['div > span:nth-of-type(2)']
+    assert matches.select_one('div > span:nth-of-type(2)').text == '$19.99'
+    # Selectors outside the engine's lists are answered too
+    assert matches.select_one('li a').text == 'Bulb'
+
+def test_settled_waits_for_the_selectors_ahead_of_the_winner():
+    engine = SelectorEngine({'price': ['.price.sale', '.price'], 'title': ['.missing', 'h1']})
+    partial = engine.match(BeautifulSoup(HTML.split('<span class="price sale"')[0], 'html.parser'))
+    full = engine.match(_soup())
+
+    assert not engine.settled(partial, 'price')
+    assert engine.settled(full, 'price')
+    assert not engine.settled(full, 'title')
+    assert engine.settled(full, 'title', order=['h1', '.missing'])
+    assert engine.settled(full, 'price', accept=lambda element: 'old' not in element['class'])
+
+def test_could_match_keeps_only_useful_elements():
+    soup = _soup()
+    engine = SelectorEngine({'price': ['#main .pricing span']})
+
+    kept = {element.name for element in soup.find_all(True) if engine.could_match(element)}
+
+    assert kept == {'div', 'span'}
+    assert SelectorEngine({'price': ['span:first-child']}).could_match(soup.find('ul'))
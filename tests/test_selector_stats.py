@@ -0,0 +1,112 @@
+import importlib
+import os
+import threading
+
+from selector_stats import SelectorStats, domain_key
+
+FIELDS = {'title': ['h1', '.title', '.name'], 'price': ['.price', '[itemprop=price]']}
+URL = 'https://www.shop.example.com/products/1'
+
+def test_winners_are_tried_first_once_there_are_enough_samples():
+    stats = SelectorStats(explore=0, min_samples=3)
+
+    for _ in range(2):
+        stats.record(URL, 'title', '.name')
+    assert stats.orders_for(URL, FIELDS)['title'] == ['h1', '.title', '.name']
+
+    stats.record(URL, 'title', '.name')
+    stats.record(URL, 'title', '.title')
+    orders = stats.orders_for(URL, FIELDS)
+    assert orders == {'title': ['.name', '.title', 'h1'], 'price': ['.price', '[itemprop=price]']}
+    # Other sites keep the default order
+    assert stats.orders_for('https://other.example.com/p', FIELDS)['title'] == FIELDS['title']
+
+def test_exploring_pages_use_the_default_order():
+    stats = SelectorStats(explore=1, min_samples=1)
+    stats.record(URL, 'title', '.name')
+
+    assert stats.orders_for(URL, FIELDS)['title'] == FIELDS['title']
+    assert stats.stats()['explored'] == 1
+
+def test_a_new_leader_is_counted_as_a_change():
+    stats = SelectorStats(explore=0, min_samples=1, decay=0.5)
+    stats.record_all(URL, {'title': 'h1', 'price': '.price'})
+    for _ in range(3):
+        stats.record(URL, 'title', '.title')
+
+    report = stats.report()
+    assert list(report) == ['shop.example.com']
+    title = report['shop.example.com']['title']
+    assert (title['winner'], title['samples'], title['changes']) == ('.title', 4, 1)
+    assert title['last_change'] is not None
+    assert report['shop.example.com']['price'] == {'winner': '.price', 'share': 1.0, 'samples': 1,
+                                                   'changes': 0, 'last_change': None}
+    assert stats.orders_for(URL, FIELDS)['title'][0] == '.title'
+
+def test_stats_are_saved_and_reloaded(tmp_path):
+    path = str(tmp_path / 'stats' / 'selectors.json')
+    stats = SelectorStats(path, explore=0, min_samples=1)
+    stats.record(URL, 'price', '[itemprop=price]')
+
+    stats.save()
+    reloaded = SelectorStats(path, explore=0, min_samples=1)
+
+    assert reloaded.report() == stats.report()
+    assert reloaded.orders_for(URL, FIELDS)['price'] == ['[itemprop=price]', '.price']
+    assert SelectorStats(str(tmp_path / 'missing.json')).report() == {}
+
+def test_only_the_most_recent_domains_are_saved(tmp_path):
+    path = str(tmp_path / 'selectors.json')
+    stats = SelectorStats(path, max_domains=2)
+    for host in ('a', 'b', 'c'):
+        stats.record(f'https://{host}.example.com/p', 'title', 'h1')
+
+    stats.save()
+
+    assert sorted(SelectorStats(path).report()) == ['b.example.com', 'c.example.com']
+
+def test_concurrent_saves(tmp_path):
+    path = str(tmp_path / 'selectors.json')
+    stats = SelectorStats(path)
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def save(index):
+        barrier.wait()
+        try:
+            for step in range(20):
+                stats.record(f'https://shop{index}.example.com/p', 'title', 'h1')
+                stats.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == ['selectors.json']
+    assert len(SelectorStats(path).report()) == 8
+
+def test_domain_key():
+    assert domain_key('https://WWW.Shop.Example.com:8080/p?q=1') == 'shop.example.com'
+    assert domain_key('not a url') == ''
+
+def test_selectors_endpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = importlib.import_module('app')
+    stats = SelectorStats(explore=0)
+    stats.record(URL, 'title', '.title')
+    stats.record('https://other.example.com/p', 'price', '.price')
+    monkeypatch.setattr(app.generator.scraper, 'selector_stats', stats)
+    client = app.app.test_client()
+
+    everything = client.get('/selectors').get_json()
+    one = client.get('/selectors?domain=shop.example.com').get_json()
+
+    assert everything == stats.report()
+    assert sorted(everything) == ['other.example.com', 'shop.example.com']
+    assert one == {'shop.example.com': {'title': {'winner': '.title', 'share': 1.0, 'samples': 1,
+                                                  'changes': 0, 'last_change': None}}}
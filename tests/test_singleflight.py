@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from conftest import wait_until
+from singleflight import SingleFlight
+
+def _run_together(flight, key, fn, callers):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {'title': 'Lamp'}
+
+    threads, results, _ = _run_together(flight, 'key', work, 5)
+    assert wait_until(lambda: flight.stats()['waiters'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'title': 'Lamp'}] * 5
+    # Each waiter gets its own copy
+    assert len({id(result) for result in results}) == 5
+    assert flight.stats() == {'in_flight': 0, 'waiters': 0, 'calls': 1, 'coalesced': 4}
+
+def test_waiters_get_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise ValueError('boom')
+
+    threads, results, errors = _run_together(flight, 'key', work, 3)
+    assert wait_until(lambda: flight.stats()['waiters'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == []
+    assert [str(error) for error in errors] == ['boom'] * 3
+
+def test_later_calls_run_again():
+    flight = SingleFlight()
+    calls = []
+
+    assert flight.do('key', lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do('key', lambda: calls.append(1) or len(calls)) == 2
+    with pytest.raises(KeyError):
+        flight.do('other', lambda: {}['missing'])
+    assert flight.stats()['in_flight'] == 0
@@ -0,0 +1,110 @@
+import asyncio
+import gzip
+
+import aiohttp
+import pytest
+import requests
+
+from conftest import wait_until
+from python_scraper import ProductScraper
+from streaming import ResponseTooLarge, iter_body, read_body, read_body_async, response_text
+
+LIMIT = 1024 * 1024
+
+class _WatchedWriter:
+    """Response writer noting whether the client hung up before the body was sent"""
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.error = None
+
+    def write(self, data):
+        try:
+            return self.wfile.write(data)
+        except OSError as e:
+            self.error = e
+
+    def __getattr__(self, name):
+        return getattr(self.wfile, name)
+
+def _watched(body, headers=None, writers=None):
+    def respond(handler):
+        handler.wfile = _WatchedWriter(handler.wfile)
+        writers.append(handler.wfile)
+        return 200, headers or {}, body
+    return respond
+
+def _gzip_bomb(size):
+    return gzip.compress(b'\0' * size, compresslevel=9)
+
+def test_body_under_the_cap_is_read_decoded(site):
+    page = '<html><body>Lampe à poser</body></html>'.encode('latin-1')
+    site.route('/page', body=gzip.compress(page),
+               headers={'Content-Encoding': 'gzip', 'Content-Type': 'text/html; charset=iso-8859-1'})
+
+    with requests.get(site.url('/page'), stream=True) as response:
+        body = read_body(response, LIMIT, chunk_size=8)
+
+    assert body == page
+    assert response_text(response, body) == '<html><body>Lampe à poser</body></html>'
+
+def test_declared_length_over_the_cap_fails_before_reading(site):
+    writers = []
+    site.route('/big', _watched(b'x' * 32 * LIMIT, writers=writers))
+
+    with requests.get(site.url('/big'), stream=True) as response:
+        chunks = iter_body(response, LIMIT)
+        with pytest.raises(ResponseTooLarge, match='over the 1048576 byte limit'):
+            next(chunks)
+
+    # Closing the response dropped the connection instead of draining the rest
+    assert wait_until(lambda: writers[0].error is not None)
+
+def test_decoded_size_is_checked_as_the_body_arrives(site):
+    bomb = _gzip_bomb(16 * LIMIT)
+    assert len(bomb) < LIMIT
+    site.route('/bomb', body=bomb, headers={'Content-Encoding': 'gzip'})
+    received = 0
+
+    with requests.get(site.url('/bomb'), stream=True) as response:
+        with pytest.raises(ResponseTooLarge):
+            for chunk in iter_body(response, LIMIT):
+                received += len(chunk)
+
+    assert 0 < received <= LIMIT
+
+def test_closing_a_partly_read_response_drops_the_connection(site):
+    writers = []
+    site.route('/page', _watched(b'<html>' + b'x' * 32 * LIMIT, writers=writers))
+
+    with requests.get(site.url('/page'), stream=True) as response:
+        first = next(iter_body(response, max_bytes=None))
+
+    assert first.startswith(b'<html>')
+    assert wait_until(lambda: writers[0].error is not None)
+
+def test_oversized_page_gives_fallback_data(site):
+    site.route('/bomb', body=_gzip_bomb(4 * LIMIT), headers={'Content-Encoding': 'gzip'})
+    scraper = ProductScraper(max_body_bytes=LIMIT)
+
+    for mode in ('stream', 'buffered'):
+        scraper.fetch_mode = mode
+        result = scraper.scrape_generic(site.url('/bomb'))
+        assert 'over the 1048576 byte limit' in result['source']['error']
+    scraper.close()
+
+def test_async_read_stops_at_the_cap(site):
+    site.route('/bomb', body=_gzip_bomb(16 * LIMIT), headers={'Content-Encoding': 'gzip'})
+    site.route('/big', body=b'x' * 2 * LIMIT)
+    site.route('/page', body=b'<html></html>')
+
+    async def read(path):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(site.url(path)) as response:
+                try:
+                    return await read_body_async(response, LIMIT)
+                except ResponseTooLarge as e:
+                    return e
+
+    assert isinstance(asyncio.run(read('/bomb')), ResponseTooLarge)
+    assert isinstance(asyncio.run(read('/big')), ResponseTooLarge)
+    assert asyncio.run(read('/page')) == b'<html></html>'
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from bs4 import BeautifulSoup
+
+from structured_data import extract_structured_data, format_price, has_required_fields, parse_price
+
+BASE = 'https://shop.example.com/products/lamp'
+
+def _soup(head='', body=''):
+    return BeautifulSoup(f'<html><head>{head}</head><body>{body}</body></html>', 'html.parser')
+
+def _json_ld(document):
+    return f'<script type="application/ld+json">{json.dumps(document)}</script>'
+
+@pytest.mark.parametrize('text, expected', [
+    ('$19.99', (19.99, 'USD')),
+    ('$1,299.00', (1299.0, 'USD')),
+    ('12,50 €', (12.5, 'EUR')),
+    ('1.299,50 €', (1299.5, 'EUR')),
+    ('£1,000', (1000.0, 'GBP')),
+    ('¥ 2,980', (2980.0, 'JPY')),
+    ('1299', (1299.0, None)),
+    (19.5, (19.5, None)),
+    ('Price on request', (None, None)),
+    (None, (None, None)),
+])
+def test_parse_price(text, expected):
+    assert parse_price(text) == expected
+
+def test_format_price():
+    assert format_price(1299.5, 'USD') == '$1,299.50'
+    assert format_price(19.99, 'CHF') == 'CHF 19.99'
+
+def test_json_ld_product_in_a_graph_with_a_list_of_offers():
+    document = {'@context': 'https://schema.org', '@graph': [
+        {'@type': 'WebPage', 'name': 'Lamp page'},
+        {'@type': ['Product', 'Thing'], 'name': 'Desk Lamp', 'description': 'A bright lamp',
+         'brand': {'@type': 'Brand', 'name': 'Lumen'},
+         'image': [{'@type': 'ImageObject', 'url': '/img/1.jpg'}, '//cdn.example.com/2.jpg', '/img/1.jpg'],
+         'offers': [{'@type': 'Offer', 'price': 'call us'},
+                    {'@type': 'Offer', 'price': '24.50', 'priceCurrency': 'EUR',
+                     'availability': 'https://schema.org/OutOfStock'}],
+         'aggregateRating': {'ratingValue': '4.6', 'reviewCount': '1,024'}}
+    ]}
+
+    data = extract_structured_data(_soup(_json_ld(document)), BASE)
+
+    assert data == {
+        'sources': ['json-ld'], 'title': 'Desk Lamp', 'description': 'A bright lamp', 'brand': 'Lumen',
+        'images': ['https://shop.example.com/img/1.jpg', 'https://cdn.example.com/2.jpg'],
+        'price': 24.5, 'currency': 'EUR', 'in_stock': False, 'rating': 4.6, 'review_count': 1024
+    }
+    assert has_required_fields(data)
+
+def test_malformed_json_ld_is_skipped():
+    head = ('<script type="application/ld+json">{"@type": "Product", "name": </script>'
+            + _json_ld({'@type': 'Product', 'name': 'Desk Lamp', 'image': 'https://img.example.com/1.jpg',
+                        'offers': {'lowPrice': 10, 'priceCurrency': 'USD'}}))
+
+    data = extract_structured_data(_soup(head))
+
+    assert (data['title'], data['price'], data['currency']) == ('Desk Lamp', 10.0, 'USD')
+
+def test_open_graph_fills_what_json_ld_lacks():
+    head = (_json_ld({'@type': 'Product', 'name': 'Desk Lamp'})
+            + '<meta property="og:title" content="OG title">'
+            '<meta property="og:image" content="https://img.example.com/og.jpg">'
+            '<meta property="product:price:amount" content="1.299,00 €">'
+            '<meta property="product:availability" content="in stock">')
+
+    data = extract_structured_data(_soup(head))
+
+    assert data['title'] == 'Desk Lamp'
+    assert data['images'] == ['https://img.example.com/og.jpg']
+    assert (data['price'], data['currency'], data['in_stock']) == (1299.0, 'EUR', True)
+    assert data['sources'] == ['json-ld', 'opengraph']
+
+def test_microdata_reads_the_product_and_not_its_reviews():
+    body = '''
+    <div itemscope itemtype="https://schema.org/Product">
+      <h1 itemprop="name">Desk Lamp</h1>
+      <img itemprop="image" src="/img/1.jpg">
+      <div itemprop="brand" itemscope itemtype="https://schema.org/Brand"><span itemprop="name">Lumen</span></div>
+      <div itemprop="offers" itemscope itemtype="https://schema.org/Offer">
+        <span itemprop="price" content="19.99">$19.99</span><meta itemprop="priceCurrency" content="CAD">
+        <link itemprop="availability" href="https://schema.org/InStock">
+      </div>
+      <div itemprop="review" itemscope itemtype="https://schema.org/Review">
+        <span itemprop="name">Great lamp</span><p itemprop="description">Review text</p>
+      </div>
+      <p itemprop="description">A bright lamp</p>
+    </div>'''
+
+    data = extract_structured_data(_soup(body=body), BASE)
+
+    assert data['sources'] == ['microdata']
+    assert (data['title'], data['description'], data['brand']) == ('Desk Lamp', 'A bright lamp', 'Lumen')
+    assert (data['price'], data['currency'], data['in_stock']) == (19.99, 'CAD', True)
+    assert data['images'] == ['https://shop.example.com/img/1.jpg']
+
+def test_microdata_is_skipped_when_not_needed():
+    body = '<div itemscope itemtype="https://schema.org/Product"><span itemprop="name">Micro</span></div>'
+    complete = _json_ld({'@type': 'Product', 'name': 'Desk Lamp', 'image': 'https://img.example.com/1.jpg',
+                         'offers': {'price': 10}})
+
+    assert extract_structured_data(_soup(complete, body))['sources'] == ['json-ld']
+    assert extract_structured_data(_soup(body=body), microdata=False) == {'sources': []}
+
+def test_currency_stays_with_its_price():
+    head = (_json_ld({'@type': 'Product', 'name': 'Lamp', 'offers': {'price': '10.00'}})
+            + '<meta property="product:price:amount" content="12.00">'
+            '<meta property="product:price:currency" content="GBP">')
+
+    data = extract_structured_data(_soup(head))
+
+    assert data['price'] == 10.0
+    assert data.get('currency') is None
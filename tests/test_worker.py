@@ -0,0 +1,81 @@
+import io
+import json
+import time
+
+from python_scraper import ProductScraper, run_worker
+from rate_limit import RetryPolicy
+
+PAGE = ('<html><head><title>Desk Lamp</title><meta name="description" content="A bright lamp"></head>'
+        '<body><span itemprop="price">$19.99</span></body></html>')
+
+def _serve(lines, max_workers=4):
+    """Run the worker over request lines and return its response lines by id"""
+    scraper = ProductScraper(retry_policy=RetryPolicy(retries=0))
+    stdout = io.StringIO()
+    run_worker(scraper, max_workers, io.StringIO(''.join(line + '\n' for line in lines)), stdout)
+    scraper.close()
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert responses[0] == {'id': None, 'ready': True}
+    return responses[1:]
+
+def _by_id(responses):
+    return {response['id']: response for response in responses}
+
+def test_requests_are_answered_with_their_id(site):
+    site.route('/lamp', body=PAGE)
+
+    responses = _by_id(_serve([
+        json.dumps({'id': 1, 'op': 'scrape', 'url': site.url('/lamp')}),
+        json.dumps({'id': 2, 'op': 'ping'}),
+        json.dumps({'id': 3, 'op': 'scrape'}),
+        json.dumps({'id': 4, 'op': 'reboot'}),
+        json.dumps({'id': 5, 'op': 'stats'})
+    ]))
+
+    assert responses[1]['result']['title'] == 'Desk Lamp'
+    assert responses[1]['result']['price']['current'] == 19.99
+    assert 'total' in responses[1]['timings_ms']
+    assert responses[2] == {'id': 2, 'ok': True}
+    assert responses[3] == {'id': 3, 'error': 'No URL provided'}
+    assert responses[4] == {'id': 4, 'error': 'Unknown op: reboot'}
+    assert set(responses[5]['stats']) >= {'driver_pool', 'single_flight', 'rate_limiter'}
+
+def test_malformed_lines_are_reported_and_skipped():
+    responses = _serve(['{not json', '', json.dumps({'id': 7, 'op': 'ping'})])
+
+    assert responses[0]['id'] is None
+    assert responses[0]['error'].startswith('Invalid request:')
+    assert responses[1] == {'id': 7, 'ok': True}
+
+def test_shutdown_stops_reading_requests():
+    responses = _serve([json.dumps({'id': 1, 'op': 'ping'}), json.dumps({'op': 'shutdown'}),
+                        json.dumps({'id': 2, 'op': 'ping'})])
+
+    assert responses == [{'id': 1, 'ok': True}]
+
+def test_timeout_stops_a_running_scrape(site):
+    def slow(handler):
+        time.sleep(2)
+        return 200, {}, PAGE
+    site.route('/slow', slow)
+
+    started = time.monotonic()
+    response = _serve([json.dumps({'id': 1, 'op': 'scrape', 'url': site.url('/slow'), 'timeout_ms': 300})])[0]
+
+    assert time.monotonic() - started < 1.5
+    assert 'timed out' in response['result']['source']['error'].lower()
+
+def test_timeout_counts_time_spent_queued(site):
+    def slow(handler):
+        time.sleep(0.5)
+        return 200, {}, PAGE
+    site.route('/slow', slow)
+
+    responses = _by_id(_serve([
+        json.dumps({'id': 1, 'op': 'scrape', 'url': site.url('/slow')}),
+        json.dumps({'id': 2, 'op': 'scrape', 'url': site.url('/slow'), 'timeout_ms': 200})
+    ], max_workers=1))
+
+    assert responses[1]['result']['title'] == 'Desk Lamp'
+    assert responses[2] == {'id': 2, 'error': 'Timed out before the scrape started'}
+    assert site.paths() == ['/slow']